@@ -0,0 +1,54 @@
+import pytest
+
+from genpeds.cleaners import CLEANERS
+from genpeds.config import DATASETS
+
+RECENT = list(range(2014, 2024)) # ten years every subject has
+
+CLEAN_ARGS = [ # (subject, cleaner kwargs); every cleaner, with the levels that read different rows
+    pytest.param('characteristics', {}, id='characteristics'),
+    pytest.param('admissions', {}, id='admissions'),
+    pytest.param('enrollment', {'student_level' : 'undergrad'}, id='enrollment-undergrad'),
+    pytest.param('enrollment', {'student_level' : 'grad'}, id='enrollment-grad'),
+    pytest.param('completion', {'level' : 'bach'}, id='completion-bach'),
+    pytest.param('completion', {'level' : 'doct'}, id='completion-doct'),
+    pytest.param('cip', {}, id='cip'),
+    pytest.param('graduation', {'deg_level' : 'bach'}, id='graduation-bach'),
+    pytest.param('graduation', {'deg_level' : 'assc', 'windows' : (150, 100)}, id='graduation-assc-150-100')
+]
+
+
+def last_years(subject, n_years):
+    start, end = DATASETS[subject]['years_available']
+    return list(range(max(start, end - n_years + 1), end + 1))
+
+
+@pytest.mark.parametrize('subject, kwargs', CLEAN_ARGS)
+def bench_clean(benchmark, synthetic_root, subject, kwargs):
+    '''each cleaner over ten recent years at the default scale.'''
+    data_dir = synthetic_root(RECENT) / DATASETS[subject]['dir']
+    benchmark.group = 'clean'
+    df = benchmark(CLEANERS[subject], data_dir, **kwargs)
+    benchmark.extra_info['rows'] = len(df)
+
+
+@pytest.mark.parametrize('n_institutions', [500, 2000, 8000])
+@pytest.mark.parametrize('subject, kwargs', [param for param in CLEAN_ARGS if param.id != 'cip'])
+def bench_clean_institutions(benchmark, synthetic_root, subject, kwargs, n_institutions):
+    '''scaling over institutions: five recent years. CIP dictionaries don't grow with institutions.'''
+    data_dir = synthetic_root(RECENT[-5:], n_institutions=n_institutions) / DATASETS[subject]['dir']
+    benchmark.group = f'clean_{subject} by institutions'
+    df = benchmark.pedantic(CLEANERS[subject], args=(data_dir,), kwargs=kwargs, rounds=3)
+    benchmark.extra_info['rows'] = len(df)
+
+
+@pytest.mark.parametrize('n_years', [1, 5, 10, 20, 40])
+@pytest.mark.parametrize('subject, kwargs', CLEAN_ARGS)
+def bench_clean_years(benchmark, synthetic_root, subject, kwargs, n_years):
+    '''scaling over years (the most recent n_years a subject has) at 1000 institutions; older years use
+    the older schemas.'''
+    data_dir = synthetic_root(list(range(2024 - n_years, 2024)), n_institutions=1000) / DATASETS[subject]['dir']
+    benchmark.group = f'clean_{subject} by years'
+    benchmark.extra_info['years'] = len(last_years(subject, n_years))
+    df = benchmark.pedantic(CLEANERS[subject], args=(data_dir,), kwargs=kwargs, rounds=3)
+    benchmark.extra_info['rows'] = len(df)
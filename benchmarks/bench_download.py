@@ -0,0 +1,53 @@
+import shutil
+import pytest
+
+from genpeds import downloader
+from genpeds.downloader import scrape_ipeds_data
+from genpeds.mockserver import mock_nces
+
+from conftest import SCALE
+
+RECENT = list(range(2014, 2024))
+
+
+@pytest.fixture
+def no_delay(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+
+
+def scrape_over_http(benchmark, subject='enrollment', **options):
+    '''times downloading ten years from a mock NCES server; returns events of the last round.'''
+    events = []
+
+    def setup():
+        shutil.rmtree(downloader.DATASETS[subject]['dir'], ignore_errors=True)
+        events.clear()
+    with mock_nces(**SCALE, **options) as nces:
+        scrape_ipeds_data(subject, RECENT, on_event=events.append) # build the zips outside the timed rounds
+        benchmark.pedantic(scrape_ipeds_data, args=(subject, RECENT), kwargs={'on_event' : events.append},
+                           setup=setup, rounds=3)
+        benchmark.extra_info['requests'] = nces.stats()['requests']
+    benchmark.extra_info['failed'] = sum(event.kind == 'failed' for event in events)
+    return events
+
+
+@pytest.mark.parametrize('latency', [0.0, 0.05, 0.2])
+def bench_download_latency(benchmark, no_delay, latency):
+    '''download throughput over HTTP by server latency (seconds per request).'''
+    benchmark.group = 'download by latency'
+    scrape_over_http(benchmark, latency=latency)
+
+
+@pytest.mark.parametrize('bandwidth_mb', [1, 4, 16])
+def bench_download_bandwidth(benchmark, no_delay, bandwidth_mb):
+    '''download throughput over HTTP by per-response bandwidth cap (MB/s).'''
+    benchmark.group = 'download by bandwidth'
+    scrape_over_http(benchmark, subject='completion', bandwidth=bandwidth_mb * 2**20)
+
+
+@pytest.mark.parametrize('error_rate', [0.0, 0.1, 0.3])
+def bench_download_errors(benchmark, no_delay, error_rate):
+    '''download time and failed years by share of injected 503 errors.'''
+    benchmark.group = 'download by error rate'
+    scrape_over_http(benchmark, error_rate=error_rate)
@@ -0,0 +1,30 @@
+import pytest
+
+from genpeds.cleaners import CLEANERS
+from genpeds.config import DATASETS
+from genpeds.profiling import profile_memory
+
+from bench_clean import CLEAN_ARGS
+
+YEARS = list(range(2019, 2024))
+
+
+@pytest.mark.parametrize('subject, kwargs', CLEAN_ARGS)
+def bench_clean_memory(benchmark, synthetic_root, subject, kwargs):
+    '''peak and retained memory of each cleaner over five years, saved in extra_info so `--benchmark-autosave`
+    runs track memory across releases too. Timings include tracing overhead.'''
+    data_dir = synthetic_root(YEARS) / DATASETS[subject]['dir']
+    benchmark.group = 'clean memory'
+
+    def clean():
+        with profile_memory() as profile:
+            CLEANERS[subject](data_dir, **kwargs)
+        return profile
+    profile = benchmark.pedantic(clean, rounds=1)
+    summary = profile.summary().set_index('span')
+    benchmark.extra_info['peak_mb'] = round(float(summary.loc['clean', 'peak_mb']), 2)
+    benchmark.extra_info['retained_mb'] = round(float(summary.loc['clean', 'retained_mb']), 2)
+    benchmark.extra_info['year_peak_mb'] = round(float(profile.years()['peak_mb'].max()), 2)
+    for stage in ['read_csv', 'to_numeric', 'concat']:
+        if stage in summary.index:
+            benchmark.extra_info[f'{stage}_peak_mb'] = round(float(summary.loc[stage, 'peak_mb']), 2)
@@ -0,0 +1,40 @@
+import shutil
+import pytest
+
+from genpeds.core import IPDS, Admissions, Enrollment, Completion, Graduation
+
+YEARS = (2014, 2023)
+
+RUNS = { # IPDS.run merges; Cip data is downloaded (from the synthetic source) and removed on every Completion run
+    'admissions+char' : lambda: Admissions(year_range=YEARS).run(merge_with_char=True),
+    'enrollment_grad+char' : lambda: Enrollment(year_range=YEARS).run(student_level='grad', merge_with_char=True),
+    'completion_bach+char+cip' : lambda: Completion(year_range=YEARS).run(merge_with_char=True, get_cip_codes=True),
+    'graduation_bach+char' : lambda: Graduation(year_range=YEARS).run(merge_with_char=True, windows=(150, 100))
+}
+
+
+def clear_cache():
+    IPDS.clear_cache()
+
+
+@pytest.fixture
+def run_dir(synthetic_root, tmp_path, monkeypatch):
+    '''working copy of the synthetic data: `Cip.run()` removes its downloads.'''
+    shutil.copytree(synthetic_root(range(YEARS[0], YEARS[1] + 1)), tmp_path, dirs_exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize('name', list(RUNS))
+def bench_run(benchmark, run_dir, synthetic_nces, name):
+    '''`.run()` with merges on downloaded data, cleaning from scratch each round.'''
+    benchmark.group = 'run'
+    df = benchmark.pedantic(RUNS[name], setup=clear_cache, rounds=3)
+    benchmark.extra_info['rows'] = len(df)
+
+
+@pytest.mark.parametrize('name', ['admissions+char', 'enrollment_grad+char', 'graduation_bach+char'])
+def bench_run_cached(benchmark, run_dir, synthetic_nces, name):
+    '''repeated `.run()` with unchanged files, served by the in-memory clean cache.'''
+    RUNS[name]() # warm the cache
+    benchmark.group = 'run cached'
+    benchmark(RUNS[name])
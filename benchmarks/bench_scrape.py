@@ -0,0 +1,64 @@
+import shutil
+import concurrent.futures
+import pytest
+
+from genpeds.batch import BatchPlan
+from genpeds.config import DATASETS
+from genpeds.downloader import scrape_ipeds_data, get_file_endpoint
+
+RECENT = list(range(2014, 2024))
+
+BATCH = [ # jobs sharing Characteristics and CIP cleans
+    {'subject' : 'completion', 'level' : level, 'years' : '2019-2023', 'merge_with_char' : True}
+    for level in ['assc', 'bach', 'mast', 'doct']
+] + [
+    {'subject' : 'enrollment', 'level' : level, 'years' : '2019-2023', 'merge_with_char' : True}
+    for level in ['undergrad', 'grad']
+] + [
+    {'subject' : 'graduation', 'level' : level, 'years' : '2019-2023', 'merge_with_char' : True}
+    for level in ['assc', 'bach']
+]
+
+
+def remove_dirs(*subjects):
+    for subject in subjects:
+        shutil.rmtree(DATASETS[subject]['dir'], ignore_errors=True)
+
+
+@pytest.mark.parametrize('n_years', [5, 10, 20])
+@pytest.mark.parametrize('subject', ['enrollment', 'completion', 'cip'])
+def bench_scrape(benchmark, synthetic_nces, tmp_path, monkeypatch, subject, n_years):
+    '''download and extraction throughput, with zips served from memory; MB/s is in extra_info.'''
+    monkeypatch.chdir(tmp_path)
+    years = list(range(2024 - n_years, 2024))
+    for year in years: # build the zips outside the timed rounds
+        synthetic_nces(get_file_endpoint(subject, year))
+    benchmark.group = f'scrape_{subject} by years'
+    benchmark.pedantic(scrape_ipeds_data, args=(subject, years, False), setup=lambda: remove_dirs(subject), rounds=3)
+    nbytes = sum(len(synthetic_nces(get_file_endpoint(subject, year)).content) for year in years)
+    benchmark.extra_info['mb_per_second'] = nbytes / 2**20 / benchmark.stats.stats.median
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4])
+def bench_scrape_subjects(benchmark, synthetic_nces, tmp_path, monkeypatch, workers):
+    '''several subjects downloaded at once, as `genpeds-cli scrape -j`.'''
+    monkeypatch.chdir(tmp_path)
+    subjects = ['characteristics', 'enrollment', 'completion', 'graduation']
+
+    def scrape_all():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(scrape_ipeds_data, subject, RECENT, False) for subject in subjects]:
+                future.result()
+    scrape_all() # build the zips outside the timed rounds
+    benchmark.group = 'scrape subjects by workers'
+    benchmark.pedantic(scrape_all, setup=lambda: remove_dirs(*subjects), rounds=3)
+
+
+@pytest.mark.parametrize('workers', [1, 2, 4, 8])
+def bench_batch_workers(benchmark, synthetic_root, monkeypatch, workers):
+    '''a batch of eight jobs cleaned on data already on disk, by number of worker threads.'''
+    monkeypatch.chdir(synthetic_root(RECENT[-5:]))
+    plan = BatchPlan(BATCH, download=False)
+    benchmark.group = 'batch by workers'
+    results = benchmark.pedantic(plan.run, kwargs={'workers' : workers}, rounds=3)
+    benchmark.extra_info['rows'] = sum(len(df) for df in results.values())
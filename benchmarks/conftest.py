@@ -0,0 +1,55 @@
+import pytest
+
+from genpeds import downloader
+from genpeds.config import DATASETS
+from genpeds.synthetic import write_synthetic_data, synthetic_zip
+
+SCALE = {'n_institutions' : 2000, 'n_programs' : 30} # default scale, about half of a recent IPEDS year
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.text = content[:64].decode('latin-1')
+        self.status_code = 200
+        self.headers = {}
+
+
+@pytest.fixture(scope='session')
+def synthetic_root(tmp_path_factory):
+    '''returns function writing synthetic raw files for every subject; one directory per distinct
+    (years, n_institutions, n_programs), reused for the whole session.'''
+    roots = {}
+
+    def make(years, n_institutions=SCALE['n_institutions'], n_programs=SCALE['n_programs']):
+        key = (tuple(years), n_institutions, n_programs)
+        if key not in roots:
+            roots[key] = tmp_path_factory.mktemp(f'ipeds_{len(years)}y_{n_institutions}i')
+            write_synthetic_data(roots[key], years=years, n_institutions=n_institutions, n_programs=n_programs)
+        return roots[key]
+    return make
+
+
+@pytest.fixture(scope='session')
+def zip_cache():
+    return {} # endpoint -> zip bytes, built once per session
+
+
+@pytest.fixture
+def synthetic_nces(monkeypatch, zip_cache):
+    '''serves synthetic zips to the downloader in place of NCES, without the politeness delay.'''
+    endpoints = {}
+    for subject, spec in DATASETS.items():
+        start, end = spec['years_available']
+        for year in range(start, end + 1):
+            endpoints[downloader.get_file_endpoint(subject, year)] = (subject, year)
+
+    def fake_get(endpoint):
+        if endpoint not in zip_cache:
+            subject, year = endpoints[endpoint]
+            zip_cache[endpoint] = synthetic_zip(subject, year, **SCALE)
+        return FakeResponse(zip_cache[endpoint])
+
+    monkeypatch.setattr(downloader.requests, 'get', fake_get)
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    return fake_get
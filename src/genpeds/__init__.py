@@ -2,15 +2,45 @@
 
 __version__ = '1.1.1'
 
-from genpeds.core import Characteristics, Admissions, Enrollment, Completion, Cip, Graduation
-from genpeds.downloader import scrape_ipeds_data
+# public name -> module; modules (and pandas, numpy, requests, ...) are imported on first attribute access,
+# so `import genpeds` and the CLI start quickly
+LAZY_IMPORTS = {
+    'Characteristics' : 'genpeds.core',
+    'Admissions' : 'genpeds.core',
+    'Enrollment' : 'genpeds.core',
+    'Completion' : 'genpeds.core',
+    'Cip' : 'genpeds.core',
+    'Graduation' : 'genpeds.core',
+    'scrape_ipeds_data' : 'genpeds.downloader',
+    'Panel' : 'genpeds.panel',
+    'fit_trends' : 'genpeds.trend',
+    'Rollup' : 'genpeds.rollup',
+    'CipCube' : 'genpeds.cip',
+    'CipCrosswalk' : 'genpeds.cip',
+    'cip_hierarchy' : 'genpeds.cip',
+    'build_fact_table' : 'genpeds.facts',
+    'SpatialIndex' : 'genpeds.spatial',
+    'carry_back_coordinates' : 'genpeds.spatial',
+    'NameIndex' : 'genpeds.search',
+    'serve' : 'genpeds.server',
+    'BatchPlan' : 'genpeds.batch',
+    'run_batch' : 'genpeds.batch',
+    'ProgressEvent' : 'genpeds.events',
+    'ProgressBar' : 'genpeds.events',
+    'SpilledFrame' : 'genpeds.spill'
+}
 
-__all__ = [
-    'Characteristics',
-    'Admissions',
-    'Enrollment', 
-    'Completion',
-    'Cip',
-    'Graduation',
-    'scrape_ipeds_data'
-]
+__all__ = list(LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    if name not in LAZY_IMPORTS:
+        raise AttributeError(f"module 'genpeds' has no attribute '{name}'")
+    import importlib
+    value = getattr(importlib.import_module(LAZY_IMPORTS[name]), name)
+    globals()[name] = value # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
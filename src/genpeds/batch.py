@@ -0,0 +1,206 @@
+import json
+import concurrent.futures
+
+from genpeds.cleaners import CLEANERS
+from genpeds.config import DATASETS
+from genpeds.core import SUBJECT_CLASSES
+from genpeds.shared import remove_data_dir
+from genpeds.spill import SpilledFrame
+from genpeds.facts import LEVEL_ARGS, subject_years
+
+JOB_OPTIONS = ['subject', 'name', 'years', 'level', 'windows', 'merge_with_char', 'get_cip_codes']
+
+
+def parse_job_years(years):
+    '''returns year_range from a job spec: [start, end] range string '2001-2023', list of years, single year or None.'''
+    if isinstance(years, str):
+        start, _, end = years.partition('-')
+        return (int(start), int(end or start))
+    return years
+
+
+def normalize_job(job):
+    '''returns job spec with defaults filled in and years expanded to the subject's available years.'''
+    unknown = [opt for opt in job if opt not in JOB_OPTIONS]
+    if unknown:
+        raise ValueError(f'unknown job options {unknown}; options include {JOB_OPTIONS}')
+    subject = job.get('subject')
+    if subject not in CLEANERS:
+        raise ValueError(f"job subject must be in {list(CLEANERS)}, not '{subject}'")
+    level = job.get('level')
+    if level and subject not in LEVEL_ARGS:
+        raise ValueError(f'{subject} data has no levels')
+    windows = tuple(job['windows']) if job.get('windows') else None
+    if windows and subject != 'graduation':
+        raise ValueError('windows only apply to graduation data')
+    if job.get('merge_with_char') and subject == 'characteristics':
+        raise ValueError('characteristics data does not merge with itself; drop merge_with_char')
+    get_cip_codes = job.get('get_cip_codes', subject == 'completion') # as in Completion.run()
+    if get_cip_codes and subject != 'completion':
+        raise ValueError('CIP codes only merge with completion data')
+    return {
+        'subject' : subject,
+        'name' : job.get('name', '_'.join(str(part) for part in [subject, level] + list(windows or []) if part)),
+        'years' : subject_years(subject, parse_job_years(job.get('years'))),
+        'level' : level,
+        'windows' : windows,
+        'merge_with_char' : bool(job.get('merge_with_char', False)),
+        'get_cip_codes' : bool(get_cip_codes)
+    }
+
+
+def load_jobs(path):
+    '''returns list of job specs from a JSON file, or a YAML file when PyYAML is installed.'''
+    with open(path) as filehandle:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('YAML job specs need PyYAML; install it or use a JSON spec')
+            jobs = yaml.safe_load(filehandle)
+        else:
+            jobs = json.load(filehandle)
+    return jobs['jobs'] if isinstance(jobs, dict) else jobs
+
+
+class BatchPlan:
+    '''DAG of downloads, cleans and merges for a batch of jobs, with shared inputs planned once.'''
+
+    def __init__(self, jobs, download=True):
+        '''plans a batch: each subject is downloaded once (over the union of years its jobs need) and each
+        distinct (subject, cleaning options) pair is cleaned once, however many jobs use it. Cleans go through
+        the subject classes, so they share the `.clean()` cache with them.
+
+        :param jobs::
+          list of job specs, each a dict with 'subject' and optionally 'name', 'years' (range string like
+          '2001-2023', list of years or single year), 'level', 'windows' (graduation), 'merge_with_char'
+          and 'get_cip_codes' (completion, defaults to True).
+        :param download::
+          (bool) When False, only cleans data already on disk.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> jobs = [{'subject' : 'completion', 'level' : lvl, 'years' : '2010-2023', 'merge_with_char' : True}
+        ...         for lvl in ['assc', 'bach', 'mast', 'doct']]
+        >>> plan = ed.BatchPlan(jobs) # Characteristics and CIP data downloaded and cleaned once
+        >>> results = plan.run(workers=4) # dict of job name -> Pandas DataFrame
+        '''
+        self.jobs = [normalize_job(job) for job in jobs]
+        names = [job['name'] for job in self.jobs]
+        if len(set(names)) != len(names):
+            raise ValueError(f'job names must be unique; set a distinct name for repeated jobs: {names}')
+
+        self.see_progress = False
+        self.options = {} # on_event, memory_limit, spill_dir and executor for the subject objects, see `run()`
+        self.nodes = {} # key -> (function, arguments, dependency keys)
+        scrape_years = {}
+        for job in self.jobs:
+            inputs = [(job['subject'], self.clean_kwargs(job))]
+            if job['merge_with_char']:
+                inputs.append(('characteristics', {}))
+            if job['get_cip_codes']:
+                inputs.append(('cip', {}))
+            clean_keys = []
+            for subject, kwargs in inputs:
+                scrape_years.setdefault(subject, set()).update(subject_years(subject, job['years']))
+                key = ('clean', subject, tuple(sorted(kwargs.items())))
+                self.nodes[key] = (self.clean, (subject, kwargs), [('scrape', subject)] if download else [])
+                clean_keys.append(key)
+            self.nodes[('job', job['name'])] = (self.assemble, (job,), clean_keys)
+        for subject, years in scrape_years.items() if download else []:
+            self.nodes[('scrape', subject)] = (self.scrape, (subject, sorted(years)), [])
+
+    @staticmethod
+    def clean_kwargs(job):
+        kwargs = {}
+        if job['level']:
+            kwargs[LEVEL_ARGS[job['subject']]] = job['level']
+        if job['windows']:
+            kwargs['windows'] = job['windows']
+        return kwargs
+
+    def subject_object(self, subject, years=None):
+        return SUBJECT_CLASSES[subject](year_range=years, **self.options)
+
+    def scrape(self, subject, years):
+        if years:
+            self.subject_object(subject, years).scrape(see_progress=self.see_progress)
+
+    def clean(self, subject, kwargs):
+        '''cleans a subject through its class, so results come from and go to the shared `.clean()` cache.'''
+        return self.subject_object(subject).cached_clean(DATASETS[subject]['dir'], **kwargs)
+
+    def assemble(self, job, *cleaned):
+        '''returns a job's data: its subject's cleaned data for its years, with merges as in `run()`.'''
+        df, others = cleaned[0], list(cleaned[1:])
+        in_years = lambda part: part.loc[part['year'].isin(job['years'])].reset_index(drop=True)
+        df = df.map_parts(in_years) if isinstance(df, SpilledFrame) else in_years(df)
+        if job['merge_with_char']:
+            df = df.merge(others.pop(0), on=['id', 'year'])
+        if job['get_cip_codes']:
+            df = df.merge(others.pop(0), on=['cip', 'year'])
+        return df
+
+    def run(self, workers=4, see_progress=False, rm_disk=False, on_event=None, memory_limit=None, spill_dir=None,
+            executor=None) -> dict:
+        '''executes the plan on a thread pool, running each node once its dependencies finish; returns dict
+        of job name -> Pandas DataFrame.
+
+        :param workers::
+          number of worker threads.
+        :param see_progress::
+          (bool) When True, prints download confirmations and each finished step.
+        :param rm_disk::
+          removes downloaded data from disk after the batch finishes.
+        :param on_event::
+          optional callable receiving download ProgressEvents; see `genpeds.events`.
+        :param memory_limit, spill_dir::
+          past memory_limit, cleaned years spill to disk and jobs return `genpeds.spill.SpilledFrame`s; see
+          `IPDS.__init__`.
+        :param executor::
+          runs each subject's downloads and cleaning by year; see `genpeds.executors`.
+        '''
+        self.see_progress = see_progress
+        self.options = {'on_event' : on_event, 'memory_limit' : memory_limit, 'spill_dir' : spill_dir,
+                        'executor' : executor}
+        results = {}
+        waiting = dict(self.nodes)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while waiting or running:
+                for key in [key for key, (_, _, deps) in waiting.items() if all(dep in results for dep in deps)]:
+                    func, args, deps = waiting.pop(key)
+                    inputs = [results[dep] for dep in deps if dep[0] != 'scrape'] # downloads only order the work
+                    running[pool.submit(func, *args, *inputs)] = key
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    if future.exception() is not None:
+                        for other in running:
+                            other.cancel()
+                        raise future.exception()
+                    results[key] = future.result()
+                    if see_progress:
+                        print(f"finished {' '.join(str(part) for part in key if part)}")
+
+        if rm_disk:
+            for key in self.nodes:
+                if key[0] == 'clean':
+                    remove_data_dir(DATASETS[key[1]]['dir'], ignore_errors=True)
+                    SUBJECT_CLASSES[key[1]].clear_cache()
+        return {job['name'] : results[('job', job['name'])] for job in self.jobs} # in spec order
+
+
+def run_batch(jobs, workers=4, see_progress=False, rm_disk=False, download=True, on_event=None, memory_limit=None,
+              spill_dir=None, executor=None) -> dict:
+    '''plans and runs a batch of jobs; returns dict of job name -> Pandas DataFrame. See `BatchPlan`.
+
+    :param jobs::
+      list of job specs, or path to a JSON/YAML file holding them.
+    '''
+    if isinstance(jobs, str):
+        jobs = load_jobs(jobs)
+    return BatchPlan(jobs, download=download).run(workers=workers, see_progress=see_progress, rm_disk=rm_disk,
+                                                      on_event=on_event, memory_limit=memory_limit,
+                                                      spill_dir=spill_dir, executor=executor)
@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+
+def object_nbytes(obj):
+    '''returns approximate in-memory size of a cached object in bytes.'''
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    '''thread-safe least-recently-used cache bounded by total size in bytes.'''
+
+    def __init__(self, max_bytes=256 * 2**20):
+        '''least-recently-used cache; once the total size of stored values passes max_bytes, the least recently
+        used entries are evicted. Values larger than max_bytes are not stored.
+
+        :param max_bytes::
+          size limit in bytes, measured with `object_nbytes()`.
+        '''
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # key -> (value, nbytes), least recently used first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        '''returns cached value for key (marking it most recently used), or default.'''
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value, nbytes=None):
+        '''stores value under key, evicting least recently used entries past the size limit.'''
+        nbytes = object_nbytes(value) if nbytes is None else nbytes
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self.entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self.entries.popitem(last=False)[1][1]
+
+    def invalidate(self, match=None):
+        '''removes entries whose key satisfies match (a function of the key); removes everything if None.
+        Returns number of entries removed.'''
+        with self.lock:
+            keys = [key for key in self.entries if match is None or match(key)]
+            for key in keys:
+                self.nbytes -= self.entries.pop(key)[1]
+            return len(keys)
+
+    def clear(self):
+        '''removes all entries and resets hit/miss statistics.'''
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = self.hits = self.misses = 0
+
+    def info(self) -> dict:
+        '''returns dict of hit/miss statistics, entry count and size.'''
+        with self.lock:
+            return {'hits' : self.hits, 'misses' : self.misses, 'entries' : len(self.entries),
+                    'bytes' : self.nbytes, 'max_bytes' : self.max_bytes}
+
+
+class KeyedLocks:
+    '''one lock per key, so work on one key (e.g. downloading a subject) runs once at a time.'''
+
+    def __init__(self):
+        self.locks = {}
+        self.guard = threading.Lock()
+
+    def __call__(self, key):
+        with self.guard:
+            return self.locks.setdefault(key, threading.Lock())
+
+
+def dir_fingerprint(data_dir):
+    '''returns sorted (name, size, mtime_ns) tuples for the files in a directory, skipping dotfiles; changes
+    when any file (and so any year) is added, removed or rewritten.'''
+    with os.scandir(data_dir) as entries:
+        return tuple(sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                            for entry in entries if entry.is_file() and not entry.name.startswith('.')))
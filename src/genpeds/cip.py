@@ -0,0 +1,334 @@
+import re
+import warnings
+import numpy as np
+import pandas as pd
+
+from genpeds.config import DATASETS
+from genpeds.rollup import RACE_COUNTS, SHARE_EVALS, supported_evals
+
+CIP_LEVELS = {2 : 10000, 4 : 100, 6 : 1} # digits -> divisor from a 6-digit integer code
+
+
+def parse_cip_code(cip):
+    '''returns (code, digits) for one CIP string; code is a 6-digit-scale integer
+    (e.g. '52.0801' -> 520801, '52.08' -> 520800, '52' -> 520000) and digits is 2, 4 or 6. Codes without
+    a dot are split after the family ('010101' -> 10101, '5208' -> 520800), putting back a dropped leading
+    zero ('10101' -> 10101). Unparseable codes return (-1, 0).
+    '''
+    cip = str(cip).strip()
+    family, dot, rest = cip.partition('.')
+    if not dot and family.isdigit() and 2 < len(family) <= 6:
+        family = family.zfill(len(family) + len(family) % 2) # e.g. read as a number: '010101' -> '10101'
+        family, rest = family[:2], family[2:]
+    if not family.isdigit() or (rest and not rest.isdigit()) or len(family) > 2 or len(rest) > 4:
+        return -1, 0
+    if rest:
+        rest = rest.ljust(2 if len(rest) <= 2 else 4, '0') # trailing zeros are dropped in some years
+    digits = 2 + len(rest)
+    code = int(family) * 10000 + (int(rest.ljust(4, '0')) if rest else 0)
+    return code, digits
+
+
+def cip_codes(cips):
+    '''returns (codes, digits) integer arrays for an array-like of CIP strings; each unique string is parsed once.
+
+    :cips:          CIP code strings, e.g. the 'cip' column of Completion data
+    '''
+    codes, uniques = pd.factorize(pd.Series(cips, dtype=object))
+    parsed = np.array([parse_cip_code(cip) for cip in uniques], dtype='int64').reshape(-1, 2)
+    unparsed = parsed[:, 1] == 0
+    if unparsed.any():
+        dropped = np.isin(codes, np.flatnonzero(unparsed)).sum()
+        warnings.warn(f'{dropped} CIP codes could not be parsed and are left out of roll-ups, '
+                      f'e.g. {uniques[unparsed][0]!r}')
+    parsed = np.vstack([parsed, [[-1, 0]]]) # code -1 (missing) maps to the last row
+    return parsed[codes, 0], parsed[codes, 1]
+
+
+def cip_level_code(codes, level):
+    '''returns the 2, 4 or 6 digit numeric code (e.g. 52, 5208, 520801) of 6-digit-scale integer codes.'''
+    return np.where(codes >= 0, codes // CIP_LEVELS[level], -1)
+
+
+def format_cip_code(code, level):
+    '''returns the CIP string of a numeric level code, e.g. (5208, 4) -> '52.08'.'''
+    text = str(int(code)).zfill(level)
+    return text if level == 2 else f'{text[:2]}.{text[2:]}'
+
+
+def cip_hierarchy(cip_df) -> pd.DataFrame:
+    '''returns CIP hierarchy table from cleaned CIP data (`Cip().clean()` output), with one row per year and
+    code: numeric 'code', 'level' (2, 4 or 6 digits), parent 'family' and 'series' codes and 'cip_description'.
+
+    :cip_df:        cleaned CIP data
+    '''
+    codes, digits = cip_codes(cip_df['cip'])
+    df = pd.DataFrame({
+        'year' : cip_df['year'].to_numpy(),
+        'cip' : cip_df['cip'].to_numpy(),
+        'level' : digits,
+        'code' : np.where(digits > 0, codes // np.where(digits > 0, 10 ** (6 - digits), 1), -1),
+        'family' : cip_level_code(codes, 2),
+        'series' : np.where(digits >= 4, cip_level_code(codes, 4), -1),
+        'cip_description' : cip_df['cip_description'].to_numpy()
+    })
+    return df.loc[df['level'] > 0].reset_index(drop=True)
+
+
+class CipCube:
+    '''Completion roll-up cube over id x year x CIP level (2, 4 and 6 digits), keyed by numeric CIP codes.'''
+
+    def __init__(self, cube):
+        '''Completion roll-up cube.
+
+        :param cube::
+          DataFrame with 'level' (2, 4 or 6) and numeric 'code' columns, as built by `CipCube.from_frame()`.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> complete_df = ed.Completion(year_range=(2010,2023)).run(get_cip_codes=False)
+        >>> cube = ed.CipCube.from_frame(complete_df)
+        >>> econ = cube.get(level=4, codes=[4506]) # 45.06 Economics, every institution and year
+        >>> stem = cube.get(level=2, codes=[11, 14, 26, 27, 40], years=(2015,2023))
+        '''
+        self.cube = cube
+        self.levels = cube['level'].to_numpy()
+        self.codes = cube['code'].to_numpy()
+        self.is_total = cube['id'].isna().to_numpy() # state totals have no id
+
+    @classmethod
+    def from_frame(cls, df, by_state=False):
+        '''builds the cube from cleaned Completion data; only 6-digit rows are summed, so 2 and 4 digit
+        summary rows present in some years are never double counted.
+
+        :param df::
+          cleaned Completion data (`Completion.clean()` or `.run()` output).
+        :param by_state::
+          (bool) When True, rolls up over state x year x CIP level too; needs data merged with Characteristics.
+        '''
+        codes, digits = cip_codes(df['cip'])
+        detail = df.loc[digits == 6]
+        codes = codes[digits == 6]
+
+        keys = ['year'] + [key for key in ['deglevel'] if key in df.columns]
+        inst_keys = ['id'] + keys + (['state'] if 'state' in df.columns else [])
+        counts = [col for col in RACE_COUNTS if col in df.columns]
+        if by_state and 'state' not in df.columns:
+            raise ValueError("by_state needs a 'state' column; use Completion data merged with Characteristics")
+
+        detail = detail[inst_keys + counts]
+        levels = []
+        for level in CIP_LEVELS:
+            level_df = detail.assign(code=cip_level_code(codes, level), level=level)
+            inst_df = level_df.groupby(inst_keys + ['level', 'code'], dropna=False, sort=False)[counts].sum(min_count=1)
+            levels.append(inst_df.reset_index())
+            if by_state:
+                state_df = level_df.groupby(['state'] + keys + ['level', 'code'], dropna=False)[counts].sum(min_count=1)
+                levels.append(state_df.reset_index().assign(id=None)) # state totals have no id
+
+        cube = pd.concat(levels, ignore_index=True)
+        for eval_str in supported_evals(SHARE_EVALS, counts):
+            cube = cube.eval(eval_str)
+        cube['code'] = cube['code'].astype('int64')
+        return cls(cube)
+
+    def get(self, level=2, codes=None, years=None, ids=None, states=None, state_totals=False) -> pd.DataFrame:
+        '''returns cube rows at a CIP level, looked up by numeric codes.
+
+        :param level::
+          CIP level in digits; options include [2, 4, 6].
+        :param codes::
+          iterable of numeric codes at that level, e.g. [52] (Business) at level 2 or [5208] at level 4.
+        :param years::
+          tuple of inclusive year integers (indicates a range), iterable of year integers, or single year.
+        :param ids::
+          iterable of institution ids.
+        :param states::
+          iterable of state names.
+        :param state_totals::
+          (bool) When True, returns state totals (cube built with by_state=True) instead of institution rows.
+        '''
+        if level not in CIP_LEVELS:
+            raise ValueError(f'level must be one of {list(CIP_LEVELS)}')
+        mask = self.levels == level
+        if codes is not None:
+            mask &= np.isin(self.codes, np.asarray(list(codes), dtype='int64'))
+        mask &= self.is_total if state_totals else ~self.is_total
+        if years is not None:
+            year_vals = self.cube['year'].to_numpy()
+            if isinstance(years, tuple):
+                start, end = years
+                mask &= (year_vals >= start) & (year_vals <= end)
+            else:
+                mask &= np.isin(year_vals, [years] if isinstance(years, int) else list(years))
+        if ids is not None:
+            mask &= self.cube['id'].isin(list(ids)).to_numpy()
+        if states is not None:
+            mask &= self.cube['state'].isin(list(states)).to_numpy()
+        return self.cube.loc[mask].reset_index(drop=True)
+
+
+def cip_edition(year):
+    '''returns the CIP taxonomy edition (1985, 1990, 2000, 2010 or 2020) used by a completion survey year.'''
+    for cond, edition in DATASETS['cip']['editions']:
+        if cond(year):
+            return edition
+
+
+def read_crosswalk(source, source_edition=None, target_edition=None):
+    '''returns one crosswalk step as (source_edition, target_edition, DataFrame of int64 'source'/'target'
+    codes and float 'weight'), from an NCES crosswalk file or DataFrame.
+
+    Editions are read from NCES column names like 'CIPCode2010' and 'CIPCode2020' unless given. A 'weight'
+    column is used when present; otherwise a code split across k new codes gets weight 1/k.
+
+    :source:            path to a crosswalk .csv/.xlsx, or DataFrame
+    :source_edition:    edition codes are mapped from, e.g. 2010
+    :target_edition:    edition codes are mapped to, e.g. 2020
+    '''
+    if isinstance(source, pd.DataFrame):
+        df = source.copy()
+    elif str(source).endswith(('.xls', '.xlsx')):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str, encoding_errors='replace')
+    df.columns = df.columns.str.strip().str.lower()
+
+    code_cols = [col for col in df.columns if re.fullmatch(r'cipcode(\d{4})', col)]
+    if source_edition is None or target_edition is None:
+        if len(code_cols) != 2:
+            raise ValueError('could not find CIPCodeYYYY columns; pass source_edition and target_edition')
+        source_edition, target_edition = sorted(int(col[-4:]) for col in code_cols)
+    src_col, tgt_col = f'cipcode{source_edition}', f'cipcode{target_edition}'
+    if src_col not in df.columns:
+        src_col, tgt_col = 'source', 'target'
+
+    source_codes, source_digits = cip_codes(df[src_col].str.replace('=', '').str.strip('"'))
+    target_codes, target_digits = cip_codes(df[tgt_col].str.replace('=', '').str.strip('"'))
+    step = pd.DataFrame({'source' : source_codes, 'target' : target_codes})
+    if 'weight' in df.columns:
+        step['weight'] = pd.to_numeric(df['weight'], errors='coerce').fillna(0).to_numpy()
+    else:
+        step['weight'] = 1 / step.groupby('source')['target'].transform('nunique') # even split
+    keep = (source_digits == 6) & (target_digits == 6) # deleted codes have no target and keep their old code
+    step = step.loc[keep].drop_duplicates(['source', 'target']).reset_index(drop=True)
+    return source_edition, target_edition, step
+
+
+class CipCrosswalk:
+    '''chained CIP crosswalk across taxonomy editions, compiled to integer code tables.'''
+
+    def __init__(self, steps=None):
+        '''chained CIP crosswalk across taxonomy editions.
+
+        :param steps::
+          dict of (source_edition, target_edition) -> DataFrame of int64 'source'/'target' codes and 'weight'.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> xwalk = ed.CipCrosswalk.from_files(['Crosswalk2000to2010.csv', 'Crosswalk2010to2020.csv'])
+        >>> xwalk.save('cip_crosswalk.npz') # precompiled, reloaded with CipCrosswalk.load()
+        >>> panel_2020 = xwalk.remap(complete_df, target=2020) # 2003-2023 completions on CIP 2020 codes
+        '''
+        self.steps = dict(steps) if steps else {}
+        self.compiled = {}
+
+    @classmethod
+    def from_files(cls, sources):
+        '''builds a crosswalk from NCES crosswalk files (or DataFrames), one per edition step.'''
+        steps = {}
+        for source in sources:
+            source_edition, target_edition, step = read_crosswalk(source)
+            steps[(source_edition, target_edition)] = step
+        return cls(steps)
+
+    def save(self, path):
+        '''saves the crosswalk tables as a compressed NumPy .npz file.'''
+        arrays = {}
+        for (source_edition, target_edition), step in self.steps.items():
+            for col in ['source', 'target', 'weight']:
+                arrays[f'{source_edition}_{target_edition}_{col}'] = step[col].to_numpy()
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        '''loads a crosswalk saved with `save()`.'''
+        steps = {}
+        with np.load(path) as arrays:
+            for key in arrays.files:
+                source_edition, target_edition, col = key.split('_')
+                steps.setdefault((int(source_edition), int(target_edition)), {})[col] = arrays[key]
+        return cls({key : pd.DataFrame(cols) for key, cols in steps.items()})
+
+    def compile(self, source_edition, target):
+        '''returns the composed source -> target table; codes absent from a step map to themselves.'''
+        if (source_edition, target) in self.compiled:
+            return self.compiled[(source_edition, target)]
+        table = None
+        edition = source_edition
+        while edition != target:
+            step_key = next((key for key in self.steps if key[0] == edition and key[1] <= target), None)
+            if step_key is None:
+                raise ValueError(f'no crosswalk step from CIP {edition} towards CIP {target}')
+            step = self.steps[step_key]
+            if table is None:
+                table = step.copy()
+            else:
+                table = table.merge(step.rename(columns={'source' : 'target', 'target' : 'next', 'weight' : 'next_weight'}),
+                                    on='target', how='left')
+                unchanged = table['next'].isna()
+                table['target'] = np.where(unchanged, table['target'], table['next']).astype('int64')
+                table['weight'] = table['weight'] * table['next_weight'].where(~unchanged, 1)
+                carried = step.loc[~step['source'].isin(table['source'])] # unchanged by earlier steps
+                table = pd.concat([table[['source', 'target', 'weight']], carried], ignore_index=True)
+                table = table.groupby(['source', 'target'], as_index=False)['weight'].sum()
+            edition = step_key[1]
+        if table is None:
+            table = pd.DataFrame({'source' : pd.Series(dtype='int64'), 'target' : pd.Series(dtype='int64'),
+                                  'weight' : pd.Series(dtype='float64')})
+        self.compiled[(source_edition, target)] = table
+        return table
+
+    def remap(self, df, target=2020) -> pd.DataFrame:
+        '''returns Completion data with every year's 6-digit CIP codes moved onto one target taxonomy;
+        counts are multiplied by split weights and summed, and shares are recomputed.
+
+        :param df::
+          cleaned Completion data (`Completion.clean()` or `.run()` output).
+        :param target::
+          target CIP edition; options include [1985, 1990, 2000, 2010, 2020].
+        '''
+        codes, digits = cip_codes(df['cip'])
+        detail = df.loc[digits == 6]
+        years = detail['year']
+        row_editions = years.map({yr : cip_edition(int(yr)) for yr in years.unique()}).to_numpy(dtype='int64')
+        if (row_editions > target).any():
+            raise ValueError(f'data includes years coded in editions newer than CIP {target}')
+
+        # one table keyed by edition * 1e6 + code, so the whole panel is remapped in a single join
+        tables = []
+        for edition in np.unique(row_editions):
+            table = self.compile(int(edition), target)
+            tables.append(pd.DataFrame({'key' : int(edition) * 1_000_000 + table['source'].to_numpy(),
+                                        'target' : table['target'].to_numpy(), 'weight' : table['weight'].to_numpy()}))
+        table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=['key', 'target', 'weight'])
+
+        counts = [col for col in RACE_COUNTS if col in df.columns]
+        keys = ['id', 'year'] + [col for col in ['deglevel', 'state'] if col in df.columns]
+        rows = detail[keys + counts].assign(key=row_editions * 1_000_000 + codes[digits == 6])
+        rows = rows.merge(table, on='key', how='left')
+        unmapped = rows['target'].isna()
+        rows['target'] = np.where(unmapped, rows['key'] % 1_000_000, rows['target']).astype('int64')
+        weights = rows['weight'].where(~unmapped, 1).to_numpy()
+        rows[counts] = rows[counts].to_numpy(dtype='float64') * weights[:, np.newaxis]
+
+        remapped = rows.groupby(keys + ['target'], dropna=False)[counts].sum(min_count=1).reset_index()
+        target_codes, uniques = pd.factorize(remapped['target'])
+        remapped['cip'] = np.array([format_cip_code(code, 6) for code in uniques], dtype=object)[target_codes]
+        remapped = remapped.drop(columns='target')
+        for eval_str in supported_evals(SHARE_EVALS, counts):
+            remapped = remapped.eval(eval_str)
+        remapped['cip_edition'] = target
+        return remapped
@@ -1,127 +1,210 @@
 import os
 import re
+import time
 import warnings
+from collections import deque
+from itertools import islice
 from bs4 import BeautifulSoup
 import pandas as pd
 import numpy as np
 import us 
 
 from genpeds.config import VARIABLE_RENAME
+from genpeds.executors import executor_scope, executor_width
+from genpeds.metrics import record_span, span, traced
+from genpeds.spill import YearCollector
 
-def clean_characteristics(characteristics_dir = 'characteristicsdata') -> pd.DataFrame:
-    '''cleans institution characteristics data and returns complete characteristics data
+def data_files(data_dir, years=None) -> list:
+    '''returns sorted names of the subject-year files in data_dir, skipping dotfiles (e.g. the download
+    manifest); only files of the given years, when years is given.
 
-    :characteristics_dir:        directory where raw enrollment data is located
+    :data_dir:      directory of raw subject data
+    :years:         iterable of years, or None for every year
+    '''
+    files = sorted(file for file in os.listdir(data_dir) if not file.startswith('.'))
+    if years is not None:
+        years = {int(year) for year in years}
+        files = [file for file in files if int(re.split(r'_|\.', file)[1]) in years]
+    return files
+
+
+def timed_year(clean_year, file_path, year, **options):
+    '''returns (cleaned data, wall-clock start, seconds) of clean_year; runs on an executor's workers.'''
+    started, start = time.time(), time.perf_counter()
+    df = clean_year(file_path, year, **options)
+    return df, started, time.perf_counter() - start
+
+
+def clean_years(clean_year, data_dir, years=None, executor=None, subject=None, **options):
+    '''yields (year, cleaned data) for each subject-year file in data_dir, in year order. Without an executor,
+    years are cleaned one after another; with one, about as many years as it has workers are in flight at once,
+    so only those (and not every cleaned year) are held until the caller takes them. Each year's time on a
+    worker is sent to metric hooks from this thread as a 'clean_year' span.
+
+    :clean_year:    per-year cleaner, called as clean_year(file_path, year, **options); must be a module-level
+                    function for process and queue executors
+    :data_dir:      directory of raw subject data
+    :years:         iterable of years, or None for every year
+    :executor:      see `genpeds.executors.executor_scope`
+    :subject:       subject name the 'clean_year' spans are tagged with
     '''
+    files = [(os.path.join(data_dir, file), int(re.split(r'_|\.', file)[1])) for file in data_files(data_dir, years)]
+    if executor is None:
+        for file_path, year in files:
+            yield year, clean_year(file_path, year, **options)
+        return
+    with executor_scope(executor) as pool:
+        files = iter(files)
+        in_flight = deque((year, pool.submit(timed_year, clean_year, file_path, year, **options))
+                          for file_path, year in islice(files, executor_width(pool)))
+        while in_flight:
+            year, future = in_flight.popleft()
+            df, started, seconds = future.result()
+            for file_path, next_year in islice(files, 1): # keep the workers busy while the caller takes df
+                in_flight.append((next_year, pool.submit(timed_year, clean_year, file_path, next_year, **options)))
+            record_span('clean_year', started, seconds, subject=subject, year=year)
+            yield year, df
+            del df
+
+
+def clean_characteristics_year(file_path, year) -> pd.DataFrame:
+    '''cleans one year's institution characteristics file; see `clean_characteristics`.'''
     warnings.filterwarnings('ignore', category=FutureWarning)
-    sorted_files = sorted(os.listdir(characteristics_dir))
     rename_dict = VARIABLE_RENAME['characteristics']
     state_mappings = us.states.mapping('abbr', 'name') # get abbr -> names for states
     state_mappings['DC'] = 'District of Columbia' # add Washington D.C. to state mapping
 
-    master_df = pd.DataFrame()
-
     dtypes = {
         'unitid' : str, 'instnm' : str, 'addr' : str, 'city' : str, 
         'stabbr' : str, 'zip' : str, 'webaddr' : str, 'longitud' : str, 'latitude' : str
     }
-    for file in sorted_files:
-        file_path = os.path.join(characteristics_dir, file)
+
+    with span('read_csv', subject='characteristics', year=year) as stage:
         df = pd.read_csv(file_path, dtype=dtypes, encoding_errors='replace', low_memory=False)
-        df = df.rename(str.lower, axis='columns')
-        year_num = re.split(r'_|\.', f'{file}')[1]
-        
-        if int(year_num) > 1998:
-            if int(year_num) > 2008:
-                filt_col = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip', 'webaddr', 'longitud', 'latitude']
-            else:
-                filt_col = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip', 'webaddr'] # long/lat NA for before 2008
+        stage.set(rows=len(df), bytes=os.path.getsize(file_path))
+    df = df.rename(str.lower, axis='columns')
+    
+    if year > 1998:
+        if year > 2008:
+            filt_col = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip', 'webaddr', 'longitud', 'latitude']
         else:
-            filt_col = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip'] # for years < 1999
-        df_filtered = df.loc[:, filt_col]
-        
-        for col in ['instnm', 'addr', 'city']:
-            df_filtered[col] = df_filtered[col].str.title() # TitleCase
-        df_filtered['year'] = int(year_num) # year identifier
-        df_filtered['unitid'] = df_filtered['unitid'].astype(str).str.strip() # make id into string
-        df_filtered['stabbr'] = df_filtered['stabbr'].map(state_mappings) # state abbreviation to state name
-        master_df = pd.concat([master_df, df_filtered], ignore_index=True)
+            filt_col = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip', 'webaddr'] # long/lat NA for before 2008
+    else:
+        filt_col = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip'] # for years < 1999
+    df_filtered = df.loc[:, filt_col]
     
-    master_df = master_df.rename(columns=rename_dict) # rename vars
-    return master_df
+    for col in ['instnm', 'addr', 'city']:
+        df_filtered[col] = df_filtered[col].str.title() # TitleCase
+    df_filtered['year'] = year # year identifier
+    df_filtered['unitid'] = df_filtered['unitid'].astype(str).str.strip() # make id into string
+    df_filtered['stabbr'] = df_filtered['stabbr'].map(state_mappings) # state abbreviation to state name
+    df_filtered = df_filtered.rename(columns=rename_dict) # rename vars
 
+    return df_filtered
 
-def clean_admissions(admissions_dir = 'admissionsdata') -> pd.DataFrame:
-    '''cleans yearly admissions data and returns complete admissions data
-    
-    :admissions_dir:        directory where raw admissions data is located
+
+@traced('clean', subject='characteristics')
+def clean_characteristics(characteristics_dir = 'characteristicsdata', years=None, memory_limit=None, spill_dir=None, executor=None) -> pd.DataFrame:
+    '''cleans institution characteristics data and returns complete characteristics data
+
+    :characteristics_dir:        directory where raw enrollment data is located
+    :years:               only clean these years' files; defaults to every file in the directory
+    :memory_limit:        bytes (or a size like '2GB') of cleaned years to hold in memory; past it, years spill
+                          to disk and a `genpeds.spill.SpilledFrame` is returned instead of a DataFrame
+    :spill_dir:           directory spilled years are written under; defaults to the system's temp directory
+    :executor:            cleans years in parallel: 'thread', 'process', 'queue' or an executor object (see
+                          `genpeds.executors`); defaults to cleaning one year after another
     '''
     warnings.filterwarnings('ignore', category=FutureWarning)
-    sorted_files = sorted(os.listdir(admissions_dir)) # unnecessary, but helps with error checking
-    rename_dict = VARIABLE_RENAME['admissions']
 
-    master_df = pd.DataFrame()
+    collected = YearCollector('characteristics', memory_limit, spill_dir)
+
+    for year, df in clean_years(clean_characteristics_year, characteristics_dir, years, executor, 'characteristics'):
+        collected.add(year, df)
     
-    for file in sorted_files:
-        file_path = os.path.join(admissions_dir, file)
+    return collected.result()
+
+
+def clean_admissions_year(file_path, year) -> pd.DataFrame:
+    '''cleans one year's admissions file; see `clean_admissions`.'''
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    rename_dict = VARIABLE_RENAME['admissions']
+
+    with span('read_csv', subject='admissions', year=year) as stage:
         df = pd.read_csv(file_path, dtype=str) # read in df
-        df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
-        df.columns = df.columns.str.strip() # some column names have right spaces
-        year_num = re.split(r'_|\.', f'{file}')[1]
-        
-        cols_to_filter = [col for col in rename_dict.keys() if col in df.columns] # cols to filter per year
-        df_filtered = df.reindex(columns=cols_to_filter)
-        df_filtered = df_filtered.rename(columns=rename_dict) # rename cols
+        stage.set(rows=len(df), bytes=os.path.getsize(file_path))
+    df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
+    df.columns = df.columns.str.strip() # some column names have right spaces
+    
+    cols_to_filter = [col for col in rename_dict.keys() if col in df.columns] # cols to filter per year
+    df_filtered = df.reindex(columns=cols_to_filter)
+    df_filtered = df_filtered.rename(columns=rename_dict) # rename cols
 
+    with span('to_numeric', subject='admissions', year=year):
         for col in df_filtered.columns:
             if col == 'id':
                 df_filtered[col] = df_filtered[col].astype(str).str.strip() # id str
             else:
                 df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce')
 
-        if int(year_num) == 2001:
-            df_filtered['men_enrolled'] = df_filtered['men_ft_enrolled'] + df_filtered['men_pt_enrolled']
-            df_filtered['women_enrolled'] = df_filtered['women_ft_enrolled'] + df_filtered['women_pt_enrolled']
-        if 'tot_applied' not in df_filtered.columns:
-            df_filtered['tot_applied'] = df_filtered['men_applied'] + df_filtered['women_applied']
-            df_filtered['tot_admitted'] = df_filtered['men_admitted'] + df_filtered['women_admitted']
-            df_filtered['tot_enrolled'] = df_filtered['men_enrolled'] + df_filtered['women_enrolled']
-
-        for i in ['men', 'women']:
-            df_filtered[f'accept_rate_{i}'] = np.where(
-            df_filtered[f'{i}_applied'] == 0,
-            np.nan,
-            (df_filtered[f'{i}_admitted'] / df_filtered[f'{i}_applied'] * 100)
-            )
+    if year == 2001:
+        df_filtered['men_enrolled'] = df_filtered['men_ft_enrolled'] + df_filtered['men_pt_enrolled']
+        df_filtered['women_enrolled'] = df_filtered['women_ft_enrolled'] + df_filtered['women_pt_enrolled']
+    if 'tot_applied' not in df_filtered.columns:
+        df_filtered['tot_applied'] = df_filtered['men_applied'] + df_filtered['women_applied']
+        df_filtered['tot_admitted'] = df_filtered['men_admitted'] + df_filtered['women_admitted']
+        df_filtered['tot_enrolled'] = df_filtered['men_enrolled'] + df_filtered['women_enrolled']
+
+    for i in ['men', 'women']:
+        df_filtered[f'accept_rate_{i}'] = np.where(
+        df_filtered[f'{i}_applied'] == 0,
+        np.nan,
+        (df_filtered[f'{i}_admitted'] / df_filtered[f'{i}_applied'] * 100)
+        )
+
+        df_filtered[f'yield_rate_{i}'] = np.where(
+        df_filtered[f'{i}_admitted'] == 0,
+        np.nan,
+        (df_filtered[f'{i}_enrolled'] / df_filtered[f'{i}_admitted'] * 100)
+        )
     
-            df_filtered[f'yield_rate_{i}'] = np.where(
-            df_filtered[f'{i}_admitted'] == 0,
-            np.nan,
-            (df_filtered[f'{i}_enrolled'] / df_filtered[f'{i}_admitted'] * 100)
-            )
-        
-        df_filtered['year'] = int(year_num) # year identifier
-        df_filtered['men_applied_share'] = df_filtered['men_applied'] / df_filtered['tot_applied'] * 100
-        df_filtered['men_admitted_share'] = df_filtered['men_admitted'] / df_filtered['tot_admitted'] * 100
+    df_filtered['year'] = year # year identifier
+    df_filtered['men_applied_share'] = df_filtered['men_applied'] / df_filtered['tot_applied'] * 100
+    df_filtered['men_admitted_share'] = df_filtered['men_admitted'] / df_filtered['tot_admitted'] * 100
 
-        master_df = pd.concat([master_df, df_filtered], ignore_index=True)
-    
     # unneeded columns
-    admissions_df = master_df.drop(columns=['women_applied', 'women_admitted', 'women_enrolled',
+    df_filtered = df_filtered.drop(columns=['women_applied', 'women_admitted', 'women_enrolled',
                                             'men_ft_enrolled', 'men_pt_enrolled', 'women_ft_enrolled', 'women_pt_enrolled'],
                                    errors='ignore')
 
-    return admissions_df
+    return df_filtered
 
 
-def clean_enrollment(enrollment_dir = 'enrollmentdata', student_level = 'undergrad') -> pd.DataFrame:
-    '''cleans yearly enrollment data and returns complete student enrollment data
-
-    :enrollment_dir:        directory where raw enrollment data is located
-    :student_level:        level of enrollment; options include ['undergrad', 'grad']
+@traced('clean', subject='admissions')
+def clean_admissions(admissions_dir = 'admissionsdata', years=None, memory_limit=None, spill_dir=None, executor=None) -> pd.DataFrame:
+    '''cleans yearly admissions data and returns complete admissions data
+    
+    :admissions_dir:        directory where raw admissions data is located
+    :years:               only clean these years' files; defaults to every file in the directory
+    :memory_limit:        bytes (or a size like '2GB') of cleaned years to hold in memory; past it, years spill
+                          to disk and a `genpeds.spill.SpilledFrame` is returned instead of a DataFrame
+    :spill_dir:           directory spilled years are written under; defaults to the system's temp directory
+    :executor:            cleans years in parallel: 'thread', 'process', 'queue' or an executor object (see
+                          `genpeds.executors`); defaults to cleaning one year after another
     '''
     warnings.filterwarnings('ignore', category=FutureWarning)
-    sorted_files = sorted(os.listdir(enrollment_dir)) # unnecessary, but helps with error checking
+
+    collected = YearCollector('admissions', memory_limit, spill_dir)
+    
+    for year, df in clean_years(clean_admissions_year, admissions_dir, years, executor, 'admissions'):
+        collected.add(year, df)
+
+    return collected.result()
+
+
+def clean_enrollment_year(file_path, year, student_level='undergrad') -> pd.DataFrame:
+    '''cleans one year's enrollment file; see `clean_enrollment`.'''
+    warnings.filterwarnings('ignore', category=FutureWarning)
     rename_dict = VARIABLE_RENAME['enrollment']
 
     grad_rules = [
@@ -130,79 +213,97 @@ def clean_enrollment(enrollment_dir = 'enrollmentdata', student_level = 'undergr
         (lambda y: y in [1987,1988,1989], 'line in [14,28]'),
         (lambda y: y == 1999, 'line in [32,52,16]'),
         (lambda y:  y in range(2000,2009), 'line in [11,25,9,23]'),
-        (lambda y: y in range(2009,2024), 'line in [11,25]')
+        (lambda y: y >= 2009, 'line in [11,25]')
     ]
-    
-    master_df = pd.DataFrame()
 
-    for file in sorted_files:
-        file_path = os.path.join(enrollment_dir, file)
+    with span('read_csv', subject='enrollment', year=year) as stage:
         df = pd.read_csv(file_path, dtype=str) # read in df
-        df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
-        year_num = re.split(r'_|\.', f'{file}')[1]
-
-        if all(col in df.columns for col in ['efrace10', 'eftotlm']):
-            cols_to_filter = [col for col in rename_dict.keys() if 
-                              (col in df.columns) and ('efrace' not in col)] # annoying thing with duplicate cols in 
-                                                                                # some years
-        else:
-            cols_to_filter = [col for col in rename_dict.keys() if col in df.columns]
-            
+        stage.set(rows=len(df), bytes=os.path.getsize(file_path))
+    df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
+
+    if all(col in df.columns for col in ['efrace10', 'eftotlm']):
+        cols_to_filter = [col for col in rename_dict.keys() if 
+                          (col in df.columns) and ('efrace' not in col)] # annoying thing with duplicate cols in 
+                                                                            # some years
+    else:
+        cols_to_filter = [col for col in rename_dict.keys() if col in df.columns]
+        
 
-        df_filtered = df.reindex(columns=cols_to_filter)
-        df_filtered = df_filtered.rename(columns=rename_dict) # rename cols
+    df_filtered = df.reindex(columns=cols_to_filter)
+    df_filtered = df_filtered.rename(columns=rename_dict) # rename cols
 
+    with span('to_numeric', subject='enrollment', year=year):
         for col in df_filtered.columns:
             if col == 'id':
                 df_filtered[col] = df_filtered[col].astype(str).str.strip() # id identifier
             else:
                 df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce')
 
-        if student_level == 'undergrad':
-            if int(year_num) < 1986:
-                student_query = 'line == 1 or line == 15' # captures total full-time and total part-time undergrads, respectively
-            else:
-                student_query = 'line == 8 or line == 22' 
-        elif student_level == 'grad':
-            for cond,frmt in grad_rules:
-                if cond(int(year_num)):
-                    student_query = frmt # captures full-time and part-time graduate and first-professional students
-                    break
-            else:
-                raise ValueError(f'No formatted rule for year {year_num}')
+    if student_level == 'undergrad':
+        if year < 1986:
+            student_query = 'line == 1 or line == 15' # captures total full-time and total part-time undergrads, respectively
         else:
-            raise ValueError("student_level must be 'undergrad' or 'grad' ")
+            student_query = 'line == 8 or line == 22' 
+    elif student_level == 'grad':
+        for cond,frmt in grad_rules:
+            if cond(year):
+                student_query = frmt # captures full-time and part-time graduate and first-professional students
+                break
+        else:
+            raise ValueError(f'No formatted rule for year {year}')
+    else:
+        raise ValueError("student_level must be 'undergrad' or 'grad' ")
 
+    with span('query', subject='enrollment', year=year) as stage:
         students = df_filtered.query(student_query) # filter data to total students
-        
-        if 'wtmen' not in students.columns:
-            cols_to_sum = ['totmen', 'totwomen']
-        else:
-            cols_to_sum = ['totmen', 'totwomen', 'wtmen', 'wtwomen','bkmen', 'bkwomen','hspmen', 'hspwomen','asnmen', 'asnwomen']
-        
+        stage.set(rows=len(students))
+    
+    if 'wtmen' not in students.columns:
+        cols_to_sum = ['totmen', 'totwomen']
+    else:
+        cols_to_sum = ['totmen', 'totwomen', 'wtmen', 'wtwomen','bkmen', 'bkwomen','hspmen', 'hspwomen','asnmen', 'asnwomen']
+    
+    with span('groupby', subject='enrollment', year=year) as stage:
         students_by_inst = students.groupby('id')[cols_to_sum].sum() # sum full-time and part-time students by school
-        students_by_inst = students_by_inst.eval('totmen_share = totmen / (totmen + totwomen) * 100').reset_index() # male student share
-        students_by_inst['year'] = int(year_num) # get year marker for each set
-        students_by_inst['studentlevel'] = student_level # get student level identifier
-
-        if 'wtmen' in students_by_inst.columns:
-            for attr in ['wt', 'bk', 'hsp', 'asn']:
-                eval_str = f'tot{attr}_share = ({attr}men + {attr}women) / (totmen + totwomen) * 100' # race share breakdowns
-                students_by_inst = students_by_inst.eval(eval_str)
+        stage.set(rows=len(students_by_inst))
+    students_by_inst = students_by_inst.eval('totmen_share = totmen / (totmen + totwomen) * 100').reset_index() # male student share
+    students_by_inst['year'] = year # get year marker for each set
+    students_by_inst['studentlevel'] = student_level # get student level identifier
 
-        master_df = pd.concat([master_df, students_by_inst], ignore_index=True)
+    if 'wtmen' in students_by_inst.columns:
+        for attr in ['wt', 'bk', 'hsp', 'asn']:
+            eval_str = f'tot{attr}_share = ({attr}men + {attr}women) / (totmen + totwomen) * 100' # race share breakdowns
+            students_by_inst = students_by_inst.eval(eval_str)
 
-    return master_df
+    return students_by_inst
 
 
-def clean_completion(completion_dir = 'completiondata', level = 'bach') -> pd.DataFrame:
-    '''cleans yearly completion data and returns complete completions data
+@traced('clean', subject='enrollment')
+def clean_enrollment(enrollment_dir = 'enrollmentdata', student_level = 'undergrad', years=None, memory_limit=None, spill_dir=None, executor=None) -> pd.DataFrame:
+    '''cleans yearly enrollment data and returns complete student enrollment data
 
-    :completion_dir:        directory where raw completion data is located
-    :level:                 level of degree, options include ['assc', 'bach', 'mast', 'doct']
+    :enrollment_dir:        directory where raw enrollment data is located
+    :student_level:        level of enrollment; options include ['undergrad', 'grad']
+    :years:               only clean these years' files; defaults to every file in the directory
+    :memory_limit:        bytes (or a size like '2GB') of cleaned years to hold in memory; past it, years spill
+                          to disk and a `genpeds.spill.SpilledFrame` is returned instead of a DataFrame
+    :spill_dir:           directory spilled years are written under; defaults to the system's temp directory
+    :executor:            cleans years in parallel: 'thread', 'process', 'queue' or an executor object (see
+                          `genpeds.executors`); defaults to cleaning one year after another
     '''
     warnings.filterwarnings('ignore', category=FutureWarning)
-    sorted_files = sorted(os.listdir(completion_dir)) # unnecessary, but helps with error checking
+
+    collected = YearCollector('enrollment', memory_limit, spill_dir)
+
+    for year, df in clean_years(clean_enrollment_year, enrollment_dir, years, executor, 'enrollment', student_level=student_level):
+        collected.add(year, df)
+
+    return collected.result()
+
+
+def clean_completion_year(file_path, year, level='bach') -> pd.DataFrame:
+    '''cleans one year's completion file; see `clean_completion`.'''
+    warnings.filterwarnings('ignore', category=FutureWarning)
     rename_dict = VARIABLE_RENAME['completion']
 
     deglevel_rules = [
@@ -212,52 +313,75 @@ def clean_completion(completion_dir = 'completiondata', level = 'bach') -> pd.Da
         (lambda l,y: (l == 'doct') and (y < 2010), 'awlevel == 9'),
         (lambda l,y: (l == 'doct') and (y >= 2010), 'awlevel >= 17 and awlevel <= 19')
     ]
-    
-    master_df = pd.DataFrame()
 
-    for file in sorted_files:
-        file_path = os.path.join(completion_dir, file)
+    with span('read_csv', subject='completion', year=year) as stage:
         df = pd.read_csv(file_path, dtype=str) # read in df
-        df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
-        year_num = re.split(r'_|\.', f'{file}')[1]
-        
-        if all(col in df.columns for col in ['crace10', 'ctotalm']):
-            cols_to_filter = [col for col in rename_dict.keys() if 
-                              (col in df.columns) and ('crace' not in col)] # annoying thing with duplicate cols in 
-                                                                                # some years
-        else:
-            cols_to_filter = [col for col in rename_dict.keys() if col in df.columns]
-
-        df_filtered = df.reindex(columns=cols_to_filter)
-        df_filtered = df_filtered.rename(columns=rename_dict)
+        stage.set(rows=len(df), bytes=os.path.getsize(file_path))
+    df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
+    
+    if all(col in df.columns for col in ['crace10', 'ctotalm']):
+        cols_to_filter = [col for col in rename_dict.keys() if 
+                          (col in df.columns) and ('crace' not in col)] # annoying thing with duplicate cols in 
+                                                                            # some years
+    else:
+        cols_to_filter = [col for col in rename_dict.keys() if col in df.columns]
+
+    df_filtered = df.reindex(columns=cols_to_filter)
+    df_filtered = df_filtered.rename(columns=rename_dict)
+    with span('to_numeric', subject='completion', year=year):
         for col in df_filtered:
             if col not in ['id', 'cip']:
                 df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce')
-        
-        for cond,frmt in deglevel_rules:
-            if cond(level, int(year_num)):
-                level_query = frmt
-                break
-        else:
-            raise ValueError("level must be 'assc', 'bach', 'mast' or 'doct'") 
-        
+    
+    for cond,frmt in deglevel_rules:
+        if cond(level, year):
+            level_query = frmt
+            break
+    else:
+        raise ValueError("level must be 'assc', 'bach', 'mast' or 'doct'") 
+    
+    with span('query', subject='completion', year=year) as stage:
         completions = df_filtered.query(level_query)
-        race_cols = [col for col in completions.columns if 'men' in col] # race columns to group
+        stage.set(rows=len(completions))
+    race_cols = [col for col in completions.columns if 'men' in col] # race columns to group
+    with span('groupby', subject='completion', year=year) as stage:
         completions = completions.groupby(['id', 'cip'])[race_cols].sum().reset_index()
+        stage.set(rows=len(completions))
 
-        completions = completions.eval('totmen_share = totmen / (totmen + totwomen) * 100') # maleshare within each major
-        if 'wtmen' in completions.columns:
-            for attr in ['wt', 'bk', 'hsp', 'asn']:
-                eval_str = f'tot{attr}_share = ({attr}men + {attr}women) / (totmen + totwomen) * 100' # race share breakdowns
-                completions = completions.eval(eval_str)
-        
-        completions['deglevel'] = level # adds level identifier
-        completions['year'] = int(year_num) # adds year identifier
-        completions['cip'] = completions['cip'].astype(str).str.strip()
-        
-        master_df = pd.concat([master_df, completions], ignore_index=True)
+    completions = completions.eval('totmen_share = totmen / (totmen + totwomen) * 100') # maleshare within each major
+    if 'wtmen' in completions.columns:
+        for attr in ['wt', 'bk', 'hsp', 'asn']:
+            eval_str = f'tot{attr}_share = ({attr}men + {attr}women) / (totmen + totwomen) * 100' # race share breakdowns
+            completions = completions.eval(eval_str)
+    
+    completions['deglevel'] = level # adds level identifier
+    completions['year'] = year # adds year identifier
+    completions['cip'] = completions['cip'].astype(str).str.strip()
+
+    return completions
 
-    return master_df
+
+@traced('clean', subject='completion')
+def clean_completion(completion_dir = 'completiondata', level = 'bach', years=None, memory_limit=None, spill_dir=None, executor=None) -> pd.DataFrame:
+    '''cleans yearly completion data and returns complete completions data
+
+    :completion_dir:        directory where raw completion data is located
+    :level:                 level of degree, options include ['assc', 'bach', 'mast', 'doct']
+    :years:               only clean these years' files; defaults to every file in the directory
+    :memory_limit:        bytes (or a size like '2GB') of cleaned years to hold in memory; past it, years spill
+                          to disk and a `genpeds.spill.SpilledFrame` is returned instead of a DataFrame
+    :spill_dir:           directory spilled years are written under; defaults to the system's temp directory
+    :executor:            cleans years in parallel: 'thread', 'process', 'queue' or an executor object (see
+                          `genpeds.executors`); defaults to cleaning one year after another
+    '''
+    warnings.filterwarnings('ignore', category=FutureWarning)
+
+    collected = YearCollector('completion', memory_limit, spill_dir)
+
+    for year, df in clean_years(clean_completion_year, completion_dir, years, executor, 'completion', level=level):
+        collected.add(year, df)
+
+    return collected.result()
 
 
 def clean_cip_html(file_path):
@@ -282,20 +406,13 @@ def clean_cip_html(file_path):
         return label_dict
 
 
-def clean_cip(cip_codes_dir = 'cipdata') -> pd.DataFrame:
-    '''cleans yearly CIP data and returns full dataframe
-
-    :cip_codes_dir: directory where raw CIP data is located
-    '''
+def clean_cip_year(file_path, year) -> pd.DataFrame:
+    '''cleans one year's CIP dictionary (html or Excel); see `clean_cip`.'''
     warnings.filterwarnings('ignore', category=FutureWarning)
     warnings.filterwarnings('ignore', category=UserWarning)
-    sorted_files = sorted(os.listdir(cip_codes_dir))
-    master_df = pd.DataFrame()
+    ext = file_path.rsplit('.', 1)[-1]
 
-    for file in sorted_files:
-        file_path = os.path.join(cip_codes_dir, file)
-        year_num = re.split(r'_|\.', f'{file}')[1]
-        ext = re.split(r'_|\.', f'{file}')[2]
+    with span(f'read_{ext}', subject='cip', year=year) as stage:
         if ext == 'html':
             html_dict = clean_cip_html(file_path=file_path)
             df = pd.DataFrame({'cip_description' : html_dict.values(),
@@ -304,82 +421,161 @@ def clean_cip(cip_codes_dir = 'cipdata') -> pd.DataFrame:
             df = pd.read_excel(file_path, sheet_name='Frequencies', dtype=str)
             df = df.query('varname == "CIPCODE" or varname == "Cipcode"').loc[:, ['codevalue', 'valuelabel']]
             df = df.rename(columns={'codevalue' : 'cip', 'valuelabel' : 'cip_description'})
-        df['year'] = int(year_num) # year identifier
-        
-        master_df = pd.concat([master_df, df], ignore_index=True)
-        master_df['cip'] = master_df['cip'].astype(str).str.strip() # strip spaces
-        master_df['cip_description'] = master_df['cip_description'].str.title().replace(r'^(\d+)\s-\s', '', regex=True)
+        stage.set(rows=len(df), bytes=os.path.getsize(file_path))
+    df['year'] = year # year identifier
+    df['cip'] = df['cip'].astype(str).str.strip() # strip spaces
+    df['cip_description'] = df['cip_description'].str.title().replace(r'^(\d+)\s-\s', '', regex=True)
 
-    return master_df
+    return df
 
 
-def clean_graduation(graduation_dir = 'graduationdata', deg_level='bach') -> pd.DataFrame:
-    '''cleans yearly graduation data and returns complete graduation data
+@traced('clean', subject='cip')
+def clean_cip(cip_codes_dir = 'cipdata', years=None, memory_limit=None, spill_dir=None, executor=None) -> pd.DataFrame:
+    '''cleans yearly CIP data and returns full dataframe
 
-    :graduation_dir:        directory where raw completion data is located
-    :deg_level:        degree level; options include ['assc', 'bach']
+    :cip_codes_dir: directory where raw CIP data is located
+    :years:               only clean these years' files; defaults to every file in the directory
+    :memory_limit:        bytes (or a size like '2GB') of cleaned years to hold in memory; past it, years spill
+                          to disk and a `genpeds.spill.SpilledFrame` is returned instead of a DataFrame
+    :spill_dir:           directory spilled years are written under; defaults to the system's temp directory
+    :executor:            cleans years in parallel: 'thread', 'process', 'queue' or an executor object (see
+                          `genpeds.executors`); defaults to cleaning one year after another
     '''
     warnings.filterwarnings('ignore', category=FutureWarning)
-    sorted_files = sorted(os.listdir(graduation_dir)) # unnecessary, but helps with error checking
+    warnings.filterwarnings('ignore', category=UserWarning)
+    collected = YearCollector('cip', memory_limit, spill_dir)
+
+    for year, df in clean_years(clean_cip_year, cip_codes_dir, years, executor, 'cip'):
+        collected.add(year, df)
+
+    return collected.result()
+
+
+def reshape_graduation(grads, cohort_type, window_types, value_cols):
+    '''reshapes long graduation rows (one row per id and grtype) into one row per id, with cohort,
+    graduated and graduation rate columns for each completion window.
+
+    :grads:            graduation rows for a single year, filtered to the relevant section
+    :cohort_type:      grtype of the adjusted cohort rows
+    :window_types:     dict of completion window (percent of normal time) -> grtype of completers
+    :value_cols:       cohort/completer columns to reshape, e.g. ['totmen', 'totwomen']
+    '''
+    grtypes = [cohort_type] + list(window_types.values())
+    grads = grads.loc[grads['grtype'].isin(grtypes)]
+    duplicated = grads.duplicated(['id', 'grtype'])
+    if duplicated.any():
+        raise ValueError(f'{duplicated.sum()} graduation rows repeat an (id, grtype) pair, '
+                         f"e.g. id {grads.loc[duplicated, 'id'].iloc[0]}")
+
+    id_codes, ids = pd.factorize(grads['id'], sort=True) # integer id per row, sorted like the old pivot
+    type_codes = pd.Index(grtypes).get_indexer(grads['grtype']) # grtype -> position in cube
+    values = grads.reindex(columns=value_cols).to_numpy(dtype='float64') # missing race cols become NaN
+    has_id = id_codes >= 0
+
+    cube = np.full((len(ids), len(grtypes), len(value_cols)), np.nan) # id x grtype x value
+    cube[id_codes[has_id], type_codes[has_id]] = values[has_id]
+
+    cohort = cube[:, 0, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = cube[:, 1:, :] / cohort[:, np.newaxis, :] * 100 # every window in one go
+
+    suffixes = ['' if window == 150 else f'_{window}' for window in window_types] # 150% keeps original names
+    columns = {'id' : ids.to_numpy()}
+    for v_idx, col in enumerate(value_cols):
+        columns[col] = cohort[:, v_idx] # float64, as the old pivot returned
+        for w_idx, suffix in enumerate(suffixes):
+            columns[f'{col}_graduated{suffix}'] = cube[:, w_idx + 1, v_idx]
+    for v_idx, col in enumerate(value_cols):
+        for w_idx, suffix in enumerate(suffixes):
+            columns[f'gradrate_{col}{suffix}'] = rates[:, w_idx, v_idx]
+
+    return pd.DataFrame(columns)
+
+
+def graduation_types(deg_level, windows) -> tuple:
+    '''returns (section, adjusted cohort grtype, dict of window -> completer grtype) for a degree level,
+    raising ValueError for unknown levels or windows.'''
+    # section, adjusted cohort grtype and completer grtype for each window
+    grtype_rules = {
+        'bach' : (2, 8, {150 : 9, 100 : 13}),
+        'assc' : (4, 29, {150 : 30, 100 : 35})
+    }
+    if deg_level not in grtype_rules:
+        raise ValueError("deg_level must be 'assc' or 'bach'")
+    section, cohort_type, level_windows = grtype_rules[deg_level]
+    
+    windows = [windows] if isinstance(windows, int) else list(windows)
+    for window in windows:
+        if window not in level_windows:
+            raise ValueError(f'windows must be in {sorted(level_windows)}; 200 percent completions are '
+                             'published in the separate GR200 files')
+    return section, cohort_type, {window : level_windows[window] for window in windows}
+
+
+def clean_graduation_year(file_path, year, deg_level='bach', windows=(150,)) -> pd.DataFrame:
+    '''cleans one year's graduation file; see `clean_graduation`.'''
+    warnings.filterwarnings('ignore', category=FutureWarning)
     rename_dict = VARIABLE_RENAME['graduation']
-    master_df = pd.DataFrame()
+    value_cols = ['totmen', 'totwomen', 'wtmen', 'wtwomen', 'bkmen', 'bkwomen',
+                  'hspmen', 'hspwomen', 'asnmen', 'asnwomen']
+    section, cohort_type, window_types = graduation_types(deg_level, windows)
 
-    for file in sorted_files:
-        file_path = os.path.join(graduation_dir, file)
+    with span('read_csv', subject='graduation', year=year) as stage:
         df = pd.read_csv(file_path, dtype=str) # read in df
-        df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
-        year_num = re.split(r'_|\.', f'{file}')[1]
-
-        if all(col in df.columns for col in ['grrace10', 'grtotlm']):
-            cols_to_filter = [col for col in rename_dict.keys() if 
-                              (col in df.columns) and ('grrace' not in col)] # annoying thing with duplicate cols in 
-                                                                                # some years
-        else:
-            cols_to_filter = [col for col in rename_dict.keys() if col in df.columns]
-        df_filtered = df.reindex(columns=cols_to_filter)
-        df_filtered = df_filtered.rename(columns=rename_dict)
-        
+        stage.set(rows=len(df), bytes=os.path.getsize(file_path))
+    df = df.rename(str.lower, axis='columns') # some df's have all uppercase, some have all lowercase
+
+    if all(col in df.columns for col in ['grrace10', 'grtotlm']):
+        cols_to_filter = [col for col in rename_dict.keys() if 
+                          (col in df.columns) and ('grrace' not in col)] # annoying thing with duplicate cols in 
+                                                                            # some years
+    else:
+        cols_to_filter = [col for col in rename_dict.keys() if col in df.columns]
+    df_filtered = df.reindex(columns=cols_to_filter)
+    df_filtered = df_filtered.rename(columns=rename_dict)
+    
+    with span('to_numeric', subject='graduation', year=year):
         for col in df_filtered.columns:
             if col != 'id':
                 df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce') # convert cols to float
-        
-        if deg_level == 'bach':
-            deg_query = '(8 <= grtype <= 9) and (12 <= chrtstat <= 13) and section == 2'
-            denom = 8
-            num = 9
-        elif deg_level == 'assc':
-            deg_query = '(29 <= grtype <= 30) and (12 <= chrtstat <= 13) and section == 4'
-            denom = 29
-            num = 30
-        else:
-            raise  ValueError("deg_level must be 'assc', 'bach', 'mast' or 'doct'")
-
-        grads = df_filtered.query(deg_query)
-        pivoted_grads = grads.pivot(index='id', columns='grtype', values=['totmen', 'totwomen', # get cohort and grads
-                                                                                        'wtmen', 'wtwomen',
-                                                                                        'bkmen', 'bkwomen',
-                                                                                        'hspmen', 'hspwomen',
-                                                                                        'asnmen', 'asnwomen'])
-        for i in ['tot', 'wt', 'bk', 'hsp', 'asn']:
-            pivoted_grads[f'gradrate_{i}men'] = (pivoted_grads[f'{i}men'][num] /    
-                                                     pivoted_grads[f'{i}men'][denom] * 100)
-            
-            pivoted_grads[f'gradrate_{i}women'] = (pivoted_grads[f'{i}women'][num] / 
-                                                     pivoted_grads[f'{i}women'][denom] * 100) # grad rates
-        pivoted_grads = pivoted_grads.reset_index()
-
-        rnm_columns = pivoted_grads.columns.droplevel(1).tolist() # renaming columns
-        for i in range(len(rnm_columns)):
-            if rnm_columns[i] == rnm_columns[i - 1]:
-                rnm_columns[i] = f'{rnm_columns[i]}_graduated'
-        pivoted_grads.columns = rnm_columns
-        
-        pivoted_grads['year'] = int(year_num) # get year identifiers
-        pivoted_grads['deglevel'] = deg_level
 
-        master_df = pd.concat([master_df, pivoted_grads], ignore_index=True)
+    grads = df_filtered.loc[df_filtered['section'] == section]
+    statuses = {cohort_type : 12, window_types.get(150) : 13} # adjusted cohort and 150% completer rows only
+    expected = grads['grtype'].map(statuses)
+    grads = grads.loc[expected.isna() | (grads['chrtstat'] == expected)]
+    with span('reshape', subject='graduation', year=year) as stage:
+        grads = reshape_graduation(grads, cohort_type, window_types, value_cols) # cohort, grads and rates
+        stage.set(rows=len(grads))
+    
+    grads['year'] = year # get year identifiers
+    grads['deglevel'] = deg_level
+
+    return grads
+
+
+@traced('clean', subject='graduation')
+def clean_graduation(graduation_dir = 'graduationdata', deg_level='bach', windows=(150,), years=None, memory_limit=None, spill_dir=None, executor=None) -> pd.DataFrame:
+    '''cleans yearly graduation data and returns complete graduation data
+
+    :graduation_dir:        directory where raw completion data is located
+    :deg_level:        degree level; options include ['assc', 'bach']
+    :windows:        completion windows, as percent of normal time; options include [100, 150]
+    :years:               only clean these years' files; defaults to every file in the directory
+    :memory_limit:        bytes (or a size like '2GB') of cleaned years to hold in memory; past it, years spill
+                          to disk and a `genpeds.spill.SpilledFrame` is returned instead of a DataFrame
+    :spill_dir:           directory spilled years are written under; defaults to the system's temp directory
+    :executor:            cleans years in parallel: 'thread', 'process', 'queue' or an executor object (see
+                          `genpeds.executors`); defaults to cleaning one year after another
+    '''
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    graduation_types(deg_level, windows) # check options before any year is read
+
+    collected = YearCollector('graduation', memory_limit, spill_dir)
+
+    for year, df in clean_years(clean_graduation_year, graduation_dir, years, executor, 'graduation', deg_level=deg_level, windows=windows):
+        collected.add(year, df)
     
-    return master_df
+    return collected.result()
         
 
 CLEANERS = {
@@ -1,12 +1,27 @@
-from genpeds.downloader import scrape_ipeds_data
 import argparse
+import importlib.util
+import os
+import sys
 
 '''simple and doesn't handle many errors at the moment,
-but it'll do for now.'''
+but it'll do for now.
+
+genpeds modules (and pandas, requests, ...) are imported inside each command,
+so `genpeds-cli --help` starts quickly.'''
+
+SUBJECTS = ['characteristics', 'admissions', 'enrollment', 'cip', 'completion', 'graduation']
+FORMATS = ['csv', 'parquet', 'feather'] # parquet and feather need pyarrow
+LEVELS = {
+    'enrollment' : ['undergrad', 'grad'],
+    'completion' : ['assc', 'bach', 'mast', 'doct'],
+    'graduation' : ['assc', 'bach']
+}
+EXECUTOR_HELP = ("runs the work on each subject's years: thread (default), process, queue or "
+                 'queue:<path> for a work queue run by `genpeds-cli worker`')
 
 def parse_years(year_str):
     '''parse year argument
-    
+
     years take:
     1. range, ie. 2001-2023
     2. list, ie. [2022,2023,1990]
@@ -22,28 +37,234 @@ def parse_years(year_str):
         )
     elif len(year_str) > 1:
         yrs_iter = [int(yr) for yr in year_str]
-    
+
     return yrs_iter
 
-def main():
-    parser = argparse.ArgumentParser('genpeds', description='NCES IPEDS subject-data scraper')
-    parser.add_argument('subject', 
-                        choices=['characteristics', 'admissions', 'enrollment', 
-                                            'cip', 'completion', 'graduation'],
-                        help=('IPEDS data subject to download. Options include:\n'
-                        '[characteristics, admissions, enrollment, cip, completion, graduation]'))
+def parse_subject(spec):
+    '''parse subject argument, with optional level after a colon, ie. completion:bach'''
+    subject, _, level = spec.partition(':')
+    if subject not in SUBJECTS:
+        raise argparse.ArgumentTypeError(f"subject must be in {SUBJECTS}, not '{subject}'")
+    if level and subject not in LEVELS:
+        raise argparse.ArgumentTypeError(f'{subject} data has no levels')
+    if level and level not in LEVELS[subject]:
+        raise argparse.ArgumentTypeError(f"{subject} level must be in {LEVELS[subject]}, not '{level}'")
+    return subject, level or None
+
+def check_format(parser, args):
+    '''exit with a usage error when the output format needs pyarrow and it isn't installed'''
+    if getattr(args, 'format', 'csv') != 'csv' and importlib.util.find_spec('pyarrow') is None:
+        parser.error(f"--format {args.format} needs pyarrow; install it with `pip install 'genpeds[arrow]'`")
+
+def write_frame(df, path, fmt):
+    '''write DataFrame to path as csv, parquet or feather'''
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path)
+
+def write_results(results, output_dir, fmt):
+    '''write dict of name -> DataFrame to output_dir, one {name}.{fmt} file each'''
+    os.makedirs(output_dir, exist_ok=True)
+    for name, df in results.items():
+        write_frame(df, os.path.join(output_dir, f'{name}.{fmt}'), fmt)
+
+def add_years(parser, required=False):
     parser.add_argument('-y', '--years',
-                        required=True, 
+                        required=required,
+                        nargs='+',
+                        help=('years of IPEDS subject data. Can take '
+                              'range, ie. 2001-2023 or list, ie. 2022 2023 1990 or single year, ie. 2017'
+                              + ('' if required else '; defaults to all available years')))
+
+def add_metrics(parser):
+    parser.add_argument('--metrics', help='append timing spans per subject-year and stage to this JSON lines file')
+    parser.add_argument('--prometheus', help='write stage totals to this Prometheus text file')
+    parser.add_argument('--progress', action='store_true', help='draw a progress bar of downloads on stderr')
+    parser.add_argument('--memory-profile', help='write peak and retained memory per cleaning stage and year to this JSON file')
+
+def add_output(parser, output_help, default_output):
+    parser.add_argument('-o', '--output', default=default_output, help=output_help)
+    parser.add_argument('-f', '--format', choices=FORMATS, default='csv',
+                        help="output file format; parquet and feather need pyarrow (pip install 'genpeds[arrow]')")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='number of worker threads')
+    parser.add_argument('--executor', help=EXECUTOR_HELP)
+    parser.add_argument('--rm-disk', action='store_true', help='remove downloaded data afterwards')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print progress')
+    add_metrics(parser)
+
+def build_parser():
+    parser = argparse.ArgumentParser('genpeds', description='NCES IPEDS subject-data scraper')
+    commands = parser.add_subparsers(dest='command', required=True)
+    subject_help = ('IPEDS data subjects, with an optional level after a colon, ie. completion:bach enrollment:grad. '
+                    'Subjects include [characteristics, admissions, enrollment, cip, completion, graduation]')
+
+    scrape = commands.add_parser('scrape', help='download IPEDS subject data')
+    scrape.add_argument('subject',
                         nargs='+',
-                        help=('years of IPEDS subject data to download. Can take '
-                              'range, ie. 2001-2023 or list, ie. 2022 2023 1990 or single year, ie. 2017'))
-    
-    args = parser.parse_args()
-    cleaned_yrs = parse_years(args.years) 
-    scrape_ipeds_data(
-        subject=args.subject,
-        year_range=cleaned_yrs
-    )
-    
+                        choices=SUBJECTS,
+                        help=('IPEDS data subjects to download. Options include:\n'
+                        '[characteristics, admissions, enrollment, cip, completion, graduation]'))
+    add_years(scrape, required=True)
+    scrape.add_argument('-j', '--jobs', type=int, default=1, help='number of subjects downloaded at the same time')
+    scrape.add_argument('--executor', help=EXECUTOR_HELP)
+    add_metrics(scrape)
+
+    for command, command_help in [('clean', 'clean downloaded subject data and write it to files'),
+                                  ('run', 'download and clean subject data and write it to files')]:
+        sub = commands.add_parser(command, help=command_help)
+        sub.add_argument('subject', nargs='+', type=parse_subject, help=subject_help)
+        add_years(sub)
+        sub.add_argument('--windows', nargs='+', type=int, help='graduation completion windows, ie. 150 100')
+        sub.add_argument('--merge-char', action='store_true', help='merge with Characteristics data')
+        sub.add_argument('--no-cip', action='store_true', help="don't merge Completion data with CIP labels")
+        add_output(sub, 'directory for one {subject}_{level}.{format} file per subject', '.')
+
+    export = commands.add_parser('export', help='download, clean and join subjects into one institution-year fact table')
+    export.add_argument('subject', nargs='+', type=parse_subject, help=subject_help)
+    add_years(export)
+    export.add_argument('--no-char', action='store_true', help="don't add Characteristics data")
+    add_output(export, 'output file; defaults to facts.{format}', None)
+
+    batch = commands.add_parser('batch', help='run a JSON/YAML spec of jobs, sharing downloads and cleans')
+    batch.add_argument('spec', help='path to a JSON (or YAML) list of jobs, e.g. [{"subject": "enrollment", "level": "grad"}]')
+    add_output(batch, 'directory for one {job name}.{format} file per job', '.')
+
+    serve = commands.add_parser('serve', help='serve cleaned subject data over HTTP')
+    serve.add_argument('--host', default='127.0.0.1', help='address to bind; defaults to localhost only')
+    serve.add_argument('-p', '--port', type=int, default=8000, help='port to bind')
+    serve.add_argument('--cache-mb', type=int, default=256, help='size limit of the result cache, in megabytes')
+
+    refresh = commands.add_parser('refresh', help='download again the years NCES revised since they were downloaded')
+    refresh.add_argument('subject', nargs='+', type=parse_subject, help=subject_help)
+    add_years(refresh)
+    refresh.add_argument('-v', '--verbose', action='store_true', help='print progress')
+    add_metrics(refresh)
+
+    discover = commands.add_parser('discover', help='probe NCES for years released after the last known year')
+    discover.add_argument('subject', nargs='*', choices=SUBJECTS, default=SUBJECTS, help='subjects to probe; defaults to all')
+    discover.add_argument('--refresh', action='store_true', help='probe again even if the catalog was checked recently')
+
+    worker = commands.add_parser('worker', help='run downloads and cleaning queued by executor=queue:<path>')
+    worker.add_argument('queue', help='SQLite queue file, on a filesystem shared with the submitting machine')
+    worker.add_argument('--idle-timeout', type=float, help='stop after this many seconds without work; defaults to never')
+
+    mock = commands.add_parser('mock-nces', help='serve synthetic IPEDS files under the NCES URL layout, for offline testing')
+    mock.add_argument('--host', default='127.0.0.1', help='address to bind; defaults to localhost only')
+    mock.add_argument('-p', '--port', type=int, default=8001, help='port to bind')
+    mock.add_argument('--latency', type=float, default=0.0, help='seconds before each response')
+    mock.add_argument('--bandwidth-kb', type=float, help='per-response bandwidth cap, in kilobytes per second')
+    mock.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with --error-status')
+    mock.add_argument('--error-status', type=int, default=503, help='HTTP status of injected errors; 0 drops the connection')
+    mock.add_argument('--fail-first', type=int, default=0, help='failed requests per file before it is served')
+    mock.add_argument('--missing', nargs='+', type=int, default=[], help='years answered with the NCES 404 page')
+    mock.add_argument('--institutions', type=int, default=1000, help='institutions in the synthetic files')
+    return parser
+
+def subject_jobs(args):
+    '''build batch job specs from clean/run arguments'''
+    years = parse_years(args.years) if args.years else None
+    jobs = []
+    for subject, level in dict.fromkeys(args.subject):
+        job = {'subject' : subject, 'years' : years, 'level' : level, 'merge_with_char' : args.merge_char}
+        if subject == 'completion':
+            job['get_cip_codes'] = not args.no_cip
+        if subject == 'graduation' and args.windows:
+            job['windows'] = args.windows
+        jobs.append(job)
+    return jobs
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in SUBJECTS: # original form: genpeds <subject> -y <years>
+        argv = ['scrape'] + argv
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_format(parser, args)
+
+    if getattr(args, 'metrics', None) or getattr(args, 'prometheus', None):
+        from genpeds import metrics
+        if args.metrics:
+            metrics.add_hook(metrics.JsonLinesExporter(args.metrics))
+        if args.prometheus:
+            metrics.add_hook(metrics.PrometheusExporter(args.prometheus))
+
+    profile = None
+    if getattr(args, 'memory_profile', None):
+        from genpeds.profiling import MemoryProfile
+        profile = MemoryProfile().start()
+
+    on_event = None
+    if getattr(args, 'progress', False):
+        from genpeds.events import ProgressBar
+        on_event = ProgressBar()
+
+    if args.command == 'scrape':
+        import concurrent.futures
+        from genpeds import downloader
+        cleaned_yrs = parse_years(args.years)
+        kwargs = {'on_event' : on_event} if on_event else {}
+        if args.executor:
+            kwargs['executor'] = args.executor
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            for future in [pool.submit(downloader.scrape_ipeds_data, subject=subject, year_range=cleaned_yrs, **kwargs)
+                           for subject in dict.fromkeys(args.subject)]:
+                future.result()
+    elif args.command in ['clean', 'run', 'batch']:
+        from genpeds.batch import BatchPlan, load_jobs
+        try:
+            plan = BatchPlan(load_jobs(args.spec) if args.command == 'batch' else subject_jobs(args),
+                             download=args.command != 'clean')
+        except ValueError as error:
+            parser.error(str(error))
+        results = plan.run(workers=args.jobs, see_progress=args.verbose, rm_disk=args.rm_disk, on_event=on_event,
+                           executor=args.executor)
+        write_results(results, args.output, args.format)
+    elif args.command == 'export':
+        from genpeds.facts import build_fact_table
+        joined = [subject for subject, _ in args.subject if subject in ['characteristics', 'cip']]
+        if joined:
+            parser.error(f"export subjects can't include {joined}; Characteristics data is joined unless --no-char is given")
+        df = build_fact_table(subjects=[(subject, level) for subject, level in args.subject],
+                              year_range=parse_years(args.years) if args.years else None,
+                              merge_with_char=not args.no_char, see_progress=args.verbose,
+                              rm_disk=args.rm_disk, workers=args.jobs, on_event=on_event, executor=args.executor)
+        write_frame(df, args.output or f'facts.{args.format}', args.format)
+    elif args.command == 'serve':
+        from genpeds.server import serve
+        serve(host=args.host, port=args.port, cache_mb=args.cache_mb)
+    elif args.command == 'refresh':
+        from genpeds.facts import LEVEL_ARGS
+        from genpeds.refresh import refresh_subject
+        for subject, level in dict.fromkeys(args.subject):
+            summary, _ = refresh_subject(subject, year_range=parse_years(args.years) if args.years else None,
+                                         clean_kwargs={LEVEL_ARGS[subject] : level} if level else None,
+                                         see_progress=args.verbose, on_event=on_event)
+            print(f'{subject}:')
+            print(summary.to_string(index=False))
+    elif args.command == 'discover':
+        from genpeds.discovery import DEFAULT_TTL, discover_years, available_years
+        for subject in dict.fromkeys(args.subject):
+            found = discover_years(subject, ttl=0 if args.refresh else DEFAULT_TTL)
+            start, end = available_years(subject, probe=False)
+            print(f"{subject}: {start}-{end}" + (f" (new: {', '.join(map(str, found))})" if found else ''))
+    elif args.command == 'worker':
+        from genpeds.executors import run_worker
+        print(f'{run_worker(args.queue, idle_timeout=args.idle_timeout)} tasks run')
+    elif args.command == 'mock-nces':
+        from genpeds.mockserver import serve_mock
+        serve_mock(host=args.host, port=args.port, latency=args.latency,
+                   bandwidth=args.bandwidth_kb * 2**10 if args.bandwidth_kb else None, error_rate=args.error_rate,
+                   error_status=args.error_status, fail_first=args.fail_first, missing=args.missing,
+                   n_institutions=args.institutions, quiet=False)
+
+    if on_event is not None:
+        on_event.close()
+    if profile is not None:
+        profile.stop()
+        profile.write(args.memory_profile)
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
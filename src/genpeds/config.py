@@ -94,6 +94,13 @@ DATASETS = {
             (lambda y: y == 1991, 'c1991_cip'),
             (lambda y: 1995 <= y < 2000, 'C{lag1}{lag0}_A'),
             (lambda y: y >= 2000, 'C{year}_A')
+        ],
+        'editions' : [ # CIP taxonomy used by each survey year's completion data
+            (lambda y: y < 1992, 1985),
+            (lambda y: 1992 <= y < 2003, 1990),
+            (lambda y: 2003 <= y < 2010, 2000),
+            (lambda y: 2010 <= y < 2020, 2010),
+            (lambda y: y >= 2020, 2020)
         ]
     }
 
@@ -240,6 +247,13 @@ VARIABLE_DICT = {
     
 }
 
+# graduation measures within 100 percent of normal time, mirroring the 150 percent measures above
+for var, desc in list(VARIABLE_DICT['graduation'].items()):
+    if '150 percent' in desc:
+        VARIABLE_DICT['graduation'][f'{var}_100'] = (desc.replace('150 percent', '100 percent')
+                                                         .replace('six years', 'four years')
+                                                         .replace('three years', 'two years'))
+
 VARIABLE_RENAME = {
     'characteristics' : {
         'unitid' : 'id', 'instnm' : 'name',
@@ -1,19 +1,58 @@
 from genpeds.downloader import scrape_ipeds_data
+from genpeds.discovery import available_years, discover_years, DEFAULT_TTL
 from genpeds.cleaners import CLEANERS
+from genpeds.refresh import refresh_subject, REFETCH
 from genpeds.config import DATASETS, VARIABLE_DICT
+from genpeds.store import write_store, open_store
+from genpeds.cache import LRUCache, dir_fingerprint
+from genpeds.shared import hold_dir, remove_data_dir
+from genpeds.events import emit, cleaning_events, SKIPPED_CACHED
 import pandas as pd
 
-import shutil
+import os
 from abc import ABC, abstractmethod
 
+CLEAN_CACHE = LRUCache(max_bytes=1024 * 2**20) # cleaned data shared by all subject classes
+# under copy-on-write (always on from pandas 3), shallow copies of cached results can't change the cache
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+
 class IPDS(ABC):
     subject = None
+    clean_defaults = {} # cleaning options `.clean()` always passes, so `.refresh()` keys the cache alike
     
-    def __init__(self, year_range=None):
+    def __init__(self, year_range=None, on_event=None, memory_limit=None, spill_dir=None, executor=None):
+        '''options every subject class takes.
+
+        :param year_range::
+          tuple of inclusive year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from.
+
+        :param on_event::
+          optional callable receiving a ProgressEvent for each download and cleaning step (e.g. `genpeds.ProgressBar()`); see `genpeds.events`.
+
+        :param memory_limit::
+          optional bytes (or a size like '2GB') of cleaned data to hold in memory; past it, cleaned years spill to disk and `.clean()` and `.run()` return a `genpeds.spill.SpilledFrame` (see `.to_pandas()`, `.to_csv()`). Spilled results are not cached.
+
+        :param spill_dir::
+          directory spilled years are written under; defaults to the system's temp directory.
+
+        :param executor::
+          runs downloads and cleaning of the years: 'thread', 'process' (all cores), 'queue' or 'queue:<path>' (a work queue several machines sharing a filesystem can run, see `genpeds-cli worker`), or an executor object; see `genpeds.executors`. By default, years download in threads and clean one after another.
+        '''
         self.year_range = year_range # year range by user
-        self.available_years = DATASETS[self.subject]['years_available']
+        self.on_event = on_event # progress callback, see genpeds.events
+        self.memory_limit = memory_limit # cleaned bytes held in memory before years spill to disk, see genpeds.spill
+        self.spill_dir = spill_dir
+        self.executor = executor # runs downloads and cleaning, see genpeds.executors
+        self.available_years = available_years(self.subject, probe=False) # known years, plus years in the discovery catalog
         self.variable_dict = VARIABLE_DICT[self.subject]
 
+    def related(self, cls) -> 'IPDS':
+        '''returns a subject object of class cls (e.g. Characteristics, for merges) with this object's years
+        and options.'''
+        return cls(year_range=self.year_range, on_event=self.on_event, memory_limit=self.memory_limit,
+                   spill_dir=self.spill_dir, executor=self.executor)
+
     def get_description(self):
         '''returns description of the subject data.'''
         return DATASETS[self.subject]['description']
@@ -22,6 +61,17 @@ class IPDS(ABC):
         '''returns available years for a subject's data.'''
         return self.available_years
     
+    def discover(self, ttl=DEFAULT_TTL) -> dict:
+        '''probes NCES for years released after the last known year (in parallel, with HEAD requests), updates
+        `.get_available_years()` and returns dict of new year -> endpoint; results are cached for ttl seconds.
+        
+        :param ttl::
+          seconds the discovery catalog is trusted before probing again; 0 always probes.
+        '''
+        found = discover_years(self.subject, ttl=ttl)
+        self.available_years = (self.available_years[0], max([self.available_years[1], *found]))
+        return found
+
     def get_available_vars(self):
         '''returns dict of available variables for a subject and their descriptions.'''
         return self.variable_dict
@@ -34,9 +84,108 @@ class IPDS(ABC):
         '''downloads NCES IPEDS data to disk on specified years for a defined subject.
         
         :param see_progress::
-            (bool) prints completion statement for extraction of each year's data. If False, no messages printed.
+            (bool) prints completion statement for extraction of each year's data. If False, only failures are printed. Ignored when the object has an `on_event` callback.
+        '''
+        scrape_ipeds_data(subject=self.subject, year_range=self.year_range, see_progress=see_progress, on_event=self.on_event,
+                          executor=self.executor)
+
+    def build_store(self, df, store_dir=None):
+        '''writes cleaned data to an (id, year) sorted, indexed store on disk for fast institution lookups; returns store directory.
+        
+        :param df::
+          cleaned subject data, e.g. output of `.clean()` or `.run()`.
+        :param store_dir::
+          directory of the store; defaults to '{subject}store'.
         '''
-        scrape_ipeds_data(subject=self.subject, year_range=self.year_range, see_progress=see_progress)
+        return write_store(df, store_dir if store_dir else f'{self.subject}store')
+
+    def get_institution(self, id, store_dir=None) -> pd.DataFrame:
+        '''returns one institution's history from a store built with `.build_store()`, without loading the whole panel.
+        
+        :param id::
+          institution id (UNITID).
+        :param store_dir::
+          directory of the store; defaults to '{subject}store'.
+        '''
+        return open_store(store_dir if store_dir else f'{self.subject}store').get_institution(id)
+
+    def get_institutions(self, ids, store_dir=None) -> pd.DataFrame:
+        '''returns several institutions' histories from a store built with `.build_store()`.
+        
+        :param ids::
+          iterable of institution ids (UNITIDs).
+        :param store_dir::
+          directory of the store; defaults to '{subject}store'.
+        '''
+        return open_store(store_dir if store_dir else f'{self.subject}store').get_institutions(ids)
+
+    def clean_key(self, data_dir, kwargs) -> tuple:
+        '''returns the `.clean()` cache key of a directory and cleaning arguments, without the files' fingerprint.'''
+        kwargs = {arg : tuple(val) if isinstance(val, list) else val for arg, val in kwargs.items()}
+        return (self.subject, os.path.abspath(data_dir), tuple(sorted(kwargs.items())))
+
+    def refresh(self, see_progress=False, workers=8, **clean_kwargs) -> pd.DataFrame:
+        '''checks each year's NCES file against the one downloaded (ETag, Last-Modified or size, with HEAD
+        requests in parallel), re-downloads revised and missing years, re-cleans only those years, and returns
+        a summary with one row per year: status ('new', 'revised', 'untracked', 'unchanged', 'unavailable' or
+        'failed'), rows before and after, and rows added, removed and changed. A cached `.clean()` result
+        is updated in place, so the next `.clean()` doesn't re-clean the other years.
+
+        :param see_progress::
+          (bool) When True, prints each download and the summary.
+        :param workers::
+          number of HEAD requests in flight at once.
+        :param clean_kwargs::
+          cleaning options, named as in `genpeds.cleaners`, e.g. `level='mast'` for Completion data.
+        '''
+        data_dir = DATASETS[self.subject]['dir']
+        clean_kwargs = {**self.clean_defaults, **clean_kwargs}
+        key = self.clean_key(data_dir, clean_kwargs)
+        cached = CLEAN_CACHE.get(key + (dir_fingerprint(data_dir),)) if os.path.isdir(data_dir) else None
+        summary, cleaned = refresh_subject(self.subject, self.year_range, clean_kwargs, see_progress=see_progress,
+                                           on_event=self.on_event, workers=workers, executor=self.executor)
+        fetched = summary.loc[summary['status'].isin(REFETCH), 'year'].tolist()
+        if cached is not None and fetched: # swap the re-cleaned years into the cached result
+            df = pd.concat([cached.loc[~cached['year'].isin(fetched)], cleaned], ignore_index=True)
+            CLEAN_CACHE.invalidate(lambda k: k[:3] == key)
+            CLEAN_CACHE.put(key + (dir_fingerprint(data_dir),), df.sort_values('year', kind='stable', ignore_index=True))
+        if see_progress:
+            print(summary.to_string(index=False))
+        return summary
+
+    def cached_clean(self, data_dir, **kwargs) -> pd.DataFrame:
+        '''runs the subject's cleaner on data_dir, reusing an earlier result while the directory's files and
+        the cleaning arguments are unchanged; returns a copy (shallow under copy-on-write, else deep, so callers'
+        in-place edits never reach the cached result). With a memory limit, cleans every time and returns a
+        SpilledFrame.'''
+        options = {'executor' : self.executor} if self.executor is not None else {} # not part of the cache key
+        with hold_dir(data_dir): # keeps other processes' rm_disk from deleting it while cleaning
+            if self.memory_limit is not None:
+                with cleaning_events(self.subject, self.on_event):
+                    return CLEANERS[self.subject](data_dir, memory_limit=self.memory_limit, spill_dir=self.spill_dir,
+                                                  **options, **kwargs)
+            key = self.clean_key(data_dir, kwargs)
+            fingerprint = dir_fingerprint(data_dir)
+            df = CLEAN_CACHE.get(key + (fingerprint,))
+            if df is None:
+                with cleaning_events(self.subject, self.on_event):
+                    df = CLEANERS[self.subject](data_dir, **options, **kwargs)
+                CLEAN_CACHE.invalidate(lambda k: k[:3] == key) # results for older versions of the files
+                CLEAN_CACHE.put(key + (fingerprint,), df)
+            else:
+                emit(self.on_event, SKIPPED_CACHED, self.subject)
+            return df.copy(deep=not COPY_ON_WRITE)
+
+    @staticmethod
+    def cache_info() -> dict:
+        '''returns hit/miss statistics, entry count and size of the shared `.clean()` cache.'''
+        return CLEAN_CACHE.info()
+
+    @classmethod
+    def clear_cache(cls):
+        '''removes cached `.clean()` results for this subject (every subject when called on IPDS); returns
+        number of entries removed.'''
+        return CLEAN_CACHE.invalidate(lambda key: cls.subject is None or key[0] == cls.subject)
 
     @abstractmethod
     def clean(self):
@@ -53,7 +202,7 @@ class Characteristics(IPDS):
     '''IPEDS Characteristics'''
     subject = 'characteristics'
 
-    def __init__(self, year_range=None):
+    def __init__(self, year_range=None, on_event=None, memory_limit=None, spill_dir=None, executor=None):
         '''IPEDS Characteristics data.
         
         :param year_range::
@@ -84,7 +233,7 @@ class Characteristics(IPDS):
 
         As of this version, `genpeds` only provides objects for the first five subject areas, as these areas provide data by gender and variables of interest like graduation rates and enrollment.
         '''
-        super().__init__(year_range)
+        super().__init__(year_range, on_event, memory_limit, spill_dir, executor)
 
     def clean(self, char_dir='characteristicsdata', rm_disk=False) -> pd.DataFrame:
         '''cleans downloaded Characteristics data, returns Pandas Dataframe.
@@ -94,9 +243,10 @@ class Characteristics(IPDS):
         :param rm_disk::
           removes downloaded Characteristics data from disk, after cleaning.
         '''
-        df = CLEANERS[self.subject](char_dir)
+        df = self.cached_clean(char_dir)
         if rm_disk:
-            shutil.rmtree(char_dir)
+            remove_data_dir(char_dir)
+            self.clear_cache()
         return df
     
     def run(self, see_progress=False, rm_disk=False) -> pd.DataFrame:
@@ -117,14 +267,14 @@ class Admissions(IPDS):
     '''IPEDS Admissions'''
     subject = 'admissions'
 
-    def __init__(self, year_range=None):
+    def __init__(self, year_range=None, on_event=None, memory_limit=None, spill_dir=None, executor=None):
         '''IPEDS Admissions data.
         
         :param year_range::
           tuple of inclusive year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from.
           
           ex. year_range=(2002,2012)
-          
+
         -----------------  
         <h3>Example Use:</h3>
         >>> import genpeds as ed
@@ -147,7 +297,7 @@ class Admissions(IPDS):
 
         As of this version, `genpeds` only provides objects for the first five subject areas, as these areas provide data by gender and variables of interest like graduation rates and enrollment.
         '''
-        super().__init__(year_range)
+        super().__init__(year_range, on_event, memory_limit, spill_dir, executor)
 
     def clean(self, admit_dir='admissionsdata', rm_disk=False) -> pd.DataFrame:
         '''cleans downloaded Admissions data, returns Pandas Dataframe.
@@ -157,9 +307,10 @@ class Admissions(IPDS):
         :param rm_disk::
           removes downloaded Admissions data from disk, after cleaning.
         '''
-        df = CLEANERS[self.subject](admissions_dir=admit_dir)
+        df = self.cached_clean(admit_dir)
         if rm_disk:
-            shutil.rmtree(admit_dir) # removes data from disk
+            remove_data_dir(admit_dir) # removes data from disk
+            self.clear_cache()
         return df
     
     def run(self, see_progress=False, merge_with_char=False, rm_disk=False) -> pd.DataFrame:
@@ -178,9 +329,9 @@ class Admissions(IPDS):
         df = self.clean(rm_disk=rm_disk)
         if merge_with_char:
             if rm_disk:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=True)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=True)
             else:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=False)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=False)
             df = df.merge(char_df, on=['id', 'year'])
         return df
     
@@ -188,8 +339,9 @@ class Admissions(IPDS):
 class Enrollment(IPDS):
     '''IPEDS Enrollment'''
     subject = 'enrollment'
+    clean_defaults = {'student_level' : 'undergrad'}
 
-    def __init__(self, year_range=None):
+    def __init__(self, year_range=None, on_event=None, memory_limit=None, spill_dir=None, executor=None):
         '''IPEDS Enrollment data.
         
         :param year_range::
@@ -219,7 +371,7 @@ class Enrollment(IPDS):
 
         As of this version, `genpeds` only provides objects for the first five subject areas, as these areas provide data by gender and variables of interest like graduation rates and enrollment.
         '''
-        super().__init__(year_range)
+        super().__init__(year_range, on_event, memory_limit, spill_dir, executor)
 
     def clean(self, student_level='undergrad', enroll_dir='enrollmentdata', rm_disk=False) -> pd.DataFrame:
         '''cleans downloaded Fall Enrollment data, returns Pandas Dataframe.
@@ -231,9 +383,10 @@ class Enrollment(IPDS):
         :param rm_disk::
           removes downloaded Enrollment data from disk, after cleaning.
         '''
-        df = CLEANERS[self.subject](enrollment_dir=enroll_dir, student_level=student_level)
+        df = self.cached_clean(enroll_dir, student_level=student_level)
         if rm_disk:
-            shutil.rmtree(enroll_dir)
+            remove_data_dir(enroll_dir)
+            self.clear_cache()
         return df
     
     def run(self, student_level='undergrad', see_progress=False, merge_with_char=False, rm_disk=False) -> pd.DataFrame:
@@ -255,9 +408,9 @@ class Enrollment(IPDS):
         df = self.clean(rm_disk=rm_disk, student_level=student_level)
         if merge_with_char:
             if rm_disk:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=True)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=True)
             else:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=False)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=False)
             df = df.merge(char_df, on=['id', 'year'])
         return df
 
@@ -266,15 +419,14 @@ class Cip(IPDS):
     '''CIP Codes'''
     subject = 'cip'
 
-    def __init__(self, year_range=(1984,2023)):
+    def __init__(self, year_range=(1984,2023), on_event=None, memory_limit=None, spill_dir=None, executor=None):
         '''IPEDS CIP Codes data.
 
         :param year_range::
           tuple of inclusive year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from.
-
         CIP, or Classification of Instructional Programs, are key-value pairs for subject study fields. CIP's vary by year, and are relevant to identify subject field in completion data. Available for years 1984-2023. CIP data should be used in conjunction with Completion data.
         '''
-        super().__init__(year_range)
+        super().__init__(year_range, on_event, memory_limit, spill_dir, executor)
 
     def clean(self, cip_dir='cipdata', rm_disk=False) -> pd.DataFrame:
         '''cleans downloaded CIP data, returns Pandas Dataframe.
@@ -284,9 +436,10 @@ class Cip(IPDS):
         :param rm_disk::
           removes downloaded CIP data from disk, after cleaning.
         '''
-        df = CLEANERS[self.subject](cip_codes_dir=cip_dir)
+        df = self.cached_clean(cip_dir)
         if rm_disk:
-            shutil.rmtree(cip_dir)
+            remove_data_dir(cip_dir)
+            self.clear_cache()
         return df
     
     def run(self, see_progress=False, rm_disk=False) -> pd.DataFrame:
@@ -306,15 +459,16 @@ class Cip(IPDS):
 class Completion(IPDS):
     '''IPEDS Completion'''
     subject = 'completion'
+    clean_defaults = {'level' : 'bach'}
 
-    def __init__(self, year_range=(1984,2023)):
+    def __init__(self, year_range=(1984,2023), on_event=None, memory_limit=None, spill_dir=None, executor=None):
         '''IPEDS Completion data.
         
         :param year_range::
           tuple of inclusive year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from.
         
          ex. year_range=(2002,2012)
-        
+
         -----------------  
         <h3>Example Use:</h3>
         >>> import genpeds as ed
@@ -337,7 +491,7 @@ class Completion(IPDS):
 
         As of this version, `genpeds` only provides objects for the first five subject areas, as these areas provide data by gender and variables of interest like graduation rates and enrollment.
         '''
-        super().__init__(year_range)
+        super().__init__(year_range, on_event, memory_limit, spill_dir, executor)
 
     def clean(self, degree_level='bach', complete_dir='completiondata', rm_disk=False) -> pd.DataFrame:
         '''cleans downloaded Completion data, returns Pandas Dataframe.
@@ -349,9 +503,10 @@ class Completion(IPDS):
         :param rm_disk::
           removes downloaded Completion data from disk, after cleaning.
         '''
-        df = CLEANERS[self.subject](completion_dir=complete_dir, level=degree_level)
+        df = self.cached_clean(complete_dir, level=degree_level)
         if rm_disk:
-            shutil.rmtree(complete_dir)
+            remove_data_dir(complete_dir)
+            self.clear_cache()
         return df
     
     def run(self, degree_level='bach', see_progress=False, merge_with_char=False, get_cip_codes=True, rm_disk=False) -> pd.DataFrame:
@@ -376,12 +531,12 @@ class Completion(IPDS):
         df = self.clean(rm_disk=rm_disk, degree_level=degree_level)
         if merge_with_char:
             if rm_disk:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=True)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=True)
             else:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=False)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=False)
             df = df.merge(char_df, on=['id', 'year'])
         if get_cip_codes:
-            cip_df = Cip(year_range=self.year_range).run(see_progress=see_progress, rm_disk=True)
+            cip_df = self.related(Cip).run(see_progress=see_progress, rm_disk=True)
             df = df.merge(cip_df, on=['cip', 'year'])
         return df
 
@@ -389,15 +544,16 @@ class Completion(IPDS):
 class Graduation(IPDS):
     '''IPEDS Graduation'''
     subject = 'graduation'
+    clean_defaults = {'deg_level' : 'bach', 'windows' : (150,)}
 
-    def __init__(self, year_range=(1984,2023)):
+    def __init__(self, year_range=(1984,2023), on_event=None, memory_limit=None, spill_dir=None, executor=None):
         '''IPEDS Graduation data.
         
         :param year_range::
           tuple of inclusive year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from.
         
          ex. year_range=(2002,2012)
-        
+
         -----------------  
         <h3>Example Use:</h3>
         >>> import genpeds as ed
@@ -420,29 +576,35 @@ class Graduation(IPDS):
 
         As of this version, `genpeds` only provides objects for the first five subject areas, as these areas provide data by gender and variables of interest like graduation rates and enrollment.
         '''
-        super().__init__(year_range)
+        super().__init__(year_range, on_event, memory_limit, spill_dir, executor)
 
-    def clean(self, degree_level='bach', grad_dir='graduationdata', rm_disk=False) -> pd.DataFrame:
+    def clean(self, degree_level='bach', grad_dir='graduationdata', rm_disk=False, windows=(150,)) -> pd.DataFrame:
         '''cleans downloaded undergraduate Graduation data, returns Pandas Dataframe.
         
         :param degree_level::
          level of graduate; options include ['assc', 'bach'].
+        :param windows::
+         completion windows, as percent of normal time; options include [100, 150]. Windows other than 150 get a suffix, e.g. 'gradrate_totmen_100'.
         :param grad_dir::
           directory where raw Graduation data is located; defaults to default download dir name.
         :param rm_disk::
           removes downloaded Graduation data from disk, after cleaning.
         '''
-        df = CLEANERS[self.subject](graduation_dir=grad_dir, deg_level=degree_level)
+        df = self.cached_clean(grad_dir, deg_level=degree_level, windows=windows)
         if rm_disk:
-            shutil.rmtree(grad_dir)
+            remove_data_dir(grad_dir)
+            self.clear_cache()
         return df
     
-    def run(self, degree_level='bach', see_progress=False, merge_with_char=False, rm_disk=False) -> pd.DataFrame:
+    def run(self, degree_level='bach', see_progress=False, merge_with_char=False, rm_disk=False, windows=(150,)) -> pd.DataFrame:
         '''scrapes and cleans IPEDS Graduation data; returns Pandas Dataframe.
         
         :param degree_level::
          level of graduate; options include ['assc', 'bach'].
 
+        :param windows::
+         completion windows, as percent of normal time; options include [100, 150].
+
         :param see_progress::
         (bool) When True, prints successful download confirmation for each year's data. If False, no messages printed.
         
@@ -453,13 +615,15 @@ class Graduation(IPDS):
           removes downloaded Graduation (and Characteristics if applicable) data from disk, after cleaning.
         '''
         self.scrape(see_progress=see_progress)
-        df = self.clean(rm_disk=rm_disk, degree_level=degree_level)
+        df = self.clean(rm_disk=rm_disk, degree_level=degree_level, windows=windows)
         if merge_with_char:
             if rm_disk:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=True)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=True)
             else:
-                char_df = Characteristics(year_range=self.year_range).run(see_progress=see_progress, rm_disk=False)
+                char_df = self.related(Characteristics).run(see_progress=see_progress, rm_disk=False)
             df = df.merge(char_df, on=['id', 'year'])
         return df
-    
-    
\ No newline at end of file
+
+
+# subject name -> class, e.g. for batch jobs
+SUBJECT_CLASSES = {cls.subject : cls for cls in [Characteristics, Admissions, Enrollment, Cip, Completion, Graduation]}
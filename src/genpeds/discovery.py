@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import threading
+import concurrent.futures
+import requests
+
+from genpeds import downloader
+from genpeds.config import DATASETS
+from genpeds.metrics import span
+
+CATALOG_PATH = None # set with set_catalog_path()
+DEFAULT_TTL = 24 * 3600 # seconds before a subject's new years are probed again
+PROBE_TIMEOUT = 10 # seconds per HEAD request
+CATALOG_LOCK = threading.Lock()
+
+
+def catalog_path() -> str:
+    '''returns the catalog file: the one given to `set_catalog_path()`, else the GENPEDS_CATALOG environment
+    variable, else ~/.cache/genpeds/catalog.json.'''
+    return (CATALOG_PATH or os.environ.get('GENPEDS_CATALOG')
+            or os.path.join(os.path.expanduser('~'), '.cache', 'genpeds', 'catalog.json'))
+
+
+def set_catalog_path(path=None):
+    '''stores the catalog of discovered years at path; None goes back to GENPEDS_CATALOG or the default.'''
+    global CATALOG_PATH
+    CATALOG_PATH = path
+
+
+def probing_enabled() -> bool:
+    '''False when the GENPEDS_DISCOVERY environment variable is '0', e.g. on machines without network access.'''
+    return os.environ.get('GENPEDS_DISCOVERY', '1') != '0'
+
+
+def load_catalog() -> dict:
+    '''returns the catalog, {base URL: {subject: {'checked': time, 'years': {year: endpoint}}}}; empty when
+    there is none yet or it can't be read.'''
+    try:
+        with open(catalog_path()) as filehandle:
+            return json.load(filehandle)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_catalog(catalog):
+    path = catalog_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp{os.getpid()}.{threading.get_ident()}'
+    with open(tmp_path, 'w') as filehandle:
+        json.dump(catalog, filehandle, indent=1)
+    os.replace(tmp_path, path)
+
+
+def candidate_years(subject, through=None) -> list:
+    '''returns years after a subject's last known year to probe, through this calendar year by default.'''
+    last_year = DATASETS[subject]['years_available'][1]
+    through = through or time.localtime().tm_year
+    return list(range(last_year + 1, max(through, last_year + 1) + 1))
+
+
+def probe_endpoint(endpoint) -> bool:
+    '''returns True when a HEAD request finds a data file at endpoint (not the NCES 404 page); raises
+    requests.RequestException when the host can't be reached.'''
+    r = requests.head(endpoint, allow_redirects=True, timeout=PROBE_TIMEOUT)
+    return r.status_code < 400 and 'html' not in r.headers.get('Content-Type', '')
+
+
+def probe_years(subject, years, workers=8) -> dict:
+    '''probes candidate years of a subject in parallel with HEAD requests, using the last known file name
+    pattern for years after it; returns dict of year -> endpoint for the years found, and raises
+    requests.RequestException when the host can't be reached.
+
+    :param subject: subject name.
+    :param years: iterable of years to probe.
+    :param workers: number of requests in flight at once.
+    '''
+    endpoints = {year : downloader.get_file_endpoint(subject, year, extend=True) for year in years}
+    with span('discover', subject=subject, years=len(endpoints)), \
+         concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        found = dict(zip(endpoints, pool.map(probe_endpoint, endpoints.values())))
+    return {year : endpoints[year] for year in sorted(endpoints) if found[year]}
+
+
+def discover_years(subject, ttl=DEFAULT_TTL, through=None, workers=8) -> dict:
+    '''returns dict of year -> endpoint for a subject's years released after its last known year.
+    Results are kept in the catalog (see `catalog_path()`) for ttl seconds, after which the years are probed
+    again; when the host can't be reached, the catalog's last results are returned.
+
+    :param subject: subject name.
+    :param ttl: seconds a catalog entry is used before probing again; 0 always probes.
+    :param through: last year to probe; defaults to this calendar year.
+    :param workers: number of HEAD requests in flight at once.
+    '''
+    host = downloader.base_url()
+    entry = load_catalog().get(host, {}).get(subject)
+    if entry is not None and (time.time() - entry['checked'] < ttl or not probing_enabled()):
+        return {int(year) : endpoint for year, endpoint in entry['years'].items()}
+    if not probing_enabled():
+        return {}
+    try:
+        found = probe_years(subject, candidate_years(subject, through), workers)
+    except requests.RequestException:
+        return {int(year) : endpoint for year, endpoint in (entry or {}).get('years', {}).items()}
+    with CATALOG_LOCK:
+        catalog = load_catalog()
+        catalog.setdefault(host, {})[subject] = {'checked' : time.time(),
+                                                 'years' : {str(year) : endpoint for year, endpoint in found.items()}}
+        save_catalog(catalog)
+    return found
+
+
+def available_years(subject, probe=True, ttl=DEFAULT_TTL) -> tuple:
+    '''returns (first, last) available year of a subject, counting years found by discovery.
+
+    :param subject: subject name.
+    :param probe: (bool) When True, probes for new years if the catalog entry is older than ttl. When False,
+      only the catalog is read.
+    :param ttl: seconds a catalog entry is used before probing again.
+    '''
+    start, end = DATASETS[subject]['years_available']
+    if probe:
+        years = discover_years(subject, ttl=ttl)
+    else:
+        entry = load_catalog().get(downloader.base_url(), {}).get(subject, {})
+        years = [int(year) for year in entry.get('years', {})]
+    return start, max([end, *years])
@@ -4,27 +4,57 @@ import random
 import requests
 import zipfile
 import os
+import shutil
 import warnings
 import re
+from genpeds import discovery
 from genpeds.config import DATASETS
+from genpeds.executors import executor_scope, is_threaded
+from genpeds.manifest import record_download
+from genpeds.shared import acquire_dir, shared_mode, unique_path, written_since, year_lock
+from genpeds.metrics import span
+from genpeds.events import emit, print_events, print_failures, QUEUED, DOWNLOADED, EXTRACTED, SKIPPED_CACHED, FAILED
 
-def get_file_endpoint(subject, year):
+NCES_BASE_URL = 'https://nces.ed.gov' # host in the DATASETS file templates
+BASE_URL = None # set with set_base_url()
+
+def base_url():
+    '''returns the host files are downloaded from: the one given to `set_base_url()`, else the
+    GENPEDS_BASE_URL environment variable, else NCES.'''
+    return (BASE_URL or os.environ.get('GENPEDS_BASE_URL') or NCES_BASE_URL).rstrip('/')
+
+def set_base_url(url=None):
+    '''points downloads at another host serving the NCES URL layout, e.g. a `genpeds.mockserver`
+    instance or a mirror; None goes back to GENPEDS_BASE_URL or NCES.
+
+    :param url: base URL, e.g. 'http://127.0.0.1:8001'.
+    '''
+    global BASE_URL
+    BASE_URL = url
+
+def get_file_endpoint(subject, year, extend=False):
     '''returns endpoint for a given subject in a given year.
     
     :param year: year for file; available years vary by subject.
     :param subject: subject.
+    :param extend: when True, years after the subject's last available year without a rule of their own use the last year's file name pattern (see `genpeds.discovery`).
     '''
     format_rules = DATASETS[subject]['format_rules'] # rules for each subject-year combination
     endpoint_template = DATASETS[subject]['file_template'] # endpoint template
+    last_year = DATASETS[subject]['years_available'][1]
+
+    rule_year = year
+    if extend and year > last_year and not any(cond(year) for cond, _ in format_rules):
+        rule_year = last_year # new releases keep the last known file names
 
     lag0, lag1, lead1 = year-1900, year-1901, year-1899 # needed for format rules
     for cond,frmt in format_rules:
-        if cond(year):
+        if cond(rule_year):
             yr_format = frmt.format(year=year, 
                                         lag0=str(lag0), 
                                         lag1 = str(lag1), 
                                         lead1 = str(lead1))
-            endpoint = endpoint_template.format(yr_format) # formatted endpoint
+            endpoint = endpoint_template.format(yr_format).replace(NCES_BASE_URL, base_url(), 1) # formatted endpoint
             break
     else:
             warnings.warn(f'No formatted rule for year {year}')
@@ -32,63 +62,101 @@ def get_file_endpoint(subject, year):
     
     return endpoint
 
-def download_a_file(subject, year):
-    '''downloads an IPEDS subject-year data file.
+def download_a_file(subject, year, on_event=None):
+    '''downloads an IPEDS subject-year data file; returns the final ProgressEvent ('extracted' or 'failed').
+    In shared mode (see `genpeds.shared`), one process downloads a year at a time, and processes that
+    waited for it skip the year ('skipped-cached') once it is written.
 
     :param year: year for file; available years vary by subject.
     :param subject: subject.
+    :param on_event: callable receiving 'downloaded', 'extracted' and 'failed' ProgressEvents.
     '''
     relevant_dir = DATASETS[subject]['dir'] # directory subject name
+    waiting = time.time()
+    with year_lock(relevant_dir, year): # single flight across processes sharing the directory
+        if shared_mode() and written_since(relevant_dir, year, waiting):
+            return emit(on_event, SKIPPED_CACHED, subject, year) # another process just downloaded it
+        return fetch_a_file(subject, year, on_event)
+
+
+def fetch_a_file(subject, year, on_event=None):
+    '''requests and extracts an IPEDS subject-year file. The zip and the extracted file are written under
+    hidden temporary names and renamed into place, so readers never see a partly written file.'''
+    relevant_dir = DATASETS[subject]['dir'] # directory subject name
     relevant_prefix = DATASETS[subject]['file_prefix'] # file subject prefix
 
-    endpoint = get_file_endpoint(subject, year) # get endpoint for a subject-year combination
+    endpoint = get_file_endpoint(subject, year, extend=True) # get endpoint for a subject-year combination
 
+    started = time.perf_counter()
     try:
-        r = requests.get(endpoint)  # try request
+        with span('http', subject=subject, year=year) as stage:
+            r = requests.get(endpoint)  # try request
+            stage.set(bytes=len(r.content), status=r.status_code)
     except requests.HTTPError as er:
-        return f"Year {year}: Error - {str(er)}"
+        return emit(on_event, FAILED, subject, year, error=f'Error - {str(er)}')
         
     if '404 - File or directory not found' in r.text:
-        return f"Year {year}: 404 - File not found"
+        return emit(on_event, FAILED, subject, year, error='404 - File not found')
+    if r.status_code >= 400:
+        return emit(on_event, FAILED, subject, year, error=f'HTTP {r.status_code}')
+    emit(on_event, DOWNLOADED, subject, year, seconds=time.perf_counter() - started, bytes=len(r.content))
     
-    zipped_file = os.path.join(relevant_dir, f'{relevant_prefix}_{year}.zip')
-    open(zipped_file, 'wb').write(r.content)
+    started = time.perf_counter()
+    zipped_file = unique_path(os.path.join(relevant_dir, f'{relevant_prefix}_{year}.zip'))
+    extract_dir = unique_path(os.path.join(relevant_dir, f'{relevant_prefix}_{year}'))
+    with open(zipped_file, 'wb') as filehandle:
+        filehandle.write(r.content)
     
-    with zipfile.ZipFile(zipped_file, 'r') as zfile:
-        if subject == 'cip':
-            file_to_extract = endpoint.split('/')[-1].replace('_Dict.zip', '').lower()
-            for ext in ['.html', '.xls', '.xlsx']:  # diff file formats, try each one
-                try:
-                    zfile.extract(file_to_extract + ext, relevant_dir)
-                    # remove & remove zipped file
-                    old_name_file = os.path.join(relevant_dir, f'{file_to_extract}{ext}')
-                    new_name_file = os.path.join(relevant_dir, f'cipcodes_{year}{ext}')
-                    os.rename(old_name_file, new_name_file)
-                    os.remove(zipped_file)
-                    break
-                except KeyError:
-                    continue
-        else:
-            file_to_extract = endpoint.split('/')[-1].replace('.zip', '').lower() + '.csv'
-            zfile.extract(file_to_extract, relevant_dir)
-            # remove & remove zipped file
-            old_name_file = os.path.join(relevant_dir, file_to_extract)
-            new_name_file = os.path.join(relevant_dir, f'{relevant_prefix}_{year}.csv')
-            os.rename(old_name_file, new_name_file)
-            os.remove(zipped_file)
-
-    return(f'IPEDS {subject.title()} ({year}) successfully downloaded and extracted')
-
-
-def scrape_ipeds_data(subject='characteristics', year_range = None, see_progress = True):
+    try:
+        with span('extract', subject=subject, year=year) as stage, zipfile.ZipFile(zipped_file, 'r') as zfile:
+            if subject == 'cip':
+                file_to_extract = endpoint.split('/')[-1].replace('_Dict.zip', '').lower()
+                for ext in ['.html', '.xls', '.xlsx']:  # diff file formats, try each one
+                    try:
+                        zfile.extract(file_to_extract + ext, extract_dir)
+                        # rename into place
+                        old_name_file = os.path.join(extract_dir, f'{file_to_extract}{ext}')
+                        new_name_file = os.path.join(relevant_dir, f'cipcodes_{year}{ext}')
+                        os.replace(old_name_file, new_name_file)
+                        break
+                    except KeyError:
+                        continue
+            else:
+                file_to_extract = endpoint.split('/')[-1].replace('.zip', '').lower() + '.csv'
+                zfile.extract(file_to_extract, extract_dir)
+                # rename into place
+                old_name_file = os.path.join(extract_dir, file_to_extract)
+                new_name_file = os.path.join(relevant_dir, f'{relevant_prefix}_{year}.csv')
+                os.replace(old_name_file, new_name_file)
+            extracted_bytes = os.path.getsize(new_name_file) if os.path.exists(new_name_file) else None
+            stage.set(bytes=extracted_bytes)
+    finally: # remove zipped file and temporary directory
+        os.remove(zipped_file)
+        shutil.rmtree(extract_dir, ignore_errors=True)
+    record_download(relevant_dir, year, endpoint, r) # validators for refresh checks
+
+    return emit(on_event, EXTRACTED, subject, year, seconds=time.perf_counter() - started, bytes=extracted_bytes)
+
+
+def scrape_ipeds_data(subject='characteristics', year_range = None, see_progress = True, on_event = None, overwrite = False, executor = None, workers = 5, discover = False):
     '''downloads NCES IPEDS data on specified years for a defined subject.
     
     :param subject: string identifying which subject data to download. The subjects available are:
      ['characteristics', 'admissions', 'enrollment', 'completion', 'cip', 'graduation']
     
-    :param year_range: tuple of year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from. Data for 'characteristics', 'enrollment' and 'completion' are available for years 1984-2023, while 'graduation' is available for years 2000-2023. Defaults to all available years for a subject.
+    :param year_range: tuple of year integers (indicates a range), iterable of year integers (indicates group of individual years), or single year to pull data from. Data for 'characteristics', 'enrollment' and 'completion' are available for years 1984-2023, while 'graduation' is available for years 2000-2023. Defaults to all known years for a subject, plus years already in the `genpeds.discovery` catalog.
+
+    :param see_progress: boolean that, when true, prints completion statement for extraction of each year. If false, only failures are printed. Ignored when on_event is given.
+
+    :param on_event: callable receiving a ProgressEvent for each step: 'skipped-cached' (year already on disk), 'queued', 'downloaded', 'extracted' and 'failed' (with the reason in `error`), with timings and sizes. It may be called from worker threads. See `genpeds.events`.
+
+    :param overwrite: boolean that, when true, downloads years again even if they are already on disk, e.g. revised releases.
 
-    :param see_progress: boolean that, when true, prints completion statement for extraction of each year. If false, no messages printed.
+    :param executor: runs the downloads: 'thread' (default), 'process', 'queue' or 'queue:<path>' for a work queue shared by several machines, or an executor object; see `genpeds.executors`. With processes or a queue, on_event gets each year's final event ('extracted', 'skipped-cached' or 'failed') from this process.
+
+    :param workers: number of downloads at the same time, for an executor created from a name.
+
+    :param discover: boolean that, when true and no year_range is given, probes NCES for years released since (see `genpeds.discovery`) before downloading. Off by default, so no requests are sent and the catalog is not written.
     
     ## available data
 
@@ -105,19 +173,14 @@ def scrape_ipeds_data(subject='characteristics', year_range = None, see_progress
     - :graduation: number of cohorts and graduates by gender, institutional level and graduation measure (e.g., students earning a bachelor's degree within 6 years of entering). Available for years 2000-2023.
     '''
     subject = subject.lower()
+    if on_event is None:
+        on_event = print_events if see_progress else print_failures
     relevant_dir = DATASETS[subject]['dir']
     relevant_prefix = DATASETS[subject]['file_prefix'] # file subject prefix
     # Determine the years to download
     if not year_range:
-        if subject == 'graduation':
-            start, end = 2000, 2023
-            iter_range = range(start, end + 1)  # default for graduation data
-        elif subject == 'admissions':
-            start, end = 2001, 2023
-            iter_range = range(start, end + 1)  # default for admissions data
-        else:
-            start, end = 1984, 2023
-            iter_range = range(start, end + 1)  # default for all other data
+        start, end = discovery.available_years(subject, probe=discover) # known years, plus newer releases in the catalog
+        iter_range = range(start, end + 1)
     else:
         if isinstance(year_range, tuple):
             start, end = year_range
@@ -130,27 +193,31 @@ def scrape_ipeds_data(subject='characteristics', year_range = None, see_progress
         else:
             raise ValueError('Please enter a tuple range, list of integers, or a single integer')
     
-    if os.path.isdir(relevant_dir): # so we don't need to redownload if it isn't necessary
+    acquire_dir(relevant_dir) # create subject directory; in shared mode, other processes' rm_disk keeps it
+    if not overwrite: # so we don't need to redownload if it isn't necessary
         iter_range2 = []
         stripped_list = [re.sub(r'\.csv|\.html|\.xlsx|\.xlsx','',ff) 
                              for ff in sorted(os.listdir(relevant_dir))]
         for yr in iter_range:
             if f'{relevant_prefix}_{yr}' not in stripped_list:
                 iter_range2.append(yr)
+            else:
+                emit(on_event, SKIPPED_CACHED, subject, yr)
         iter_range = iter_range2
-    else:
-        os.makedirs(relevant_dir, exist_ok=True) # create subject directory, where unzipped files will be stored
 
-    # multithread to speed up the process
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as exec:
-        future_to_year = {exec.submit(download_a_file, subject, year): year for year in iter_range}
+    # download several years at once
+    with span('scrape', subject=subject, years=len(iter_range)), executor_scope(executor, workers) as exec:
+        threaded = is_threaded(exec) # callbacks can't be sent to other processes
+        for year in iter_range:
+            emit(on_event, QUEUED, subject, year)
+        future_to_year = {exec.submit(download_a_file, subject, year, on_event if threaded else None): year
+                          for year in iter_range}
         for future in concurrent.futures.as_completed(future_to_year):
             yr = future_to_year[future]
             try:
-                result = future.result()
-                if see_progress:
-                    print(result) # if you want to see the progress
+                event = future.result()
+                if not threaded:
+                    on_event(event)
                 time.sleep(random.uniform(0.1, 0.3)) # you're welcome NCES :)
             except Exception as exc:
-                print(f"Year {yr} generated an exception: {exc}")
-
+                emit(on_event, FAILED, subject, yr, error=f'generated an exception: {exc}')
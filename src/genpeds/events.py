@@ -0,0 +1,170 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+
+from genpeds.metrics import add_hook, remove_hook
+
+QUEUED = 'queued' # year will be downloaded
+DOWNLOADED = 'downloaded' # zip file received
+EXTRACTED = 'extracted' # data file extracted and renamed; the year is on disk
+SKIPPED_CACHED = 'skipped-cached' # year already on disk, or cleaned data reused from memory
+FAILED = 'failed' # download or extraction failed; `error` says why
+CLEANED = 'cleaned' # year cleaned and added to the subject's data
+
+EVENT_KINDS = [QUEUED, DOWNLOADED, EXTRACTED, SKIPPED_CACHED, FAILED, CLEANED]
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    '''one step of downloading or cleaning a subject-year.
+
+    :kind:          one of EVENT_KINDS
+    :subject:       subject name
+    :year:          data year; None for events about a whole subject
+    :seconds:       duration of the step, when timed
+    :bytes:         bytes downloaded or extracted
+    :rows:          rows cleaned
+    :error:         failure reason, for 'failed' events
+    '''
+    kind: str
+    subject: str
+    year: int = None
+    seconds: float = None
+    bytes: int = None
+    rows: int = None
+    error: str = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def message(self) -> str:
+        '''returns the progress line genpeds printed before events existed.'''
+        if self.kind == EXTRACTED:
+            return f'IPEDS {self.subject.title()} ({self.year}) successfully downloaded and extracted'
+        if self.kind == FAILED:
+            return f'Year {self.year}: {self.error}'
+        if self.kind == SKIPPED_CACHED:
+            return f'IPEDS {self.subject.title()} ({self.year}) already downloaded'
+        return f'IPEDS {self.subject.title()} ({self.year}) {self.kind}'
+
+
+def emit(on_event, kind, subject, year=None, **fields):
+    '''builds a ProgressEvent and passes it to on_event (if any); returns the event.'''
+    event = ProgressEvent(kind, subject, year, **fields)
+    if on_event is not None:
+        on_event(event)
+    return event
+
+
+def print_events(event):
+    '''callback printing download confirmations and failures, as `see_progress=True` always has.'''
+    if event.kind in [EXTRACTED, FAILED]:
+        print(event.message())
+
+
+def print_failures(event):
+    '''callback printing only failures.'''
+    if event.kind == FAILED:
+        print(event.message())
+
+
+class ProgressBar:
+    '''tqdm-style single-line progress renderer; pass an instance as `on_event`.'''
+
+    def __init__(self, stream=None, width=30):
+        '''progress bar over queued, finished, cached and failed years, with bytes and throughput.
+
+        :param stream::
+          text stream to draw on; defaults to sys.stderr.
+        :param width::
+          width of the bar in characters.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> bar = ed.ProgressBar()
+        >>> ed.Enrollment(year_range=(1984,2023), on_event=bar).run()
+        enrollment [##############----------------] 19/40 years  2 cached  0 failed  48.3 MB  6.1 MB/s
+        >>> bar.close()
+        '''
+        self.stream = stream if stream is not None else sys.stderr
+        self.width = width
+        self.lock = threading.Lock()
+        self.total = self.done = self.cached = self.failed = self.nbytes = 0
+        self.subject = ''
+        self.started = None
+        self.drawn = False
+
+    def __call__(self, event):
+        with self.lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+            self.subject = event.subject
+            if event.kind == QUEUED:
+                self.total += 1
+            elif event.kind == DOWNLOADED:
+                self.nbytes += event.bytes or 0
+            elif event.kind == EXTRACTED:
+                self.done += 1
+            elif event.kind == FAILED:
+                self.done += 1
+                self.failed += 1
+            elif event.kind == SKIPPED_CACHED and event.year is not None:
+                self.total += 1
+                self.done += 1
+                self.cached += 1
+            else:
+                return
+            self.draw()
+
+    def line(self) -> str:
+        filled = int(self.width * self.done / self.total) if self.total else 0
+        elapsed = time.perf_counter() - self.started if self.started is not None else 0
+        rate = self.nbytes / elapsed / 2**20 if elapsed > 0 else 0
+        return (f"{self.subject} [{'#' * filled}{'-' * (self.width - filled)}] {self.done}/{self.total} years  "
+                f'{self.cached} cached  {self.failed} failed  {self.nbytes / 2**20:.1f} MB  {rate:.1f} MB/s')
+
+    def draw(self):
+        self.stream.write('\r' + self.line())
+        self.stream.flush()
+        self.drawn = True
+
+    def close(self):
+        '''ends the progress line.'''
+        with self.lock:
+            if self.drawn:
+                self.stream.write('\n')
+                self.stream.flush()
+                self.drawn = False
+
+
+@contextmanager
+def cleaning_events(subject, on_event):
+    '''sends a 'cleaned' ProgressEvent per year (with seconds and rows) while a subject's cleaner runs in
+    this thread, built from the cleaner's timing spans. With an executor, a year's seconds are its time on a
+    worker (its 'clean_year' span) plus adding it to the subject's data here.'''
+    if on_event is None:
+        yield
+        return
+    thread, year_starts, worker_seconds, rows_before = threading.get_ident(), {}, {}, [0]
+
+    def hook(record):
+        if threading.get_ident() != thread or record.get('subject') != subject or record.get('year') is None:
+            return
+        if record['span'] == 'clean_year': # cleaned on an executor's worker
+            worker_seconds[record['year']] = record['seconds']
+            return
+        year_starts.setdefault(record['year'], record['start'])
+        if record['span'] == 'concat': # last stage of each year
+            seconds = record['start'] + record['seconds'] - year_starts[record['year']]
+            seconds += worker_seconds.pop(record['year'], 0)
+            emit(on_event, CLEANED, subject, record['year'], seconds=seconds, rows=record['rows'] - rows_before[0])
+            rows_before[0] = record['rows']
+
+    add_hook(hook)
+    try:
+        yield
+    finally:
+        remove_hook(hook)
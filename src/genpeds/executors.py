@@ -0,0 +1,286 @@
+import os
+import time
+import pickle
+import sqlite3
+import threading
+import traceback
+import multiprocessing
+import concurrent.futures
+from contextlib import contextmanager
+
+from genpeds import shared
+
+BACKENDS = ['thread', 'process', 'queue']
+QUEUE_FILE = '.genpeds-queue.sqlite' # default queue, in the working directory
+POLL_SECONDS = 0.2 # how often queue workers look for tasks, and submitters for results
+HEARTBEAT_SECONDS = 10 # how often a queue worker marks its running task as alive
+LEASE_SECONDS = 60 # running tasks without a heartbeat for this long are queued again
+MAX_ATTEMPTS = 3 # claims of a task before it fails, e.g. when it kills every worker that runs it
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+def worker_settings() -> dict:
+    '''returns this process's settings that workers in other processes need: the download host and the
+    discovery catalog.'''
+    from genpeds import discovery, downloader # downloader itself uses this module
+    return {'base_url' : downloader.base_url(), 'catalog' : discovery.catalog_path()}
+
+
+def apply_settings(settings):
+    '''applies worker_settings() of the submitting process in a worker process. Workers share subject
+    directories with the submitter and each other, so they run in shared mode (see `genpeds.shared`).'''
+    from genpeds import discovery, downloader
+    downloader.set_base_url(settings['base_url'])
+    discovery.set_catalog_path(settings['catalog'])
+    shared.set_shared(True)
+
+
+class QueueExecutor(concurrent.futures.Executor):
+    '''executor backed by a work queue in a SQLite file. Tasks are pickled into the queue and claimed by
+    worker processes running `run_worker()` (`genpeds-cli worker <queue>`), which may be on other machines when the
+    file is on a filesystem they share; results come back through the same file.
+
+    Functions are pickled by reference, so workers need genpeds installed and must see the same paths (e.g.
+    subject directories) as the submitter. Workers renew a lease on their running task; tasks of a worker that
+    stopped renewing it are queued again, and fail after MAX_ATTEMPTS claims.'''
+
+    def __init__(self, path=QUEUE_FILE, local_workers=0, poll=POLL_SECONDS, timeout=None):
+        '''
+        :param path::
+          SQLite file holding the queue; created if needed.
+        :param local_workers::
+          number of worker processes to start on this machine, stopped by `.shutdown()`; 0 relies on
+          workers started elsewhere.
+        :param poll::
+          seconds between checks for finished tasks.
+        :param timeout::
+          seconds after submission at which an unfinished task is dropped and its future fails with
+          TimeoutError, e.g. when no worker is running; None waits for workers indefinitely.
+        '''
+        self.path = os.path.abspath(path)
+        self.poll = poll
+        self.timeout = timeout
+        self.futures = {} # task id -> (Future, submission time)
+        self.lock = threading.Lock()
+        self.poller = None
+        self.closed = False
+        create_queue(self.path)
+        context = multiprocessing.get_context('spawn')
+        self.workers = [context.Process(target=run_worker, args=(self.path,), daemon=True)
+                        for _ in range(local_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, fn, /, *args, **kwargs):
+        if self.closed:
+            raise RuntimeError('cannot submit to a QueueExecutor after shutdown')
+        payload = pickle.dumps((fn, args, kwargs, worker_settings()))
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel() # queued tasks can't be taken back from other machines
+        with transaction(self.path) as conn:
+            task_id = conn.execute('INSERT INTO tasks (payload, status, updated) VALUES (?, ?, ?)',
+                                   (payload, QUEUED, time.time())).lastrowid
+        with self.lock:
+            self.futures[task_id] = (future, time.monotonic())
+            if self.poller is None or not self.poller.is_alive():
+                self.poller = threading.Thread(target=self.collect, daemon=True)
+                self.poller.start()
+        return future
+
+    def collect(self):
+        '''resolves futures as their tasks finish; runs in a thread while tasks are pending.'''
+        while True:
+            with self.lock:
+                pending = list(self.futures)
+                if not pending:
+                    self.poller = None
+                    return
+            with transaction(self.path) as conn:
+                requeue_expired(conn)
+                marks = ','.join('?' * len(pending))
+                rows = conn.execute(f'SELECT id, status, result FROM tasks WHERE id IN ({marks}) AND status IN (?, ?)',
+                                    (*pending, DONE, FAILED)).fetchall()
+                if self.timeout is not None:
+                    now, finished = time.monotonic(), {row[0] for row in rows}
+                    with self.lock:
+                        expired = [task_id for task_id, (_, submitted) in self.futures.items()
+                                   if task_id not in finished and now - submitted > self.timeout]
+                    error = pickle.dumps(TimeoutError(f'queued task not finished within {self.timeout} seconds'))
+                    rows += [(task_id, FAILED, error) for task_id in expired]
+                conn.executemany('DELETE FROM tasks WHERE id = ?', [(row[0],) for row in rows])
+            for task_id, status, result in rows:
+                with self.lock:
+                    future, _ = self.futures.pop(task_id)
+                if status == DONE:
+                    future.set_result(pickle.loads(result))
+                else:
+                    future.set_exception(pickle.loads(result))
+            if not rows:
+                time.sleep(self.poll)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.closed = True
+        if wait:
+            with self.lock:
+                pending = [future for future, _ in self.futures.values()]
+            concurrent.futures.wait(pending)
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+        self.workers = []
+
+
+@contextmanager
+def transaction(path):
+    '''yields a connection to a queue file, committing and closing it afterwards. The default rollback
+    journal (not WAL) is kept, since WAL needs shared memory that network filesystems don't provide.'''
+    conn = sqlite3.connect(path, timeout=60)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def create_queue(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with transaction(path) as conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, payload BLOB, '
+                     'status TEXT, result BLOB, worker TEXT, updated REAL, attempts INTEGER DEFAULT 0)')
+        if 'attempts' not in [col[1] for col in conn.execute('PRAGMA table_info(tasks)')]: # queue made by 1.1.1
+            conn.execute('ALTER TABLE tasks ADD COLUMN attempts INTEGER DEFAULT 0')
+
+
+def requeue_expired(conn, lease=LEASE_SECONDS):
+    '''queues again the running tasks whose worker hasn't renewed its lease for lease seconds (it died or
+    lost the filesystem); tasks claimed MAX_ATTEMPTS times fail instead.'''
+    expired = time.time() - lease
+    error = pickle.dumps(RuntimeError(f'task was claimed {MAX_ATTEMPTS} times by workers that stopped running it'))
+    conn.execute('UPDATE tasks SET status = ?, result = ? WHERE status = ? AND updated < ? AND attempts >= ?',
+                 (FAILED, error, RUNNING, expired, MAX_ATTEMPTS))
+    conn.execute('UPDATE tasks SET status = ?, worker = NULL WHERE status = ? AND updated < ?',
+                 (QUEUED, RUNNING, expired))
+
+
+def claim_task(conn, worker) -> tuple:
+    '''marks the oldest queued task as running by worker and returns (id, payload); None when the queue is
+    empty. BEGIN IMMEDIATE locks the file, so each task is claimed by one worker.'''
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        requeue_expired(conn)
+        row = conn.execute('SELECT id, payload FROM tasks WHERE status = ? ORDER BY id LIMIT 1', (QUEUED,)).fetchone()
+        if row is not None:
+            conn.execute('UPDATE tasks SET status = ?, worker = ?, updated = ?, attempts = attempts + 1 WHERE id = ?',
+                         (RUNNING, worker, time.time(), row[0]))
+    finally:
+        conn.execute('COMMIT')
+    return row
+
+
+def renew_lease(path, task_id, worker, stop, every=HEARTBEAT_SECONDS):
+    '''marks a running task as alive every `every` seconds until stop is set; runs in a thread of the worker.'''
+    while not stop.wait(every):
+        with transaction(path) as conn:
+            conn.execute('UPDATE tasks SET updated = ? WHERE id = ? AND status = ? AND worker = ?',
+                         (time.time(), task_id, RUNNING, worker))
+
+
+def run_task(payload) -> tuple:
+    '''runs a pickled task; returns (status, pickled result or exception).'''
+    try:
+        fn, args, kwargs, settings = pickle.loads(payload)
+        apply_settings(settings)
+        return DONE, pickle.dumps(fn(*args, **kwargs))
+    except Exception as er:
+        try:
+            return FAILED, pickle.dumps(er)
+        except Exception: # unpicklable exception
+            return FAILED, pickle.dumps(RuntimeError(traceback.format_exc()))
+
+
+def run_worker(path=QUEUE_FILE, poll=POLL_SECONDS, idle_timeout=None, max_tasks=None) -> int:
+    '''runs tasks from a queue file until stopped; returns the number of tasks run.
+
+    :param path: SQLite queue file, as given to QueueExecutor.
+    :param poll: seconds to wait before checking an empty queue again.
+    :param idle_timeout: stop after this many seconds without a task; None runs until killed.
+    :param max_tasks: stop after running this many tasks.
+    '''
+    path = os.path.abspath(path)
+    create_queue(path)
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None) # transactions managed in claim_task
+    worker = shared.owner()
+    ran, idle_since = 0, time.monotonic()
+    try:
+        while max_tasks is None or ran < max_tasks:
+            row = claim_task(conn, worker)
+            if row is None:
+                if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                    break
+                time.sleep(poll)
+                continue
+            stop = threading.Event()
+            lease = threading.Thread(target=renew_lease, args=(path, row[0], worker, stop), daemon=True)
+            lease.start()
+            try:
+                status, result = run_task(row[1])
+            finally:
+                stop.set()
+                lease.join()
+            # first result wins, if the task was queued again while this worker was slow to renew its lease
+            conn.execute('UPDATE tasks SET status = ?, result = ?, payload = NULL, updated = ? WHERE id = ? AND status IN (?, ?)',
+                         (status, result, time.time(), row[0], QUEUED, RUNNING))
+            ran, idle_since = ran + 1, time.monotonic()
+    finally:
+        conn.close()
+    return ran
+
+
+def make_executor(kind='thread', workers=None) -> concurrent.futures.Executor:
+    '''returns a new executor of a backend.
+
+    :param kind: 'thread' (threads in this process), 'process' (a pool of processes on this machine), 'queue'
+      (a QueueExecutor on QUEUE_FILE) or 'queue:<path>' (a QueueExecutor on path). Queue tasks are run by workers
+      started with `genpeds-cli worker <path>`; for local queue workers, pass `QueueExecutor(path, local_workers=n)`.
+    :param workers: number of threads or processes; defaults to the number of CPUs. Not used by queues.
+    '''
+    backend, _, path = kind.partition(':')
+    if backend not in BACKENDS:
+        raise ValueError(f"executor must be one of {BACKENDS} (or 'queue:<path>'), not {kind!r}")
+    if backend == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    if backend == 'process':
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                                      initializer=apply_settings, initargs=(worker_settings(),))
+    return QueueExecutor(path or QUEUE_FILE)
+
+
+@contextmanager
+def executor_scope(executor=None, workers=None):
+    '''yields an executor for a backend name (see `make_executor`), shutting it down afterwards; executor
+    objects (any `concurrent.futures.Executor`) are used as they are and left running.
+
+    :param executor: backend name, executor object, or None for 'thread'.
+    :param workers: number of workers of a new executor.
+    '''
+    if executor is not None and not isinstance(executor, str):
+        yield executor
+        return
+    pool = make_executor(executor or 'thread', workers)
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+
+
+def executor_width(executor) -> int:
+    '''returns how many tasks an executor runs at once: its number of threads or processes, its local queue
+    workers, or the number of CPUs when that isn't known (e.g. queue workers on other machines).'''
+    if isinstance(executor, QueueExecutor):
+        return len(executor.workers) or os.cpu_count()
+    return getattr(executor, '_max_workers', None) or os.cpu_count()
+
+
+def is_threaded(executor) -> bool:
+    '''returns True when executor runs tasks in this process, so callbacks can be passed to them.'''
+    return isinstance(executor, concurrent.futures.ThreadPoolExecutor)
@@ -0,0 +1,143 @@
+import concurrent.futures
+import warnings
+import pandas as pd
+
+from genpeds.cip import cip_codes
+from genpeds.cleaners import CLEANERS
+from genpeds.config import DATASETS
+from genpeds.discovery import available_years
+from genpeds.downloader import scrape_ipeds_data
+from genpeds.shared import remove_data_dir
+from genpeds.rollup import rollup_rules
+
+# cleaner keyword for each subject's level option
+LEVEL_ARGS = {
+    'enrollment' : 'student_level',
+    'completion' : 'level',
+    'graduation' : 'deg_level'
+}
+DROP_COLS = ['studentlevel', 'deglevel']
+
+
+def subject_years(subject, year_range):
+    '''returns list of years in year_range that a subject has data for.
+
+    :subject:       subject name
+    :year_range:    tuple of inclusive year integers, iterable of year integers, single year or None (all years)
+    '''
+    start, end = available_years(subject, probe=False) # counts years in the discovery catalog
+    if year_range is None:
+        years = range(start, end + 1)
+    elif isinstance(year_range, tuple):
+        years = range(year_range[0], year_range[1] + 1)
+    elif isinstance(year_range, int):
+        years = [year_range]
+    else:
+        years = year_range
+    return [yr for yr in years if start <= yr <= end]
+
+
+def fact_key(df, subject='cleaned'):
+    '''returns sorted int64 (id * 10000 + year) key index for a cleaned frame, dropping its id and year columns.
+    Rows with non-numeric ids and repeated institution-years (the last is kept) are dropped with a warning.'''
+    ids = pd.to_numeric(df['id'].astype(str).str.strip(), errors='coerce')
+    keep = ids.notna().to_numpy()
+    if not keep.all():
+        warnings.warn(f"{(~keep).sum()} {subject} rows dropped for non-numeric ids, e.g. {df['id'][~keep].iloc[0]!r}")
+    df = df.loc[keep]
+    key = ids[keep].to_numpy(dtype='int64') * 10000 + df['year'].to_numpy(dtype='int64')
+    df = df.drop(columns=['id', 'year']).set_index(pd.Index(key, name='key'))
+    repeated = df.index.duplicated(keep='last')
+    if repeated.any():
+        warnings.warn(f'{repeated.sum()} {subject} rows dropped for repeating an institution-year; the last is kept')
+    df = df.loc[~repeated]
+    return df.sort_index()
+
+
+def institution_year(df, subject):
+    '''returns cleaned subject data at one row per institution-year; Completion data is summed over 6-digit
+    CIPs, so 2 and 4 digit summary rows and the '99' grand total aren't counted again (as in `CipCube`).'''
+    if subject != 'completion':
+        return df
+    _, digits = cip_codes(df['cip'])
+    df = df.loc[digits == 6]
+    _, counts, evals = rollup_rules(subject, df.columns)
+    df = df.groupby(['id', 'year'], sort=False)[counts].sum(min_count=1).reset_index()
+    for eval_str in evals:
+        df = df.eval(eval_str)
+    return df
+
+
+def build_fact_table(subjects=('admissions', 'enrollment', 'graduation'), year_range=None, merge_with_char=True,
+                     see_progress=False, rm_disk=False, workers=1, on_event=None, executor=None) -> pd.DataFrame:
+    '''scrapes and cleans several subjects and returns one wide institution-year Pandas DataFrame.
+
+    Each subject is downloaded and cleaned once (Characteristics once for all), then joined on a sorted
+    integer (id, year) key. Subject columns are prefixed with the subject name, and with the level when
+    one is given, e.g. 'enrollment_grad_totmen_share'.
+
+    :param subjects::
+      iterable of subject names, or (subject, level) tuples, e.g. ['admissions', ('enrollment', 'grad'),
+      ('completion', 'bach')]. Completion data is summed over CIPs to the institution-year level.
+    :param year_range::
+      tuple of inclusive year integers (indicates a range), iterable of year integers, or single year;
+      each subject only downloads years it has data for. Defaults to all years.
+    :param merge_with_char::
+      (bool) When True, adds Characteristics variables (e.g. school name and state).
+    :param see_progress::
+      (bool) When True, prints successful download confirmation for each year's data.
+    :param rm_disk::
+      removes downloaded data from disk after the table is built.
+    :param workers::
+      number of subjects downloaded at the same time.
+    :param on_event::
+      optional callable receiving download ProgressEvents; see `genpeds.events`.
+    :param executor::
+      runs each subject's downloads and cleaning by year; see `genpeds.executors`.
+    '''
+    options = {'executor' : executor} if executor else {}
+    specs = []
+    for spec in subjects:
+        subject, level = (spec, None) if isinstance(spec, str) else spec
+        if subject not in CLEANERS or subject in ['characteristics', 'cip']:
+            raise ValueError("subjects must be in ['admissions', 'enrollment', 'completion', 'graduation']")
+        specs.append((subject, level))
+    if not specs:
+        raise ValueError('at least one subject is needed')
+
+    # plan: every subject directory is scraped once, whatever the number of levels requested
+    to_scrape = list(dict.fromkeys(subject for subject, _ in specs))
+    if merge_with_char:
+        to_scrape.append('characteristics')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        scrapes = [pool.submit(scrape_ipeds_data, subject=subject, year_range=subject_years(subject, year_range),
+                               see_progress=see_progress, on_event=on_event, **options)
+                   for subject in to_scrape if subject_years(subject, year_range)]
+        for future in scrapes:
+            future.result()
+
+    table = None
+    for subject, level in dict.fromkeys(specs):
+        kwargs = {LEVEL_ARGS[subject] : level} if level and subject in LEVEL_ARGS else {}
+        df = CLEANERS[subject](DATASETS[subject]['dir'], **kwargs, **options)
+        df = df.loc[df['year'].isin(subject_years(subject, year_range))]
+        df = fact_key(institution_year(df, subject).drop(columns=DROP_COLS, errors='ignore'), subject)
+        prefix = f'{subject}_{level}_' if level else f'{subject}_'
+        df = df.add_prefix(prefix)
+        table = df if table is None else table.join(df, how='outer') # sorted int64 keys: merge join
+
+    if merge_with_char:
+        char_df = CLEANERS['characteristics'](DATASETS['characteristics']['dir'], **options)
+        char_df = fact_key(char_df.loc[char_df['year'].isin(subject_years('characteristics', year_range))],
+                           'characteristics')
+        table = table.join(char_df, how='left')
+
+    if rm_disk:
+        for subject in to_scrape:
+            remove_data_dir(DATASETS[subject]['dir'], ignore_errors=True)
+
+    key = table.index.to_numpy()
+    table = table.reset_index(drop=True)
+    table.insert(0, 'year', key % 10000)
+    table.insert(0, 'id', (key // 10000).astype(str))
+    return table
@@ -0,0 +1,59 @@
+import os
+import json
+import hashlib
+import threading
+import requests
+
+from genpeds.shared import lock, unique_path
+
+MANIFEST_FILE = '.manifest.json' # in each subject directory; cleaners skip dotfiles
+MANIFEST_LOCK = threading.Lock()
+HEAD_TIMEOUT = 10 # seconds per HEAD request
+
+
+def load_manifest(data_dir) -> dict:
+    '''returns dict of year -> download record (etag, last_modified, size, md5, endpoint) for a subject
+    directory; empty when nothing was recorded.'''
+    try:
+        with open(os.path.join(data_dir, MANIFEST_FILE)) as filehandle:
+            return {int(year) : entry for year, entry in json.load(filehandle).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def record_download(data_dir, year, endpoint, response):
+    '''adds a downloaded year's validators (ETag, Last-Modified, size and MD5 of the zip) to the manifest.'''
+    entry = {'endpoint' : endpoint, 'etag' : response.headers.get('ETag'),
+             'last_modified' : response.headers.get('Last-Modified'), 'size' : len(response.content),
+             'md5' : hashlib.md5(response.content).hexdigest()}
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    with MANIFEST_LOCK, lock(f'{path}.lock'): # threads, then other processes in shared mode
+        manifest = load_manifest(data_dir)
+        manifest[int(year)] = entry
+        tmp_path = unique_path(path)
+        with open(tmp_path, 'w') as filehandle:
+            json.dump({str(yr) : manifest[yr] for yr in sorted(manifest)}, filehandle, indent=1)
+        os.replace(tmp_path, path)
+    return entry
+
+
+def remote_info(endpoint) -> dict:
+    '''returns the validators NCES sends for a file with a HEAD request (etag, last_modified, size); None when
+    the file isn't there. Raises requests.RequestException when the host can't be reached.'''
+    r = requests.head(endpoint, allow_redirects=True, timeout=HEAD_TIMEOUT)
+    if r.status_code >= 400 or 'html' in r.headers.get('Content-Type', ''):
+        return None
+    size = r.headers.get('Content-Length')
+    return {'etag' : r.headers.get('ETag'), 'last_modified' : r.headers.get('Last-Modified'),
+            'size' : int(size) if size is not None else None}
+
+
+def has_changed(local, remote) -> bool:
+    '''returns True when a remote file differs from the recorded download, comparing the strongest
+    validator both sides have: ETag, then Last-Modified, then size. Unrecorded downloads count as changed.'''
+    if local is None:
+        return True
+    for field in ['etag', 'last_modified', 'size']:
+        if local.get(field) is not None and remote.get(field) is not None:
+            return local[field] != remote[field]
+    return True
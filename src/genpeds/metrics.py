@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+HOOKS = [] # callables receiving one dict per finished span
+PROBES = [] # objects measuring each span (e.g. memory, see genpeds.profiling); `start()` returns a token and
+            # `stop(token)` a dict of fields added to the span's record
+
+
+class Span:
+    '''timed stage of work; tags like subject, year, bytes and rows are sent to hooks when the span ends.'''
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.start = None
+
+    def set(self, **tags):
+        '''adds tags, e.g. `span.set(rows=len(df), bytes=size)`.'''
+        self.tags.update(tags)
+
+    def __enter__(self):
+        if HOOKS: # nothing is timed unless someone is listening
+            self.started = time.time()
+            self.start = time.perf_counter()
+            self.probes = [(probe, probe.start()) for probe in PROBES]
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            record = {'span' : self.name, 'start' : self.started, 'seconds' : time.perf_counter() - self.start}
+            record.update(self.tags)
+            for probe, token in self.probes:
+                record.update(probe.stop(token))
+            if exc_type is not None:
+                record['error'] = exc_type.__name__
+            for hook in list(HOOKS):
+                hook(record)
+        return False
+
+
+def span(name, **tags) -> Span:
+    '''returns a context manager timing one stage, e.g.
+
+    >>> with span('read_csv', subject='enrollment', year=2020) as stage:
+    ...     df = pd.read_csv(path)
+    ...     stage.set(rows=len(df))
+    '''
+    return Span(name, tags)
+
+
+def traced(name, **tags):
+    '''decorator timing every call of a function as one span.'''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **tags):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name, started, seconds, **tags):
+    '''sends hooks a span timed elsewhere, e.g. a year cleaned in a worker thread or process.
+
+    :started:       wall-clock start, as `time.time()`
+    :seconds:       duration
+    '''
+    record = {'span' : name, 'start' : started, 'seconds' : seconds, **tags}
+    for hook in list(HOOKS):
+        hook(record)
+
+
+def add_hook(hook):
+    '''registers a callable that receives one dict per finished span; returns the hook.'''
+    HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    '''unregisters a hook added with `add_hook()`.'''
+    if hook in HOOKS:
+        HOOKS.remove(hook)
+
+
+@contextmanager
+def recording():
+    '''collects span dicts into a list while the block runs, e.g. to inspect a slow clean in a notebook.
+
+    >>> with recording() as spans:
+    ...     Enrollment(year_range=(2010,2023)).run()
+    >>> pd.DataFrame(spans).groupby('span')['seconds'].sum()
+    '''
+    spans = []
+    add_hook(spans.append)
+    try:
+        yield spans
+    finally:
+        remove_hook(spans.append)
+
+
+class JsonLinesExporter:
+    '''hook appending each span as one JSON line to a file.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self.lock, open(self.path, 'a') as filehandle:
+            filehandle.write(line)
+
+
+class PrometheusExporter:
+    '''hook totalling span counts, seconds, bytes, rows and errors by stage and subject, written as a
+    Prometheus text file (e.g. for the node_exporter textfile collector).'''
+    FIELDS = [
+        ('calls', 'genpeds_stage_calls_total', 'Finished spans per stage.'),
+        ('seconds', 'genpeds_stage_seconds_total', 'Seconds spent per stage.'),
+        ('bytes', 'genpeds_stage_bytes_total', 'Bytes downloaded, extracted or read per stage.'),
+        ('rows', 'genpeds_stage_rows_total', 'Rows read or produced per stage.'),
+        ('errors', 'genpeds_stage_errors_total', 'Spans ending in an exception per stage.')
+    ]
+
+    def __init__(self, path=None):
+        '''Prometheus text exporter.
+
+        :param path::
+          file written by `write()`; if given, it is rewritten after every span.
+        '''
+        self.path = path
+        self.totals = {} # (stage, subject) -> dict of field totals
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        key = (record['span'], record.get('subject', ''))
+        with self.lock:
+            totals = self.totals.setdefault(key, dict.fromkeys([field for field, _, _ in self.FIELDS], 0))
+            totals['calls'] += 1
+            totals['seconds'] += record['seconds']
+            totals['bytes'] += record.get('bytes', 0) or 0
+            totals['rows'] += record.get('rows', 0) or 0
+            totals['errors'] += 'error' in record
+        if self.path:
+            self.write()
+
+    def render(self) -> str:
+        '''returns totals in the Prometheus text exposition format.'''
+        lines = []
+        with self.lock:
+            for field, metric, help_text in self.FIELDS:
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+                for (stage, subject), totals in sorted(self.totals.items()):
+                    lines.append(f'{metric}{{stage="{stage}",subject="{subject}"}} {totals[field]:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path=None):
+        '''writes `render()` output to path (defaults to the exporter's path), replacing it atomically.'''
+        path = path or self.path
+        tmp_path = f'{path}.tmp{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w') as filehandle:
+            filehandle.write(self.render())
+        os.replace(tmp_path, path)
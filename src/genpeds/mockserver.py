@@ -0,0 +1,255 @@
+import time
+import random
+import hashlib
+import threading
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from genpeds import downloader
+from genpeds.cache import KeyedLocks
+from genpeds.config import DATASETS
+from genpeds.synthetic import synthetic_zip
+
+NOT_FOUND_PAGE = b'''<html><head><title>404 - File or directory not found.</title></head>
+<body><h2>404 - File or directory not found.</h2>
+<h3>The resource you are looking for might have been removed, had its name changed, or is temporarily unavailable.</h3>
+</body></html>'''
+
+CHUNK_BYTES = 16 * 2**10 # bandwidth is capped per chunk
+
+
+def nces_routes(last_year=None) -> dict:
+    '''returns dict of lowercased URL path -> (subject, year) for every subject-year file NCES serves.
+
+    :last_year: serve each subject through this year instead of its last available year, e.g. to test
+      discovery of new releases.
+    '''
+    routes = {}
+    for subject, spec in DATASETS.items():
+        start, end = spec['years_available']
+        for year in range(start, (last_year or end) + 1):
+            endpoint = downloader.get_file_endpoint(subject, year, extend=True) # later years keep the last pattern
+            routes[urlparse(endpoint).path.lower()] = (subject, year)
+    return routes
+
+
+def parse_range(header, size):
+    '''returns (start, end) byte positions (inclusive) of a single 'bytes=' Range header; None when it
+    should be ignored (multiple ranges); raises ValueError when it can't be satisfied.'''
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    if not first: # suffix range, e.g. bytes=-500
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f'range {header} outside {size} bytes')
+    return start, end
+
+
+class MockNCES(ThreadingHTTPServer):
+    '''threaded stand-in for nces.ed.gov serving synthetic zips under the same URL layout, with
+    configurable latency, bandwidth, errors and Range support.'''
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, bandwidth=None, error_rate=0.0, error_status=503, fail_first=0,
+                 missing=(), last_year=None, seed=0, quiet=True, **synthetic):
+        super().__init__(address, MockNCESHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_first = fail_first
+        self.missing = {tuple(item) if isinstance(item, (tuple, list)) else item for item in missing}
+        self.synthetic = dict(synthetic, seed=seed)
+        self.quiet = quiet
+        self.routes = nces_routes(last_year)
+        self.zips = {} # path -> zip bytes, built on first request
+        self.published = {} # path -> Last-Modified time
+        self.revisions = {} # path -> revised releases so far
+        self.zip_locks = KeyedLocks()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.failures = {} # path -> injected failures so far
+        self.requests = [] # (method, path, status, bytes sent) per request
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def content(self, path):
+        '''returns zip bytes for a path, or None when NCES would answer with its 404 page.'''
+        path = path.lower()
+        if path not in self.routes:
+            return None
+        subject, year = self.routes[path]
+        if year in self.missing or (subject, year) in self.missing:
+            return None
+        with self.zip_locks(path):
+            if path not in self.zips:
+                self.zips[path] = synthetic_zip(subject, year, revision=self.revisions.get(path, 0), **self.synthetic)
+                self.published[path] = time.time()
+        return self.zips[path]
+
+    def revise(self, subject, year):
+        '''republishes a subject-year file with new values (same institutions) and a later Last-Modified
+        time, like an NCES revised release.'''
+        path = urlparse(downloader.get_file_endpoint(subject, year, extend=True)).path.lower()
+        with self.zip_locks(path):
+            self.revisions[path] = self.revisions.get(path, 0) + 1
+            self.zips.pop(path, None) # rebuilt, with a new Last-Modified time, on the next request
+
+    def inject_error(self, path) -> bool:
+        '''returns True when this request should fail: the first `fail_first` requests of each file,
+        then `error_rate` of requests at random (seeded).'''
+        with self.lock:
+            if self.failures.get(path, 0) < self.fail_first:
+                self.failures[path] = self.failures.get(path, 0) + 1
+                return True
+            return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def record(self, method, path, status, nbytes):
+        with self.lock:
+            self.requests.append((method, path, status, nbytes))
+
+    def stats(self) -> dict:
+        '''returns request count, bytes sent and request count per status.'''
+        with self.lock:
+            statuses = {}
+            for _, _, status, _ in self.requests:
+                statuses[status] = statuses.get(status, 0) + 1
+            return {'requests' : len(self.requests), 'bytes' : sum(req[3] for req in self.requests),
+                    'statuses' : statuses}
+
+
+class MockNCESHandler(BaseHTTPRequestHandler):
+    '''serves GET and HEAD for NCES data paths, e.g. /ipeds/datacenter/data/EF2020A.zip'''
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        server = self.server
+        path = urlparse(self.path).path
+        if server.latency:
+            time.sleep(server.latency)
+        if server.inject_error(path):
+            if not server.error_status: # drop the connection without answering
+                server.record(self.command, path, 0, 0)
+                self.close_connection = True
+                return
+            return self.send(server.error_status, b'Service Unavailable', 'text/plain', send_body)
+        body = server.content(path)
+        if body is None:
+            return self.send(404, NOT_FOUND_PAGE, 'text/html', send_body)
+
+        headers = {'Accept-Ranges' : 'bytes', 'ETag' : f'"{hashlib.md5(body).hexdigest()}"',
+                   'Last-Modified' : formatdate(server.published[path.lower()], usegmt=True)}
+        if self.headers.get('Range'):
+            try:
+                byte_range = parse_range(self.headers['Range'], len(body))
+            except ValueError:
+                return self.send(416, b'', 'text/plain', send_body, {'Content-Range' : f'bytes */{len(body)}'})
+            if byte_range is not None:
+                start, end = byte_range
+                headers['Content-Range'] = f'bytes {start}-{end}/{len(body)}'
+                return self.send(206, body[start:end + 1], 'application/x-zip-compressed', send_body, headers)
+        self.send(200, body, 'application/x-zip-compressed', send_body, headers)
+
+    def send(self, status, body, content_type, send_body, headers=None):
+        # recorded before answering, so stats() counts every request a client has a response to
+        self.server.record(self.command, urlparse(self.path).path, status, len(body) if send_body else 0)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            for pos in range(0, len(body), CHUNK_BYTES):
+                chunk = body[pos:pos + CHUNK_BYTES]
+                self.wfile.write(chunk)
+                if self.server.bandwidth:
+                    time.sleep(len(chunk) / self.server.bandwidth)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_mock_server(host='127.0.0.1', port=0, **options) -> MockNCES:
+    '''returns a MockNCES server bound to host and port; call `.serve_forever()` to start it.
+
+    :param host::
+      address to bind; defaults to localhost only.
+    :param port::
+      port to bind; 0 picks a free port (see `.base_url`).
+    :param latency::
+      seconds to wait before answering each request.
+    :param bandwidth::
+      bytes per second each response is capped at; None for no cap.
+    :param error_rate::
+      share of requests answered with `error_status`, chosen at random (seeded).
+    :param error_status::
+      HTTP status of injected errors (default 503); 0 closes the connection without answering.
+    :param fail_first::
+      number of requests for each file that fail before it is served, for deterministic retry tests.
+    :param missing::
+      years, or (subject, year) pairs, answered with the NCES 404 page.
+    :param last_year::
+      serve each subject through this year, beyond its last available year.
+    :param seed::
+      random seed for file contents and error injection.
+    :param quiet::
+      (bool) When False, requests are logged.
+    :param n_institutions, n_programs::
+      scale of the synthetic files; see `genpeds.synthetic.synthetic_file()`.
+    '''
+    return MockNCES((host, port), **options)
+
+
+@contextmanager
+def mock_nces(**options):
+    '''runs a MockNCES server in a background thread and points downloads at it while the block runs;
+    yields the server.
+
+    -----------------
+    <h3>Example Use:</h3>
+    >>> from genpeds import Enrollment
+    >>> from genpeds.mockserver import mock_nces
+    >>> with mock_nces(latency=0.05, bandwidth=2**20, missing=[2003]) as nces:
+    ...     df = Enrollment(year_range=(2000,2010)).run() # 2003 fails with the NCES 404 page
+    >>> nces.stats()
+    {'requests': 11, 'bytes': 1583309, 'statuses': {200: 10, 404: 1}}
+    '''
+    server = make_mock_server(**options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    previous = downloader.BASE_URL
+    downloader.set_base_url(server.base_url)
+    try:
+        yield server
+    finally:
+        downloader.set_base_url(previous)
+        server.shutdown()
+        server.server_close()
+
+
+def serve_mock(host='127.0.0.1', port=8001, **options):
+    '''serves synthetic NCES files until interrupted; see `make_mock_server()` for options.'''
+    server = make_mock_server(host, port, **options)
+    print(f'serving mock NCES on {server.base_url}; point genpeds at it with GENPEDS_BASE_URL={server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+
+def factorize_units(df, unit):
+    '''returns (codes, units) for the unit columns of a cleaned frame; codes are sorted integer
+    positions and units is a (Multi)Index of the unique unit keys in code order. A missing key is a unit
+    of its own, sorted last.
+
+    :df:        cleaned subject data
+    :unit:      column name or list of column names identifying a unit, e.g. 'id' or ['id', 'cip']
+    '''
+    unit = [unit] if isinstance(unit, str) else list(unit)
+    combined = np.zeros(len(df), dtype='int64')
+    for col in unit:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        codes = np.where(codes < 0, len(uniques), codes) # missing keys get their own code, after the others
+        combined = combined * (len(uniques) + 1) + codes # one int64 per unit combination
+    codes, uniques = pd.factorize(combined, sort=True)
+
+    first_rows = np.unique(codes, return_index=True)[1] # one row per unit, in code order
+    if len(unit) == 1:
+        units = pd.Index(df[unit[0]].to_numpy()[first_rows], name=unit[0])
+    else:
+        units = pd.MultiIndex.from_frame(df[unit].iloc[first_rows])
+    return codes, units
+
+
+class Panel:
+    '''unit x year panel of cleaned IPEDS data, with one dense NumPy array per measure.'''
+
+    def __init__(self, units, years, measures, attrs=None):
+        '''unit x year panel of cleaned IPEDS data.
+
+        :param units::
+          pandas Index (or MultiIndex) of unit keys, one per row of each measure array.
+        :param years::
+          array of survey years, one per column of each measure array.
+        :param measures::
+          dict of measure name -> float array of shape (len(units), len(years)); NaN marks missing values.
+        :param attrs::
+          DataFrame of static unit attributes (e.g. name, state), aligned with units.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> enroll_df = ed.Enrollment(year_range=(1984,2023)).run(merge_with_char=True)
+        >>> panel = ed.Panel.from_frame(enroll_df)
+        >>> panel['totmen_share'].shape
+         (7000, 40) # institutions x years
+        >>> ma_change = panel.select(states=['Massachusetts'], years=(2000,2023)).diff('totmen_share')
+        '''
+        self.units = units
+        self.years = np.asarray(years)
+        self.measures = measures
+        self.attrs = attrs if attrs is not None else pd.DataFrame(index=units)
+
+    @classmethod
+    def from_frame(cls, df, unit='id', measures=None, attrs=('name', 'city', 'state')):
+        '''builds a Panel from any subject's cleaned output (e.g. the result of `.clean()` or `.run()`).
+
+        :param df::
+          cleaned subject data, with a 'year' column.
+        :param unit::
+          column (or list of columns) identifying a unit; Completion data needs ['id', 'cip'].
+        :param measures::
+          numeric columns to hold as arrays; defaults to every numeric column.
+        :param attrs::
+          static unit attributes to carry (latest non-missing value per unit); missing columns are skipped.
+        '''
+        unit_cols = [unit] if isinstance(unit, str) else list(unit)
+        attrs = [col for col in attrs if col in df.columns and col not in unit_cols]
+        if measures is None:
+            measures = [col for col in df.select_dtypes('number').columns
+                        if col not in unit_cols + attrs + ['year']]
+
+        unit_codes, units = factorize_units(df, unit)
+        year_vals = df['year'].to_numpy(dtype='int64')
+        years = np.arange(year_vals.min(), year_vals.max() + 1) if len(df) else np.array([], dtype='int64')
+        year_codes = year_vals - (years[0] if len(years) else 0)
+
+        cells = unit_codes * len(years) + year_codes
+        if len(np.unique(cells)) < len(cells):
+            raise ValueError(f'more than one row per unit-year for unit={unit}; '
+                             "Completion data, for example, needs unit=['id', 'cip']")
+
+        arrays = {}
+        for col in measures:
+            arr = np.full(len(units) * len(years), np.nan)
+            arr[cells] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            arrays[col] = arr.reshape(len(units), len(years))
+
+        order = np.argsort(year_vals, kind='stable') # latest year last
+        attr_df = pd.DataFrame(index=units)
+        for col in attrs:
+            vals = df[col].to_numpy()[order]
+            codes = unit_codes[order]
+            keep = pd.notna(vals)
+            latest = pd.Series(vals[keep]).groupby(codes[keep]).last()
+            attr_df[col] = latest.reindex(range(len(units))).to_numpy()
+
+        return cls(units, years, arrays, attr_df)
+
+    def __getitem__(self, measure):
+        '''returns the (units x years) array for a measure.'''
+        return self.measures[measure]
+
+    def __contains__(self, measure):
+        return measure in self.measures
+
+    def __repr__(self):
+        return f'Panel({len(self.units)} units x {len(self.years)} years, measures={list(self.measures)})'
+
+    @property
+    def shape(self):
+        '''(number of units, number of years)'''
+        return (len(self.units), len(self.years))
+
+    def get_measures(self):
+        '''returns list of measure names held by the panel.'''
+        return list(self.measures)
+
+    def select(self, ids=None, years=None, states=None):
+        '''returns a new Panel restricted to a set of institutions, years and/or states.
+
+        :param ids::
+          iterable of institution ids (matched against the 'id' level of the units).
+        :param years::
+          tuple of inclusive year integers (indicates a range), iterable of year integers, or single year.
+        :param states::
+          iterable of state names; requires a 'state' attribute (e.g. data merged with Characteristics).
+        '''
+        rows = np.ones(len(self.units), dtype=bool)
+        if ids is not None:
+            id_level = self.units.get_level_values('id') if 'id' in self.units.names else self.units
+            rows &= id_level.isin(list(ids))
+        if states is not None:
+            if 'state' not in self.attrs.columns:
+                raise ValueError("Panel has no 'state' attribute; build it from data merged with Characteristics")
+            rows &= self.attrs['state'].isin(list(states)).to_numpy()
+
+        cols = np.ones(len(self.years), dtype=bool)
+        if years is not None:
+            if isinstance(years, tuple):
+                start, end = years
+                cols = (self.years >= start) & (self.years <= end)
+            else:
+                cols = np.isin(self.years, [years] if isinstance(years, int) else list(years))
+
+        row_idx, col_idx = np.flatnonzero(rows), np.flatnonzero(cols)
+        measures = {col : arr[np.ix_(row_idx, col_idx)] for col, arr in self.measures.items()}
+        return Panel(self.units[row_idx], self.years[col_idx], measures, self.attrs.iloc[row_idx])
+
+    def lag(self, measure, periods=1):
+        '''returns the measure shifted forward along the year axis, i.e. value of `periods` years back.
+
+        :param measure::
+          measure name.
+        :param periods::
+          number of year columns to shift; negative values lead instead.
+        '''
+        arr = self.measures[measure]
+        out = np.full_like(arr, np.nan)
+        if periods > 0:
+            out[:, periods:] = arr[:, :-periods]
+        elif periods < 0:
+            out[:, :periods] = arr[:, -periods:]
+        else:
+            out[:] = arr
+        return out
+
+    def diff(self, measure, periods=1):
+        '''returns the year-over-year change of a measure (NaN where either year is missing).'''
+        return self.measures[measure] - self.lag(measure, periods)
+
+    def pct_change(self, measure, periods=1):
+        '''returns the year-over-year percent change of a measure.'''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.measures[measure] / self.lag(measure, periods) - 1) * 100
+
+    def rolling_mean(self, measure, window=3, min_periods=None):
+        '''returns the trailing rolling mean of a measure over `window` years, ignoring missing years.
+
+        :param window::
+          number of year columns in each window.
+        :param min_periods::
+          minimum number of non-missing values in a window; defaults to window.
+        '''
+        arr = self.measures[measure]
+        min_periods = window if min_periods is None else min_periods
+        observed = ~np.isnan(arr)
+        sums = np.cumsum(np.where(observed, arr, 0), axis=1)
+        counts = np.cumsum(observed, axis=1)
+        sums[:, window:] = sums[:, window:] - sums[:, :-window]
+        counts[:, window:] = counts[:, window:] - counts[:, :-window]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts >= max(min_periods, 1), sums / counts, np.nan)
+
+    def to_frame(self, measures=None, dropna=True):
+        '''returns the panel in long (unit, year) form as a Pandas DataFrame.
+
+        :param measures::
+          measure names to include; defaults to all.
+        :param dropna::
+          drops unit-years where every included measure is missing.
+        '''
+        measures = list(self.measures) if measures is None else list(measures)
+        n_units, n_years = self.shape
+        df = self.units.to_frame(index=False).iloc[np.repeat(np.arange(n_units), n_years)].reset_index(drop=True)
+        df['year'] = np.tile(self.years, n_units)
+        for col in measures:
+            df[col] = self.measures[col].ravel()
+        if dropna and measures:
+            df = df.loc[df[measures].notna().any(axis=1)].reset_index(drop=True)
+        return df
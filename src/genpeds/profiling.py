@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+from genpeds.metrics import PROBES, add_hook, remove_hook
+
+
+def rss_bytes():
+    '''returns the resident set size of this process in bytes; None where neither /proc nor psutil is available.'''
+    try:
+        with open('/proc/self/statm') as filehandle:
+            return int(filehandle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class MemoryProbe:
+    '''span probe adding memory fields to each span record:
+
+    :mem_start, mem_end, mem_peak:  bytes traced by tracemalloc (Python objects and NumPy/pandas buffers) at
+                                    the start and end of the span, and the most during it
+    :peak_bytes:                    mem_peak - mem_start; memory the stage needed on top of what it started with
+    :retained_bytes:                mem_end - mem_start; memory the stage left allocated
+    :rss_bytes, rss_peak_bytes:     resident set size at the end of the span, and the most sampled during it
+
+    tracemalloc is process-wide, so numbers from spans running in other threads at the same time overlap.
+    Without tracing (`trace=False`) only the RSS fields are filled in.
+    '''
+
+    def __init__(self, interval=0.01, trace=True):
+        self.interval = interval # seconds between RSS samples
+        self.trace = trace
+        self.frames = [] # open spans
+        self.lock = threading.Lock()
+        self.sampling = None
+
+    def traced(self):
+        return tracemalloc.get_traced_memory() if self.trace else (0, 0)
+
+    def start(self):
+        current, peak = self.traced()
+        rss = rss_bytes()
+        with self.lock:
+            for frame in self.frames: # keep open spans' peaks before resetting the shared one
+                frame['mem_peak'] = max(frame['mem_peak'], peak)
+            if self.trace:
+                tracemalloc.reset_peak()
+            frame = {'mem_start' : current, 'mem_peak' : current, 'rss_peak_bytes' : rss}
+            self.frames.append(frame)
+        return frame
+
+    def stop(self, frame):
+        current, peak = self.traced()
+        rss = rss_bytes()
+        with self.lock:
+            self.frames = [other for other in self.frames if other is not frame] # equal frames may be open
+            frame['mem_peak'] = max(frame['mem_peak'], peak)
+            for parent in self.frames:
+                parent['mem_peak'] = max(parent['mem_peak'], frame['mem_peak'])
+            rss_peak = max(filter(None, [frame['rss_peak_bytes'], rss]), default=None)
+        if not self.trace:
+            return {'rss_bytes' : rss, 'rss_peak_bytes' : rss_peak}
+        return {'mem_start' : frame['mem_start'], 'mem_end' : current, 'mem_peak' : frame['mem_peak'],
+                'peak_bytes' : frame['mem_peak'] - frame['mem_start'], 'retained_bytes' : current - frame['mem_start'],
+                'rss_bytes' : rss, 'rss_peak_bytes' : rss_peak}
+
+    def sample(self):
+        while not self.sampling.wait(self.interval):
+            rss = rss_bytes()
+            with self.lock:
+                for frame in self.frames:
+                    frame['rss_peak_bytes'] = max(frame['rss_peak_bytes'] or 0, rss or 0) or None
+
+    def start_sampling(self):
+        self.sampling = threading.Event()
+        threading.Thread(target=self.sample, daemon=True).start()
+
+    def stop_sampling(self):
+        if self.sampling is not None:
+            self.sampling.set()
+
+
+class MemoryProfile:
+    '''collects memory per stage and per subject-year while cleaners run; see `profile_memory()`.'''
+
+    def __init__(self, interval=0.01, trace=True):
+        '''memory profile of timed spans.
+
+        :param interval::
+          seconds between RSS samples.
+        :param trace::
+          (bool) When True, measures Python allocations with tracemalloc; exact per stage, but makes
+          string-heavy cleaning (e.g. `clean_completion`) 10-20 times slower. When False, only samples RSS.
+        '''
+        self.probe = MemoryProbe(interval, trace)
+        self.records = []
+        self.started_tracing = False
+
+    def __call__(self, record):
+        if 'rss_peak_bytes' in record:
+            self.records.append(record)
+
+    def start(self):
+        '''starts tracing (tracemalloc, if it isn't already) and recording; returns self.'''
+        if self.probe.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        PROBES.append(self.probe)
+        add_hook(self)
+        self.probe.start_sampling()
+        return self
+
+    def stop(self):
+        '''stops recording, and tracemalloc if `start()` started it.'''
+        self.probe.stop_sampling()
+        remove_hook(self)
+        if self.probe in PROBES:
+            PROBES.remove(self.probe)
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def stages(self) -> pd.DataFrame:
+        '''returns one row per span: stage, subject, year, seconds, peak, retained and RSS in megabytes.'''
+        df = pd.DataFrame(self.records)
+        if df.empty:
+            return pd.DataFrame(columns=['span', 'subject', 'year', 'seconds', 'rows', 'peak_mb', 'retained_mb', 'rss_mb', 'rss_peak_mb'])
+        df = df.reindex(columns=['span', 'subject', 'year', 'seconds', 'rows', 'peak_bytes', 'retained_bytes',
+                                 'rss_bytes', 'rss_peak_bytes']) # memory columns are NaN without tracing
+        for col in ['peak', 'retained', 'rss', 'rss_peak']:
+            df[f'{col}_mb'] = df.pop(f'{col}_bytes') / 2**20
+        return df
+
+    def years(self) -> pd.DataFrame:
+        '''returns one row per subject-year, from the first stage's start to the year's concat: seconds,
+        peak (above memory at the start of the year), retained and peak RSS in megabytes.'''
+        rows = []
+        year_records = [dict({'mem_start' : float('nan'), 'mem_end' : float('nan'), 'mem_peak' : float('nan')}, **record)
+                        for record in self.records if record.get('year') is not None]
+        for (subject, year), group in pd.DataFrame(year_records).groupby(['subject', 'year'], sort=False) if year_records else []:
+            group = group.sort_values('start')
+            first, last = group.iloc[0], group.iloc[-1]
+            rows.append({'subject' : subject, 'year' : year,
+                         'seconds' : last['start'] + last['seconds'] - first['start'],
+                         'peak_mb' : (group['mem_peak'].max() - first['mem_start']) / 2**20,
+                         'retained_mb' : (last['mem_end'] - first['mem_start']) / 2**20,
+                         'rss_peak_mb' : group['rss_peak_bytes'].max() / 2**20})
+        return pd.DataFrame(rows, columns=['subject', 'year', 'seconds', 'peak_mb', 'retained_mb', 'rss_peak_mb'])
+
+    def summary(self) -> pd.DataFrame:
+        '''returns one row per stage and subject: calls, total seconds, largest peak and total retained megabytes.'''
+        return (self.stages().groupby(['subject', 'span'], dropna=False)
+                .agg(calls=('seconds', 'size'), seconds=('seconds', 'sum'), peak_mb=('peak_mb', 'max'),
+                     retained_mb=('retained_mb', 'sum'), rss_peak_mb=('rss_peak_mb', 'max'))
+                .reset_index())
+
+    def to_dict(self) -> dict:
+        return {'created' : time.time(), 'stages' : self.stages().to_dict(orient='records'),
+                'years' : self.years().to_dict(orient='records')}
+
+    def write(self, path):
+        '''writes stages and subject-years as JSON, e.g. to compare memory between releases.'''
+        with open(path, 'w') as filehandle:
+            json.dump(self.to_dict(), filehandle, default=str, indent=1)
+
+
+@contextmanager
+def profile_memory(interval=0.01, trace=True):
+    '''records peak and retained memory per cleaning stage and subject-year while the block runs; yields a
+    MemoryProfile. Profile one cleaner at a time; see `MemoryProfile` for the cost of tracing.
+
+    -----------------
+    <h3>Example Use:</h3>
+    >>> from genpeds.cleaners import clean_completion
+    >>> from genpeds.profiling import profile_memory
+    >>> with profile_memory() as profile:
+    ...     df = clean_completion('completiondata')
+    >>> profile.years() # peak_mb and retained_mb per year
+    >>> profile.summary() # read_csv vs to_numeric vs concat
+    >>> profile.write('memory.json')
+    '''
+    profile = MemoryProfile(interval, trace).start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
@@ -0,0 +1,133 @@
+import os
+import concurrent.futures
+import requests
+import pandas as pd
+
+from genpeds.cleaners import CLEANERS, data_files
+from genpeds.config import DATASETS
+from genpeds.downloader import scrape_ipeds_data, get_file_endpoint
+from genpeds.events import FAILED, print_events, print_failures
+from genpeds.facts import subject_years
+from genpeds.manifest import load_manifest, remote_info, has_changed
+from genpeds.metrics import span
+
+# columns identifying a row of each subject's cleaned data
+KEY_COLUMNS = {
+    'characteristics' : ['id', 'year'],
+    'admissions' : ['id', 'year'],
+    'enrollment' : ['id', 'year'],
+    'completion' : ['id', 'cip', 'year'],
+    'graduation' : ['id', 'year'],
+    'cip' : ['cip', 'year']
+}
+NEW = 'new' # not on disk yet
+REVISED = 'revised' # remote file differs from the one downloaded
+UNTRACKED = 'untracked' # on disk without a manifest record, so downloaded again to get one
+UNCHANGED = 'unchanged'
+UNAVAILABLE = 'unavailable' # not on the NCES site
+FAILED_CHECK = 'failed' # HEAD request or download failed; the year was left as it was
+REFETCH = [NEW, REVISED, UNTRACKED]
+SUMMARY_COLUMNS = ['year', 'status', 'rows_before', 'rows_after', 'added', 'removed', 'changed']
+
+
+def check_years(subject, years, data_dir=None, workers=8) -> dict:
+    '''compares each year's NCES file (HEAD request, in parallel) with the manifest of downloaded files;
+    returns dict of year -> status (NEW, REVISED, UNTRACKED, UNCHANGED, UNAVAILABLE or FAILED_CHECK).
+
+    :param subject: subject name.
+    :param years: iterable of years to check.
+    :param data_dir: subject directory; defaults to the download directory.
+    :param workers: number of HEAD requests in flight at once.
+    '''
+    data_dir = data_dir or DATASETS[subject]['dir']
+    on_disk = os.path.isdir(data_dir)
+    manifest = load_manifest(data_dir) if on_disk else {}
+
+    def check(year):
+        try:
+            remote = remote_info(get_file_endpoint(subject, year, extend=True))
+        except requests.RequestException:
+            return FAILED_CHECK
+        if remote is None:
+            return UNAVAILABLE
+        if not on_disk or not data_files(data_dir, [year]):
+            return NEW
+        if year not in manifest:
+            return UNTRACKED
+        return REVISED if has_changed(manifest[year], remote) else UNCHANGED
+
+    years = list(years)
+    with span('check', subject=subject, years=len(years)), \
+         concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(years, pool.map(check, years)))
+
+
+def diff_years(old, new, keys) -> pd.DataFrame:
+    '''returns one row per year of cleaned data, counting rows before and after, rows added and removed
+    (by key columns) and kept rows with any changed value.
+
+    :param old, new: cleaned data of the same years, before and after.
+    :param keys: columns identifying a row, including 'year'.
+    '''
+    old = new.iloc[0:0] if old.empty else old
+    new = old.iloc[0:0] if new.empty else new
+    if old.empty and new.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS[:1] + SUMMARY_COLUMNS[2:])
+    merged = old.drop_duplicates(keys).merge(new.drop_duplicates(keys), on=keys, how='outer',
+                                             suffixes=('_old', '_new'), indicator=True)
+    both = merged['_merge'] == 'both'
+    changed = pd.Series(False, index=merged.index)
+    for col in [col for col in old.columns if col in new.columns and col not in keys]:
+        before, after = merged[f'{col}_old'], merged[f'{col}_new']
+        same = before.eq(after).fillna(False) | (before.isna() & after.isna())
+        changed |= both & ~same
+    counts = pd.DataFrame({'year' : merged['year'], 'added' : merged['_merge'] == 'right_only',
+                           'removed' : merged['_merge'] == 'left_only', 'changed' : changed})
+    counts = counts.groupby('year').sum()
+    counts['rows_before'] = old.groupby('year').size()
+    counts['rows_after'] = new.groupby('year').size()
+    return counts.fillna(0).astype('int64').reset_index()[SUMMARY_COLUMNS[:1] + SUMMARY_COLUMNS[2:]]
+
+
+def refresh_subject(subject, year_range=None, clean_kwargs=None, see_progress=False, on_event=None, workers=8, executor=None) -> tuple:
+    '''re-downloads the years of a subject whose NCES files changed since they were downloaded (revised
+    releases), or that aren't on disk, and re-cleans only those years; returns (summary, cleaned), where
+    summary has one row per checked year (see SUMMARY_COLUMNS) and cleaned is the re-cleaned years' data.
+
+    :param subject: subject name.
+    :param year_range: tuple of inclusive years, iterable of years, single year or None (all years).
+    :param clean_kwargs: dict of cleaner options, e.g. {'level' : 'mast'}.
+    :param see_progress: (bool) When True, prints a confirmation for each download.
+    :param on_event: callable receiving a ProgressEvent for each download step.
+    :param workers: number of HEAD requests in flight at once.
+    :param executor: runs the downloads and cleaning of the years; see `genpeds.executors`.
+    '''
+    data_dir = DATASETS[subject]['dir']
+    clean_kwargs = clean_kwargs or {}
+    statuses = check_years(subject, subject_years(subject, year_range), data_dir, workers)
+    refetch = [year for year, status in statuses.items() if status in REFETCH]
+    on_disk = [year for year in refetch if statuses[year] != NEW]
+
+    before = CLEANERS[subject](data_dir, years=on_disk, executor=executor, **clean_kwargs) if on_disk else pd.DataFrame()
+    failed = set()
+    printer = on_event or (print_events if see_progress else print_failures)
+    def track(event):
+        if event.kind == FAILED:
+            failed.add(event.year)
+        printer(event)
+    if refetch:
+        scrape_ipeds_data(subject, year_range=refetch, on_event=track, overwrite=True,
+                          executor=executor)
+    fetched = [year for year in refetch if year not in failed]
+    after = CLEANERS[subject](data_dir, years=fetched, executor=executor, **clean_kwargs) if fetched else pd.DataFrame()
+
+    diffs = diff_years(before.loc[before['year'].isin(fetched)] if fetched and not before.empty else pd.DataFrame(),
+                       after, KEY_COLUMNS[subject]).set_index('year')
+    rows = []
+    for year, status in sorted(statuses.items()):
+        status = FAILED_CHECK if year in failed else status
+        counts = diffs.loc[year].to_dict() if year in diffs.index else {}
+        rows.append(dict({'year' : year, 'status' : status}, **counts))
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    summary[SUMMARY_COLUMNS[2:]] = summary[SUMMARY_COLUMNS[2:]].astype('Int64') # NA for years not re-cleaned
+    return summary, after
@@ -0,0 +1,196 @@
+import os
+import re
+import pandas as pd
+
+RACE_COUNTS = ['totmen', 'totwomen', 'wtmen', 'wtwomen', 'bkmen', 'bkwomen',
+               'hspmen', 'hspwomen', 'asnmen', 'asnwomen']
+SHARE_EVALS = ['totmen_share = totmen / (totmen + totwomen) * 100'] + [
+    f'tot{attr}_share = ({attr}men + {attr}women) / (totmen + totwomen) * 100' for attr in ['wt', 'bk', 'hsp', 'asn']
+]
+
+'''
+ROLLUP RULES FOR EACH SUBJECT
+- KEYS ARE GROUPED ON ALONG WITH YEAR (AND STATE, FOR STATE ROLLUPS)
+- COUNTS ARE SUMMED, THEN SHARES/RATES ARE RECOMPUTED FROM THE SUMS
+'''
+ROLLUPS = {
+    'admissions' : {
+        'keys' : [],
+        'counts' : ['tot_applied', 'tot_admitted', 'tot_enrolled', 'men_applied', 'men_admitted', 'men_enrolled'],
+        'evals' : [
+            'men_applied_share = men_applied / tot_applied * 100',
+            'men_admitted_share = men_admitted / tot_admitted * 100',
+            'accept_rate_men = men_admitted / men_applied * 100',
+            'accept_rate_women = (tot_admitted - men_admitted) / (tot_applied - men_applied) * 100',
+            'yield_rate_men = men_enrolled / men_admitted * 100',
+            'yield_rate_women = (tot_enrolled - men_enrolled) / (tot_admitted - men_admitted) * 100'
+        ]
+    },
+    'enrollment' : {
+        'keys' : ['studentlevel'],
+        'counts' : RACE_COUNTS,
+        'evals' : SHARE_EVALS
+    },
+    'completion' : {
+        'keys' : ['deglevel', 'cip'],
+        'counts' : RACE_COUNTS,
+        'evals' : SHARE_EVALS
+    },
+    'graduation' : {
+        'keys' : ['deglevel'],
+        'counts' : RACE_COUNTS, # graduated counts and rates are added per completion window
+        'evals' : []
+    }
+}
+
+LEVELS = ['state', 'national']
+
+
+def rollup_rules(subject, columns):
+    '''returns (keys, counts, evals) for rolling up a subject's cleaned columns.
+
+    :subject:       subject name; options include ['admissions', 'enrollment', 'completion', 'graduation']
+    :columns:       columns of the cleaned data
+    '''
+    if subject not in ROLLUPS:
+        raise ValueError(f"subject must be one of {list(ROLLUPS)}")
+    rules = ROLLUPS[subject]
+    counts = [col for col in rules['counts'] if col in columns]
+    evals = list(rules['evals'])
+    if subject == 'graduation':
+        for col in columns:
+            if '_graduated' in col:
+                base, suffix = col.split('_graduated')
+                counts.append(col)
+                evals.append(f'gradrate_{base}{suffix} = {col} / {base} * 100')
+
+    return rules['keys'], counts, supported_evals(evals, counts)
+
+
+def supported_evals(evals, counts):
+    '''returns the eval strings whose right-hand side only uses the given count columns.'''
+    return [ev for ev in evals
+            if all(var in counts for var in re.findall(r'[a-z][a-z_0-9]*', ev.split('=')[1]))]
+
+
+def compute_rollups(df, subject):
+    '''returns dict of level -> rolled-up DataFrame for cleaned subject data merged with Characteristics.
+
+    :df:            cleaned subject data with a 'state' column (e.g. `run(merge_with_char=True)` output)
+    :subject:       subject name
+    '''
+    if 'state' not in df.columns:
+        raise ValueError("rollups need a 'state' column; use cleaned data merged with Characteristics")
+    keys, counts, evals = rollup_rules(subject, df.columns)
+
+    state_keys = ['year', 'state'] + keys
+    state_df = df.groupby(state_keys, dropna=False)[counts].sum(min_count=1).reset_index() # institution -> state
+    national_df = state_df.groupby(['year'] + keys, dropna=False)[counts].sum(min_count=1).reset_index() # state -> national
+
+    rollups = {}
+    for level, level_df in [('state', state_df), ('national', national_df)]:
+        for eval_str in evals:
+            level_df = level_df.eval(eval_str)
+        rollups[level] = level_df
+    return rollups
+
+
+class Rollup:
+    '''materialized state and national rollups of a cleaned subject, persisted by year.'''
+
+    def __init__(self, subject, rollup_dir=None):
+        '''materialized state and national rollups of a cleaned subject.
+
+        :param subject::
+          subject name; options include ['admissions', 'enrollment', 'completion', 'graduation'].
+        :param rollup_dir::
+          directory where rollup partitions are persisted; defaults to '{subject}rollups'.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> enroll_df = ed.Enrollment(year_range=(1984,2023)).run(merge_with_char=True)
+        >>> enroll_rollup = ed.Rollup('enrollment')
+        >>> enroll_rollup.update(enroll_df) # computes and persists every year
+        >>> enroll_rollup.get('state', years=(2010,2023), states=['Ohio'])
+        >>> enroll_rollup.update(revised_2023_df) # only 2023 partitions are recomputed
+        '''
+        self.subject = subject
+        self.rollup_dir = rollup_dir if rollup_dir else f'{subject}rollups'
+        self.tables = None
+
+    def partition_path(self, level, year):
+        '''returns file path of a level-year partition.'''
+        return os.path.join(self.rollup_dir, f'{self.subject}_{level}_{year}.csv')
+
+    def load(self):
+        '''loads persisted partitions into memory; returns dict of level -> DataFrame.'''
+        str_cols = {'state' : str, 'cip' : str, 'studentlevel' : str, 'deglevel' : str}
+        tables = {level : [] for level in LEVELS}
+        if os.path.isdir(self.rollup_dir):
+            for file in sorted(os.listdir(self.rollup_dir)):
+                match = re.fullmatch(rf'{self.subject}_(state|national)_(\d{{4}})\.csv', file)
+                if match:
+                    tables[match.group(1)].append(pd.read_csv(os.path.join(self.rollup_dir, file), dtype=str_cols))
+        self.tables = {level : pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+                       for level, parts in tables.items()}
+        return self.tables
+
+    def update(self, df):
+        '''computes rollups for the years (and levels, e.g. 'undergrad') present in newly cleaned data,
+        replacing only those partitions on disk and in memory; returns list of updated years.
+
+        :param df::
+          cleaned subject data with a 'state' column, for new or revised years.
+        '''
+        if self.tables is None:
+            self.load()
+        keys, _, _ = rollup_rules(self.subject, df.columns)
+        partition_keys = ['year'] + [key for key in keys if key != 'cip'] # e.g. year x studentlevel
+        os.makedirs(self.rollup_dir, exist_ok=True)
+
+        new_rollups = compute_rollups(df, self.subject)
+        years = sorted(int(yr) for yr in df['year'].unique())
+        for level in LEVELS:
+            old, new = self.tables[level], new_rollups[level]
+            if len(old):
+                replaced = old.set_index(partition_keys).index.isin(new.set_index(partition_keys).index)
+                old = old.loc[~replaced]
+            table = pd.concat([old, new], ignore_index=True) if len(old) else new
+            table = table.sort_values(['year'] + (['state'] if level == 'state' else []), kind='stable')
+            self.tables[level] = table.reset_index(drop=True)
+            for yr in years:
+                self.tables[level].loc[self.tables[level]['year'] == yr].to_csv(self.partition_path(level, yr), index=False)
+        return years
+
+    def get(self, level='state', years=None, states=None, **keys) -> pd.DataFrame:
+        '''returns materialized rollup rows; no re-aggregation is done.
+
+        :param level::
+          rollup level; options include ['state', 'national'].
+        :param years::
+          tuple of inclusive year integers (indicates a range), iterable of year integers, or single year.
+        :param states::
+          iterable of state names (state level only).
+        :param keys::
+          filters on the subject's rollup keys, e.g. studentlevel='grad', deglevel='bach' or cip='52.0801'.
+        '''
+        if level not in LEVELS:
+            raise ValueError(f'level must be one of {LEVELS}')
+        if self.tables is None:
+            self.load()
+        df = self.tables[level]
+        if not len(df):
+            return df
+        mask = pd.Series(True, index=df.index)
+        if years is not None:
+            if isinstance(years, tuple):
+                start, end = years
+                mask &= df['year'].between(start, end)
+            else:
+                mask &= df['year'].isin([years] if isinstance(years, int) else list(years))
+        if states is not None:
+            mask &= df['state'].isin(list(states))
+        for key, val in keys.items():
+            mask &= df[key] == val
+        return df.loc[mask].reset_index(drop=True)
@@ -0,0 +1,139 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+
+def normalize_name(text):
+    '''returns lowercase ASCII text for matching: accents stripped, encoding replacement characters and
+    punctuation removed (so "Mary'S" and "Marys" match), '&' spelled out and spaces collapsed.
+    '''
+    if not isinstance(text, str):
+        return ''
+    text = text.replace('\ufffd', '').replace('&', ' and ')
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r"['`]", '', text.casefold())
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    return text.strip()
+
+
+def trigrams(text):
+    '''returns set of character trigrams of normalized text, padded so word starts count more.'''
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    '''trigram inverted index over institution names, past names and cities.'''
+
+    def __init__(self, doc_ids, doc_texts, doc_fields, grams, offsets, postings, names):
+        '''trigram inverted index; build with `NameIndex.from_characteristics()` or `NameIndex.load()`.
+
+        :param doc_ids::
+          institution id of each indexed text.
+        :param doc_texts::
+          normalized indexed texts.
+        :param doc_fields::
+          field of each indexed text, 'name' or 'city'.
+        :param grams::
+          sorted array of trigrams.
+        :param offsets::
+          postings offsets per trigram (length len(grams) + 1).
+        :param postings::
+          document positions, grouped by trigram.
+        :param names::
+          dict of id -> most recent institution name, for display.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> char_df = ed.Characteristics(year_range=(1984,2023)).run()
+        >>> names = ed.NameIndex.from_characteristics(char_df)
+        >>> names.save('names.npz')
+        >>> names.search('st marys college notre dame', k=5) # ranked ids, names and scores
+        '''
+        self.doc_ids = np.asarray(doc_ids, dtype=object)
+        self.doc_texts = np.asarray(doc_texts, dtype=object)
+        self.doc_fields = np.asarray(doc_fields, dtype=object)
+        self.grams = np.asarray(grams, dtype=str)
+        self.offsets = np.asarray(offsets, dtype='int64')
+        self.postings = np.asarray(postings, dtype='int64')
+        self.names = names
+        self.doc_sizes = np.bincount(self.postings, minlength=len(self.doc_ids)) # trigrams per text
+
+    @classmethod
+    def from_characteristics(cls, char_df):
+        '''builds the index from cleaned Characteristics data; every distinct name an institution has had
+        across years is indexed, along with its city.
+
+        :param char_df::
+          cleaned Characteristics data (`Characteristics.clean()` output).
+        '''
+        char_df = char_df.sort_values('year', kind='stable')
+        names = char_df.dropna(subset=['name']).drop_duplicates('id', keep='last').set_index('id')['name'].to_dict()
+
+        docs = []
+        for field in ['name', 'city']:
+            field_df = char_df[['id', field]].dropna().drop_duplicates()
+            texts = field_df[field].map(normalize_name)
+            docs.append(pd.DataFrame({'id' : field_df['id'].to_numpy(), 'text' : texts.to_numpy(), 'field' : field}))
+        docs = pd.concat(docs, ignore_index=True).drop_duplicates()
+        docs = docs.loc[docs['text'] != ''].reset_index(drop=True)
+
+        gram_docs = [(gram, pos) for pos, text in enumerate(docs['text']) for gram in trigrams(text)]
+        pairs = pd.DataFrame(gram_docs, columns=['gram', 'doc']).sort_values(['gram', 'doc'], kind='stable')
+        grams, starts = np.unique(pairs['gram'].to_numpy(dtype=str), return_index=True)
+        offsets = np.append(starts, len(pairs))
+        return cls(docs['id'], docs['text'], docs['field'], grams, offsets, pairs['doc'].to_numpy(), names)
+
+    def save(self, path):
+        '''saves the index as a compressed NumPy .npz file.'''
+        name_ids = list(self.names)
+        np.savez_compressed(path, doc_ids=self.doc_ids.astype(str), doc_texts=self.doc_texts.astype(str),
+                            doc_fields=self.doc_fields.astype(str), grams=self.grams, offsets=self.offsets,
+                            postings=self.postings, name_ids=np.asarray(name_ids, dtype=str),
+                            name_values=np.asarray([self.names[i] for i in name_ids], dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        '''loads an index saved with `save()`.'''
+        with np.load(path) as arrays:
+            names = dict(zip(arrays['name_ids'].tolist(), arrays['name_values'].tolist()))
+            return cls(arrays['doc_ids'], arrays['doc_texts'], arrays['doc_fields'], arrays['grams'],
+                       arrays['offsets'], arrays['postings'], names)
+
+    def search(self, query, k=10, fields=('name', 'city'), city_weight=0.5) -> pd.DataFrame:
+        '''returns up to k institutions ranked by trigram similarity (Dice coefficient) to the query.
+
+        :param query::
+          user-entered institution name (or city).
+        :param k::
+          number of results.
+        :param fields::
+          fields to match against; options include ['name', 'city'].
+        :param city_weight::
+          multiplier for scores of city matches, so names rank first.
+        '''
+        query_grams = np.asarray(sorted(trigrams(normalize_name(query))), dtype=str)
+        if not len(query_grams) or not len(self.grams):
+            return pd.DataFrame({'id' : [], 'name' : [], 'matched' : [], 'score' : []})
+        pos = np.searchsorted(self.grams, query_grams)
+        found = pos < len(self.grams)
+        found[found] = self.grams[pos[found]] == query_grams[found]
+        pos = pos[found]
+
+        lengths = self.offsets[pos + 1] - self.offsets[pos]
+        block_starts = np.cumsum(lengths) - lengths
+        hits = self.postings[np.arange(lengths.sum()) + np.repeat(self.offsets[pos] - block_starts, lengths)]
+        overlap = np.bincount(hits, minlength=len(self.doc_ids))
+
+        scores = 2 * overlap / (len(query_grams) + self.doc_sizes)
+        scores = np.where(self.doc_fields == 'city', scores * city_weight, scores)
+        scores = np.where(np.isin(self.doc_fields, list(fields)), scores, 0)
+
+        top = np.flatnonzero(scores > 0)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        results = pd.DataFrame({'id' : self.doc_ids[top], 'matched' : self.doc_texts[top], 'score' : scores[top]})
+        results = results.drop_duplicates('id').head(k).reset_index(drop=True) # best match per institution
+        results.insert(1, 'name', results['id'].map(self.names))
+        return results
@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import time
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from genpeds.cache import LRUCache, KeyedLocks
+from genpeds.cleaners import CLEANERS
+from genpeds.config import DATASETS
+from genpeds.discovery import available_years
+from genpeds.downloader import scrape_ipeds_data
+from genpeds.facts import LEVEL_ARGS, subject_years
+
+
+def parse_list(value):
+    '''returns list of comma-separated query values, e.g. 'a,b' or repeated parameters.'''
+    return [item.strip() for part in value for item in part.split(',') if item.strip()]
+
+
+def parse_query_years(values):
+    '''returns year_range from query values: range '2001-2023', list '2001,2005' or single year '2022'.'''
+    years = parse_list(values)
+    try:
+        if len(years) == 1 and '-' in years[0]:
+            start, end = years[0].split('-')
+            return (int(start), int(end))
+        return [int(yr) for yr in years]
+    except ValueError:
+        raise ValueError(f"years must be a range like 2001-2023 or a comma-separated list, not '{','.join(values)}'")
+
+
+def missing_years(subject, years):
+    '''returns years of subject data not yet downloaded to the subject directory.'''
+    relevant_dir = DATASETS[subject]['dir']
+    if not os.path.isdir(relevant_dir):
+        return list(years)
+    on_disk = {re.sub(r'\.csv|\.html|\.xlsx|\.xls', '', ff) for ff in os.listdir(relevant_dir)}
+    return [yr for yr in years if f"{DATASETS[subject]['file_prefix']}_{yr}" not in on_disk]
+
+
+RETRY_SECONDS = 3600 # years that failed to download aren't tried again for this long
+
+
+class UnknownSubject(LookupError):
+    '''a request for a subject genpeds doesn't have; answered with 404.'''
+
+
+class GenpedsServer(ThreadingHTTPServer):
+    '''threaded HTTP server over cleaned subject data, with a shared download directory and result cache.'''
+    daemon_threads = True
+
+    def __init__(self, address, cache_bytes=256 * 2**20, quiet=False):
+        super().__init__(address, GenpedsHandler)
+        self.cache = LRUCache(cache_bytes) # cleaned frames and encoded responses
+        self.subject_locks = KeyedLocks() # one download/clean per subject at a time
+        self.failed = {} # (subject, year) -> time of its last failed download
+        self.quiet = quiet
+
+    def cleaned(self, subject, level, years):
+        '''returns cleaned subject data covering years, downloading missing years first; concurrent
+        requests for one subject wait on a single download and clean. Cleaned data is cached by year, so
+        only years not cached are cleaned, and a full panel larger than the cache still reuses its years.
+        Years that failed to download (e.g. not released by NCES) aren't tried again for RETRY_SECONDS.'''
+        with self.subject_locks(subject):
+            now = time.monotonic()
+            to_download = [yr for yr in missing_years(subject, years)
+                           if now - self.failed.get((subject, yr), -RETRY_SECONDS) >= RETRY_SECONDS]
+            if to_download:
+                scrape_ipeds_data(subject=subject, year_range=to_download, see_progress=False)
+                still_missing = missing_years(subject, to_download)
+                for yr in still_missing:
+                    self.failed[(subject, yr)] = now
+                fetched = set(to_download) - set(still_missing)
+                self.cache.invalidate(lambda key: key[:2] == ('clean', subject) and key[3] in fetched) # new files
+            missing = missing_years(subject, years)
+            parts = {yr : self.cache.get(('clean', subject, level, yr)) for yr in years if yr not in missing}
+            to_clean = [yr for yr, part in parts.items() if part is None]
+            if to_clean:
+                kwargs = {LEVEL_ARGS[subject] : level} if level and subject in LEVEL_ARGS else {}
+                df = CLEANERS[subject](DATASETS[subject]['dir'], years=to_clean, **kwargs)
+                for yr in to_clean:
+                    parts[yr] = df.loc[df['year'] == yr].reset_index(drop=True) if 'year' in df.columns else df
+                    self.cache.put(('clean', subject, level, yr), parts[yr])
+            if not parts:
+                return pd.DataFrame(columns=['id', 'year'])
+            return pd.concat(parts.values(), ignore_index=True)
+
+    def query(self, subject, params):
+        '''returns (content type, body bytes) for a subject query.'''
+        if subject not in CLEANERS:
+            raise UnknownSubject(f"no subject '{subject}'; options include {list(CLEANERS)}")
+        years = subject_years(subject, parse_query_years(params['years']) if 'years' in params else None)
+        level = params['level'][0] if 'level' in params else None
+        if level and subject not in LEVEL_ARGS:
+            raise ValueError(f'{subject} data has no levels')
+        ids = parse_list(params.get('ids', []))
+        columns = parse_list(params.get('columns', []))
+        fmt = params['format'][0] if 'format' in params else 'json'
+        if fmt not in ['json', 'arrow']:
+            raise ValueError("format must be in ['json', 'arrow']")
+
+        key = ('query', subject, level, tuple(years), tuple(ids), tuple(columns), fmt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        df = self.cleaned(subject, level, years)
+        df = df.loc[df['year'].isin(years)]
+        if ids:
+            df = df.loc[df['id'].isin(ids)]
+        if columns:
+            unknown = [col for col in columns if col not in df.columns]
+            if unknown:
+                raise ValueError(f'unknown columns {unknown}')
+            df = df[[col for col in ['id', 'year'] if col not in columns] + columns]
+
+        result = encode_frame(df.reset_index(drop=True), fmt)
+        self.cache.put(key, result, nbytes=len(result[1]))
+        return result
+
+
+def encode_frame(df, fmt):
+    '''returns (content type, body bytes) of a DataFrame as JSON records or an Arrow IPC stream.'''
+    if fmt == 'arrow':
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError('Arrow output needs pyarrow; install it or use format=json')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return 'application/vnd.apache.arrow.stream', sink.getvalue().to_pybytes()
+    return 'application/json', df.to_json(orient='records').encode()
+
+
+class GenpedsHandler(BaseHTTPRequestHandler):
+    '''routes: / (subjects), /cache (cache statistics), /{subject}?years=&level=&ids=&columns=&format='''
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.strip('/')
+        try:
+            if path in ['', 'subjects']:
+                body = {subject : {'description' : DATASETS[subject]['description'],
+                                   'years_available' : available_years(subject, probe=False),
+                                   'has_levels' : subject in LEVEL_ARGS} for subject in CLEANERS}
+                self.send('application/json', json.dumps(body).encode())
+            elif path == 'cache':
+                self.send('application/json', json.dumps(self.server.cache.info()).encode())
+            else:
+                self.send(*self.server.query(path, parse_qs(url.query)))
+        except UnknownSubject as er:
+            self.send_error_json(404, str(er))
+        except ValueError as er:
+            self.send_error_json(400, str(er))
+        except Exception as er: # e.g. a failed download or cleaning error; the client still gets an answer
+            self.log_error('%s failed: %r', self.path, er)
+            self.send_error_json(500, f'{type(er).__name__}: {er}')
+
+    def send(self, content_type, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send('application/json', json.dumps({'error' : message}).encode(), status)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host='127.0.0.1', port=8000, cache_mb=256, quiet=False) -> GenpedsServer:
+    '''returns a GenpedsServer bound to host and port; call `.serve_forever()` to start it.
+
+    :param host::
+      address to bind; defaults to localhost only.
+    :param port::
+      port to bind; 0 picks a free port.
+    :param cache_mb::
+      size limit of the cleaned-data and response cache, in megabytes.
+    :param quiet::
+      (bool) When True, requests are not logged.
+    '''
+    return GenpedsServer((host, port), cache_bytes=cache_mb * 2**20, quiet=quiet)
+
+
+def serve(host='127.0.0.1', port=8000, cache_mb=256):
+    '''serves cleaned subject data over HTTP until interrupted. Data is downloaded to the working directory.
+
+    -----------------
+    <h3>Example Use:</h3>
+    >>> import genpeds as ed
+    >>> ed.serve(port=8000)
+    $ curl 'localhost:8000/enrollment?years=2015-2020&level=grad&ids=166027&columns=totmen_share'
+    '''
+    server = make_server(host, port, cache_mb)
+    print(f'serving genpeds on http://{server.server_address[0]}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import threading
+from contextlib import contextmanager, nullcontext
+
+SHARED = None # set with set_shared()
+LOCK_TIMEOUT = 600 # seconds to wait for a lock before giving up
+STALE_SECONDS = 300 # locks of other hosts untouched for this long are taken over, e.g. after a crash there
+TAKEOVER_SECONDS = 30 # a takeover guard older than this was left by a crash
+REFS_DIR = '.refs' # in each subject directory: one file per process using it
+HELD = set() # subject directories this process holds a reference to
+
+
+def shared_mode() -> bool:
+    '''returns True when subject directories may be shared with other processes: the value given to
+    `set_shared()`, else whether the GENPEDS_SHARED environment variable is '1'.'''
+    return SHARED if SHARED is not None else os.environ.get('GENPEDS_SHARED') == '1'
+
+
+def set_shared(enabled=True):
+    '''turns shared directory mode on or off for this process; None goes back to GENPEDS_SHARED. In shared
+    mode, downloads of a subject-year are locked so only one process fetches it, and removing downloaded
+    data (`rm_disk=True`) only deletes a directory once no other process uses it.'''
+    global SHARED
+    SHARED = enabled
+
+
+def owner() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def process_alive(host, pid) -> bool:
+    '''returns False only when pid is known to have exited on this host.'''
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+def unique_path(path) -> str:
+    '''returns a hidden temporary name next to path, unique across processes and threads.'''
+    head, tail = os.path.split(path)
+    return os.path.join(head, f'.{tail}.{os.getpid()}.{uuid.uuid4().hex[:8]}.part')
+
+
+class FileLock:
+    '''cross-process lock held by creating a lock file with O_CREAT | O_EXCL, which only one process (or
+    thread) can do; works on local and network filesystems. Locks of exited processes on this host are taken
+    over. Holders on other hosts can't be checked, so they touch the lock file while they hold it, and their
+    locks are taken over once it goes untouched for `stale` seconds.'''
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT, poll=0.05, stale=STALE_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self.poll = poll
+        self.stale = stale
+        self.stop = None # set to end the thread touching the lock file
+
+    def holder(self):
+        '''returns (raw contents, parsed holder or None while being written, seconds since last touched); None
+        when there is no lock file.'''
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+            with open(self.path, 'rb') as filehandle:
+                raw = filehandle.read()
+        except FileNotFoundError:
+            return None
+        try:
+            return raw, json.loads(raw), age
+        except ValueError: # holder still writing
+            return raw, None, age
+
+    def is_stale(self, holder) -> bool:
+        _, info, age = holder
+        if info is not None and info['host'] == socket.gethostname():
+            return not process_alive(info['host'], info['pid']) # age doesn't matter: slow holders keep their lock
+        return age > self.stale
+
+    def take_over(self, holder) -> bool:
+        '''removes the lock file if it still holds the holder judged stale; returns True when removed. Guarded by a second lock file, so
+        two waiters can't both remove it, where the second would delete the lock the first just created.'''
+        guard = f'{self.path}.takeover'
+        try:
+            fd = os.open(guard, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(guard) > TAKEOVER_SECONDS: # guard holder crashed
+                    os.remove(guard)
+            except FileNotFoundError:
+                pass
+            return False
+        os.close(fd)
+        try:
+            current = self.holder()
+            if current is None or current[0] != holder[0]:
+                return False
+            os.remove(self.path)
+            return True
+        finally:
+            os.remove(guard)
+
+    def touch(self, stop):
+        while not stop.wait(self.stale / 10):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self.holder()
+                if holder is None or (self.is_stale(holder) and self.take_over(holder)):
+                    continue # released or taken over; try again
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'could not lock {self.path} within {self.timeout} seconds')
+                time.sleep(self.poll)
+                continue
+            with os.fdopen(fd, 'w') as filehandle:
+                json.dump({'host' : socket.gethostname(), 'pid' : os.getpid(), 'time' : time.time(),
+                           'token' : uuid.uuid4().hex}, filehandle) # token tells apart holders with reused pids
+            self.stop = threading.Event()
+            threading.Thread(target=self.touch, args=(self.stop,), daemon=True).start()
+            return self
+
+    def release(self):
+        if self.stop is not None:
+            self.stop.set()
+            self.stop = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def lock(path):
+    '''returns a FileLock on path in shared mode, else a no-op context manager.'''
+    return FileLock(path) if shared_mode() else nullcontext()
+
+
+def dir_lock(data_dir) -> FileLock:
+    '''lock guarding a subject directory's references; kept next to it, so it survives the directory.'''
+    head, tail = os.path.split(os.path.abspath(data_dir))
+    return FileLock(os.path.join(head, f'.{tail}.lock'))
+
+
+def year_lock(data_dir, year):
+    '''lock held while a subject-year is downloaded into data_dir (shared mode only).'''
+    return lock(os.path.join(data_dir, f'.{year}.lock'))
+
+
+def written_since(data_dir, year, since) -> bool:
+    '''returns True when a data file for year was written to data_dir after since (a time.time() value),
+    e.g. by another process while this one waited for the year's lock.'''
+    suffix = f'_{year}.'
+    with os.scandir(data_dir) as entries:
+        return any(entry.name[:1] != '.' and suffix in entry.name and entry.stat().st_mtime >= since
+                   for entry in entries)
+
+
+def acquire_dir(data_dir):
+    '''registers this process as a user of a subject directory (shared mode only), so other processes'
+    `rm_disk` leaves it in place; creates the directory if needed.'''
+    path = os.path.abspath(data_dir)
+    if not shared_mode() or path in HELD:
+        os.makedirs(path, exist_ok=True)
+        return
+    with dir_lock(path):
+        os.makedirs(os.path.join(path, REFS_DIR), exist_ok=True)
+        open(os.path.join(path, REFS_DIR, owner()), 'w').close()
+    HELD.add(path)
+
+
+def live_refs(data_dir) -> list:
+    '''returns the processes using a subject directory, removing references of exited processes.'''
+    refs_dir = os.path.join(data_dir, REFS_DIR)
+    if not os.path.isdir(refs_dir):
+        return []
+    live = []
+    for ref in os.listdir(refs_dir):
+        host, _, pid = ref.rpartition('-')
+        if pid.isdigit() and not process_alive(host, int(pid)):
+            os.remove(os.path.join(refs_dir, ref))
+        else:
+            live.append(ref)
+    return live
+
+
+def drop_ref(path):
+    HELD.discard(path)
+    try:
+        os.remove(os.path.join(path, REFS_DIR, owner()))
+    except FileNotFoundError:
+        pass
+
+
+def release_dir(data_dir):
+    '''drops this process's reference to a subject directory (shared mode only).'''
+    path = os.path.abspath(data_dir)
+    if not shared_mode():
+        return
+    with dir_lock(path):
+        drop_ref(path)
+
+
+@contextmanager
+def hold_dir(data_dir):
+    '''holds a reference to an existing subject directory while the block runs (shared mode only), e.g. while
+    cleaning it, and drops this process's reference afterwards, since its data has been read.'''
+    if not shared_mode() or not os.path.isdir(data_dir):
+        yield
+        return
+    acquire_dir(data_dir)
+    try:
+        yield
+    finally:
+        release_dir(data_dir)
+
+
+def remove_data_dir(data_dir, ignore_errors=False) -> bool:
+    '''removes downloaded subject data; returns True when the directory was deleted. In shared mode, drops
+    this process's reference instead, and deletes the directory only when no other process uses it.'''
+    if not shared_mode():
+        shutil.rmtree(data_dir, ignore_errors=ignore_errors)
+        return True
+    path = os.path.abspath(data_dir)
+    with dir_lock(path):
+        drop_ref(path)
+        if live_refs(path):
+            return False
+        shutil.rmtree(path, ignore_errors=ignore_errors)
+        return True
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = 69.05 # of latitude
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    '''returns great-circle distance in miles; arguments in degrees, broadcast like NumPy arrays.'''
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def latest_coordinates(char_df) -> pd.DataFrame:
+    '''returns one row per id with the most recent non-missing 'latitude' and 'longitude'.
+
+    :char_df:       cleaned Characteristics data (`Characteristics.clean()` output)
+    '''
+    coords = char_df[['id', 'year']].assign(
+        latitude=pd.to_numeric(char_df['latitude'], errors='coerce'),
+        longitude=pd.to_numeric(char_df['longitude'], errors='coerce')
+    )
+    valid = coords['latitude'].between(-90, 90) & coords['longitude'].between(-180, 180)
+    coords = coords.loc[valid].sort_values('year', kind='stable')
+    return coords.drop_duplicates('id', keep='last').drop(columns='year').reset_index(drop=True)
+
+
+def carry_back_coordinates(char_df) -> pd.DataFrame:
+    '''returns Characteristics data with each institution's most recent coordinates filled into every year
+    (coordinates are only published from 2009 on).
+
+    :char_df:       cleaned Characteristics data
+    '''
+    latest = latest_coordinates(char_df).set_index('id')
+    df = char_df.copy()
+    df['latitude'] = df['id'].map(latest['latitude'])
+    df['longitude'] = df['id'].map(latest['longitude'])
+    return df
+
+
+class SpatialIndex:
+    '''grid index over institution coordinates for radius and nearest-neighbour queries.'''
+
+    def __init__(self, ids, latitudes, longitudes, cell_degrees=0.5):
+        '''grid index over institution coordinates.
+
+        :param ids::
+          institution ids, one per point.
+        :param latitudes::
+          latitudes in degrees.
+        :param longitudes::
+          longitudes in degrees.
+        :param cell_degrees::
+          size of each grid cell in degrees; points are bucketed by cell and sorted by cell key.
+
+        -----------------
+        <h3>Example Use:</h3>
+        >>> import genpeds as ed
+        >>> char_df = ed.Characteristics(year_range=(2009,2023)).run()
+        >>> index = ed.SpatialIndex.from_characteristics(char_df)
+        >>> index.within(42.3601, -71.0589, miles=25) # ids and distances near Boston
+        >>> index.nearest(36.1447, -86.8027, k=10) # ten closest institutions to Nashville
+        '''
+        self.cell_degrees = cell_degrees
+        self.n_rows = int(np.ceil(180 / cell_degrees))
+        self.n_cols = int(np.ceil(360 / cell_degrees))
+
+        lats = np.asarray(latitudes, dtype='float64')
+        lons = np.asarray(longitudes, dtype='float64')
+        keys = self.cell_row(lats) * self.n_cols + self.cell_col(lons)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = np.asarray(ids, dtype=object)[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+
+    @classmethod
+    def from_characteristics(cls, char_df, cell_degrees=0.5):
+        '''builds the index from cleaned Characteristics data, using each institution's most recent coordinates.'''
+        coords = latest_coordinates(char_df)
+        return cls(coords['id'].to_numpy(), coords['latitude'].to_numpy(), coords['longitude'].to_numpy(), cell_degrees)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def cell_row(self, lats):
+        return np.clip(((np.asarray(lats) + 90) // self.cell_degrees).astype('int64'), 0, self.n_rows - 1)
+
+    def cell_col(self, lons):
+        return ((np.asarray(lons) + 180) // self.cell_degrees).astype('int64') % self.n_cols
+
+    def candidates(self, lat, lon, miles):
+        '''returns positions of points in the grid cells overlapping a bounding box around (lat, lon).'''
+        dlat = miles / MILES_PER_DEGREE
+        row_lo, row_hi = self.cell_row(max(lat - dlat, -90)), self.cell_row(min(lat + dlat, 90))
+        cos_lat = np.cos(np.radians(min(abs(lat) + dlat, 89.9)))
+        dlon = miles / (MILES_PER_DEGREE * cos_lat)
+        if dlon >= 180 or row_lo == 0 or row_hi == self.n_rows - 1:
+            col_ranges = [(0, self.n_cols - 1)] # near the poles or very large radius: every column
+        else:
+            col_lo, col_hi = self.cell_col(lon - dlon), self.cell_col(lon + dlon)
+            col_ranges = [(col_lo, col_hi)] if col_lo <= col_hi else [(col_lo, self.n_cols - 1), (0, col_hi)] # wraps at 180
+
+        rows = np.arange(row_lo, row_hi + 1)
+        lo = np.concatenate([rows * self.n_cols + c_lo for c_lo, _ in col_ranges])
+        hi = np.concatenate([rows * self.n_cols + c_hi for _, c_hi in col_ranges])
+        starts = np.searchsorted(self.keys, lo, side='left') # each cell row is one contiguous key range
+        ends = np.searchsorted(self.keys, hi, side='right')
+        lengths = ends - starts
+        block_starts = np.cumsum(lengths) - lengths
+        return np.arange(lengths.sum()) + np.repeat(starts - block_starts, lengths)
+
+    def within(self, lat, lon, miles=25) -> pd.DataFrame:
+        '''returns ids and distances (in miles) of institutions within a radius of a point, nearest first.
+
+        :param lat::
+          latitude of the point in degrees.
+        :param lon::
+          longitude of the point in degrees.
+        :param miles::
+          search radius in miles.
+        '''
+        pos = self.candidates(lat, lon, miles)
+        dist = haversine_miles(lat, lon, self.lats[pos], self.lons[pos])
+        keep = dist <= miles
+        pos, dist = pos[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return pd.DataFrame({'id' : self.ids[pos[order]], 'distance_miles' : dist[order]})
+
+    def nearest(self, lat, lon, k=10) -> pd.DataFrame:
+        '''returns ids and distances (in miles) of the k institutions nearest to a point, nearest first.
+
+        :param lat::
+          latitude of the point in degrees.
+        :param lon::
+          longitude of the point in degrees.
+        :param k::
+          number of neighbours.
+        '''
+        k = min(k, len(self))
+        miles = self.cell_degrees * MILES_PER_DEGREE
+        while True: # widen the radius until k points are inside it; every point within it has been checked
+            found = self.within(lat, lon, miles)
+            if len(found) >= k or miles > np.pi * EARTH_RADIUS_MILES:
+                return found.head(k)
+            miles *= 2
@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+import weakref
+import pandas as pd
+
+from genpeds.cache import object_nbytes
+from genpeds.metrics import span
+from genpeds.store import META_FILE, write_columns, read_columns
+
+UNITS = {'': 1, 'b' : 1, 'kb' : 2**10, 'mb' : 2**20, 'gb' : 2**30, 'tb' : 2**40}
+
+
+def parse_bytes(size):
+    '''returns a size in bytes from an integer or a string like '512MB' or '2 GB' (powers of 1024); None stays None.'''
+    if size is None or isinstance(size, int):
+        return size
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmgt]?b?)\s*', str(size).lower())
+    if match is None:
+        raise ValueError(f"memory size must be a number of bytes or like '512MB', not {size!r}")
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+
+class SpilledFrame:
+    '''out-of-core cleaned data: a sequence of parts (usually one per year), each either held in memory
+    or spilled to a columnar directory on disk. Spilled parts are deleted with the object, or by `.cleanup()`.'''
+
+    def __init__(self, parts, memory_limit=None, spill_dir=None, tmp_dir=None):
+        self.parts = parts # DataFrames, or directories written by write_columns()
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.tmp_dir = tmp_dir # owned directory holding the spilled parts
+        self.finalizer = weakref.finalize(self, shutil.rmtree, tmp_dir, True) if tmp_dir else None
+
+    def __len__(self):
+        return sum(len(part) if isinstance(part, pd.DataFrame) else spilled_rows(part) for part in self.parts)
+
+    def __repr__(self):
+        return (f'<SpilledFrame: {len(self)} rows, {len(self.columns)} columns, {len(self.parts)} parts '
+                f'({self.n_spilled} on disk)>')
+
+    @property
+    def n_spilled(self) -> int:
+        '''number of parts on disk.'''
+        return sum(not isinstance(part, pd.DataFrame) for part in self.parts)
+
+    @property
+    def columns(self) -> pd.Index:
+        '''columns of the whole data, in order of first appearance (as `pd.concat` would give).'''
+        names = {}
+        for part in self.parts:
+            names.update(dict.fromkeys(part.columns if isinstance(part, pd.DataFrame) else spilled_columns(part)))
+        return pd.Index(list(names))
+
+    def iter_parts(self):
+        '''yields each part as a DataFrame, reading spilled parts from disk one at a time.'''
+        for part in self.parts:
+            yield part if isinstance(part, pd.DataFrame) else read_columns(part)
+
+    def to_pandas(self) -> pd.DataFrame:
+        '''returns the whole data as one in-memory DataFrame.'''
+        if not self.parts:
+            return pd.DataFrame()
+        return pd.concat(list(self.iter_parts()), ignore_index=True)
+
+    def to_csv(self, path, **kwargs):
+        '''writes the whole data to a CSV file one part at a time, without loading it all; returns path.
+        Keyword arguments are passed to `DataFrame.to_csv`.'''
+        columns = self.columns
+        with open(path, 'w', newline='') as filehandle:
+            for pos, part in enumerate(self.iter_parts()):
+                part.reindex(columns=columns).to_csv(filehandle, header=(pos == 0), index=False, **kwargs)
+        return path
+
+    def map_parts(self, func) -> 'SpilledFrame':
+        '''returns a new SpilledFrame with func applied to each part; parts on disk stay on disk.'''
+        collector = YearCollector(None, self.memory_limit, self.spill_dir)
+        for part in self.parts:
+            if isinstance(part, pd.DataFrame):
+                collector.hold(func(part))
+                if collector.held > collector.memory_limit:
+                    collector.spill()
+            else:
+                collector.spill_part(func(read_columns(part)))
+        return collector.result()
+
+    def merge(self, right, **kwargs) -> 'SpilledFrame':
+        '''merges each part with an in-memory DataFrame, e.g. characteristics on ['id', 'year']; see `pd.merge`.
+        A SpilledFrame on the right is read into memory first.'''
+        if isinstance(right, SpilledFrame):
+            right = right.to_pandas()
+        return self.map_parts(lambda part: part.merge(right, **kwargs))
+
+    def cleanup(self):
+        '''deletes spilled parts from disk; the object can't be read afterwards.'''
+        if self.finalizer is not None:
+            self.finalizer()
+        self.parts = [part for part in self.parts if isinstance(part, pd.DataFrame)]
+
+
+def spilled_rows(part_dir):
+    return read_meta(part_dir)['rows']
+
+
+def spilled_columns(part_dir):
+    return [col['name'] for col in read_meta(part_dir)['columns']]
+
+
+def read_meta(part_dir):
+    with open(os.path.join(part_dir, META_FILE)) as filehandle:
+        return json.load(filehandle)
+
+
+class YearCollector:
+    '''gathers a cleaner's per-year results. Without a memory limit, years are concatenated as they come
+    and `.result()` is a DataFrame; with one, years are kept as parts, spilled to disk once the parts held
+    in memory pass the limit, and `.result()` is a SpilledFrame.'''
+
+    def __init__(self, subject, memory_limit=None, spill_dir=None):
+        self.subject = subject
+        self.memory_limit = parse_bytes(memory_limit)
+        self.spill_dir = spill_dir # parent of the temporary spill directory; defaults to the system's
+        self.frame = pd.DataFrame()
+        self.parts = []
+        self.held = 0 # bytes of parts in memory
+        self.rows = 0
+        self.tmp_dir = None
+
+    def add(self, year, df):
+        '''adds one year's cleaned data.'''
+        with span('concat', subject=self.subject, year=year) as stage:
+            if self.memory_limit is None:
+                self.frame = pd.concat([self.frame, df], ignore_index=True)
+            else:
+                self.hold(df)
+            self.rows += len(df)
+            stage.set(rows=self.rows)
+        if self.memory_limit is not None and self.held > self.memory_limit:
+            with span('spill', subject=self.subject, year=year) as stage:
+                stage.set(bytes=self.held)
+                self.spill()
+
+    def hold(self, df):
+        self.parts.append(df)
+        if self.memory_limit is not None:
+            self.held += object_nbytes(df)
+
+    def spill_part(self, df):
+        if self.tmp_dir is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self.tmp_dir = tempfile.mkdtemp(prefix='genpeds-spill-', dir=self.spill_dir)
+        part_dir = os.path.join(self.tmp_dir, f'part{len(self.parts):05d}')
+        os.makedirs(part_dir)
+        self.parts.append(write_columns(df, part_dir))
+
+    def spill(self):
+        '''writes every part held in memory to disk.'''
+        held, self.parts = self.parts, []
+        for part in held:
+            if isinstance(part, pd.DataFrame):
+                self.spill_part(part)
+            else:
+                self.parts.append(part)
+        self.held = 0
+
+    def result(self):
+        if self.memory_limit is None:
+            return self.frame
+        return SpilledFrame(self.parts, self.memory_limit, self.spill_dir, self.tmp_dir)
@@ -0,0 +1,152 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+META_FILE = 'meta.json'
+OPEN_STORES = {} # store dir -> (meta mtime, SubjectStore), so repeated lookups skip re-opening
+
+
+def write_columns(df, directory):
+    '''writes each column of a DataFrame to its own .npy file in directory, plus a meta.json describing
+    them; returns the directory. Read back with `read_columns()`.
+
+    :df:            data to write; column names are stored as strings
+    :directory:     existing directory to write into
+    '''
+    columns = []
+    for idx, col in enumerate(df.columns):
+        values = df[col]
+        null_file = None
+        if pd.api.types.is_bool_dtype(values) and not values.isna().any():
+            kind = 'bool'
+            arr = values.to_numpy(dtype=bool)
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            kind = 'number'
+            arr = values.to_numpy(dtype='float64', na_value=np.nan) if values.isna().any() else values.to_numpy()
+        else:
+            kind = 'string'
+            arr = values.astype(str).to_numpy(dtype=str) # fixed-width unicode, so it can be memory-mapped
+            nulls = values.isna().to_numpy()
+            if nulls.any():
+                null_file = f'{idx}_null.npy'
+                np.save(os.path.join(directory, null_file), nulls)
+        np.save(os.path.join(directory, f'{idx}.npy'), arr)
+        columns.append({'name' : str(col), 'kind' : kind, 'dtype' : str(values.dtype), 'file' : f'{idx}.npy',
+                        'null_file' : null_file})
+
+    with open(os.path.join(directory, META_FILE), 'w') as filehandle:
+        json.dump({'rows' : len(df), 'columns' : columns}, filehandle)
+    return directory
+
+
+def read_columns(directory) -> pd.DataFrame:
+    '''reads a directory written by `write_columns()` back into a DataFrame with the original dtypes.'''
+    with open(os.path.join(directory, META_FILE)) as filehandle:
+        meta = json.load(filehandle)
+    data = {}
+    for col in meta['columns']:
+        vals = np.load(os.path.join(directory, col['file']))
+        if vals.dtype.kind == 'U':
+            vals = vals.astype(object)
+            if col['null_file']:
+                vals[np.load(os.path.join(directory, col['null_file']))] = None
+        data[col['name']] = pd.Series(vals).astype(col['dtype']) if 'dtype' in col else vals
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']))
+
+
+def write_store(df, store_dir):
+    '''writes cleaned subject data to a store directory, sorted by (id, year), one .npy file per column
+    plus an offset index over ids; returns the store directory.
+
+    :df:            cleaned subject data, with 'id' and 'year' columns
+    :store_dir:     directory to write; replaced if it exists
+    '''
+    df = df.assign(id=df['id'].astype(str).str.strip())
+    df = df.sort_values(['id', 'year'], kind='stable').reset_index(drop=True)
+    ids = df['id'].to_numpy(dtype=str)
+    uniques, starts = np.unique(ids, return_index=True) # ids are sorted, so each id is one contiguous block
+    offsets = np.append(starts, len(df)).astype('int64')
+
+    tmp_dir = f'{store_dir}.tmp{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, '_ids.npy'), uniques)
+    np.save(os.path.join(tmp_dir, '_offsets.npy'), offsets)
+
+    write_columns(df, tmp_dir)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    OPEN_STORES.pop(os.path.abspath(store_dir), None)
+    return store_dir
+
+
+class SubjectStore:
+    '''memory-mapped, (id, year) sorted store of cleaned subject data with an id offset index.'''
+
+    def __init__(self, store_dir):
+        '''memory-mapped store of cleaned subject data; only the rows asked for are read from disk.
+
+        :param store_dir::
+          directory written by `write_store()` (or a subject class's `.build_store()`).
+        '''
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE)) as filehandle:
+            self.meta = json.load(filehandle)
+        self.ids = np.load(os.path.join(store_dir, '_ids.npy'))
+        self.offsets = np.load(os.path.join(store_dir, '_offsets.npy'))
+        self.columns = {}
+        for col in self.meta['columns']:
+            arr = np.load(os.path.join(store_dir, col['file']), mmap_mode='r')
+            nulls = np.load(os.path.join(store_dir, col['null_file']), mmap_mode='r') if col['null_file'] else None
+            self.columns[col['name']] = (arr, nulls)
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def row_ranges(self, ids):
+        '''returns row indices for the given ids, found by binary search over the sorted id index.'''
+        ids = np.asarray([str(i).strip() for i in ids], dtype=str)
+        pos = np.searchsorted(self.ids, ids)
+        found = pos < len(self.ids)
+        found[found] = self.ids[pos[found]] == ids[found]
+        pos = np.unique(pos[found]) # sorted id order, no repeats
+
+        starts, lengths = self.offsets[pos], self.offsets[pos + 1] - self.offsets[pos]
+        block_starts = np.cumsum(lengths) - lengths # position of each id's block in the output
+        return np.arange(lengths.sum()) + np.repeat(starts - block_starts, lengths)
+
+    def take(self, rows) -> pd.DataFrame:
+        '''returns the given rows as a Pandas DataFrame.'''
+        data = {}
+        for name, (arr, nulls) in self.columns.items():
+            vals = np.asarray(arr[rows])
+            if arr.dtype.kind == 'U':
+                vals = vals.astype(object)
+                if nulls is not None:
+                    vals[np.asarray(nulls[rows])] = None
+            data[name] = vals
+        return pd.DataFrame(data)
+
+    def get_institution(self, id) -> pd.DataFrame:
+        '''returns every stored year for one institution id.'''
+        pos = np.searchsorted(self.ids, str(id).strip())
+        if pos == len(self.ids) or self.ids[pos] != str(id).strip():
+            return self.take(np.array([], dtype='int64'))
+        return self.take(slice(self.offsets[pos], self.offsets[pos + 1]))
+
+    def get_institutions(self, ids) -> pd.DataFrame:
+        '''returns every stored year for several institution ids, in id order.'''
+        return self.take(self.row_ranges(ids))
+
+
+def open_store(store_dir):
+    '''returns an opened SubjectStore, reusing it until the store is rewritten.'''
+    path = os.path.abspath(store_dir)
+    mtime = os.path.getmtime(os.path.join(path, META_FILE))
+    cached = OPEN_STORES.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, SubjectStore(path))
+        OPEN_STORES[path] = cached
+    return cached[1]
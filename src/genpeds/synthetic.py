@@ -0,0 +1,334 @@
+'''synthetic NCES IPEDS files, written with each era's raw schema (column names, line codes, award levels,
+grtypes, CIP dictionary formats), for benchmarks and tests that must run without NCES.'''
+import io
+import os
+import zipfile
+import functools
+import numpy as np
+import pandas as pd
+
+from genpeds.config import DATASETS
+from genpeds.downloader import get_file_endpoint
+
+SUBJECT_SEEDS = {subject : num for num, subject in enumerate(DATASETS)} # separate random stream per subject
+
+RACE_CODES = {'wt' : ('11', '12', 'WHIT'), 'bk' : ('03', '04', 'BKAA'), 'hsp' : ('09', '10', 'HISP'),
+              'asn' : ('07', '08', 'ASIA')} # old RACE column numbers (men, women) and new column stem
+RACE_SHARES = {'wt' : 0.55, 'bk' : 0.3, 'hsp' : 0.45, 'asn' : 0.4} # share of what the previous races leave
+
+GRAD_LINES = [ # graduate enrollment line codes, as in clean_enrollment
+    (lambda y: y in [1984,1985], [11,25,10,24]),
+    (lambda y: (y == 1986) or (y in range(1990,1999)), [14,28,9,10,23,24]),
+    (lambda y: y in [1987,1988,1989], [14,28]),
+    (lambda y: y == 1999, [32,52,16]),
+    (lambda y: y in range(2000,2009), [11,25,9,23]),
+    (lambda y: y >= 2009, [11,25])
+]
+
+GRADUATION_GRTYPES = { # section -> (cohort grtype, {grtype : completion rate}), as in clean_graduation
+    2 : (8, {9 : 0.62, 10 : 0.05, 11 : 0.03, 12 : 0.2, 13 : 0.45}),
+    4 : (29, {30 : 0.3, 31 : 0.1, 32 : 0.05, 35 : 0.2})
+}
+
+CIP_FAMILIES = [
+    (9, 'Communication, Journalism, And Related Programs'), (11, 'Computer And Information Sciences'),
+    (13, 'Education'), (14, 'Engineering'), (23, 'English Language And Literature/Letters'),
+    (24, 'Liberal Arts And Sciences, General Studies And Humanities'), (26, 'Biological And Biomedical Sciences'),
+    (27, 'Mathematics And Statistics'), (40, 'Physical Sciences'), (42, 'Psychology'), (45, 'Social Sciences'),
+    (50, 'Visual And Performing Arts'), (51, 'Health Professions And Related Programs'),
+    (52, 'Business, Management, Marketing, And Related Support Services')
+]
+
+CITIES = [
+    ('New York', 'NY', 40.71, -74.01), ('Los Angeles', 'CA', 34.05, -118.24), ('Chicago', 'IL', 41.88, -87.63),
+    ('Houston', 'TX', 29.76, -95.37), ('Phoenix', 'AZ', 33.45, -112.07), ('Philadelphia', 'PA', 39.95, -75.17),
+    ('Boston', 'MA', 42.36, -71.06), ('Atlanta', 'GA', 33.75, -84.39), ('Seattle', 'WA', 47.61, -122.33),
+    ('Denver', 'CO', 39.74, -104.99), ('Nashville', 'TN', 36.16, -86.78), ('Columbus', 'OH', 39.96, -83.0),
+    ('Madison', 'WI', 43.07, -89.4), ('Ann Arbor', 'MI', 42.28, -83.74), ('Baton Rouge', 'LA', 30.45, -91.19),
+    ('Washington', 'DC', 38.91, -77.04), ('Portland', 'OR', 45.52, -122.68), ('Durham', 'NC', 35.99, -78.9),
+    ('Springfield', 'MO', 37.21, -93.29), ('Burlington', 'VT', 44.48, -73.21)
+]
+KINDS = ['University', 'State University', 'College', 'Community College', 'Institute of Technology',
+         'Technical College', 'School of Nursing', 'Beauty Academy']
+
+
+def generator(subject, year, seed, revision=0):
+    '''random stream of a subject-year's values; revisions of a file draw new values for the same institutions.'''
+    return np.random.default_rng([seed, SUBJECT_SEEDS[subject], year] + ([revision] if revision else []))
+
+
+@functools.lru_cache(maxsize=16)
+def institutions(n_institutions=1000, seed=0) -> pd.DataFrame:
+    '''returns the synthetic institution universe: ids, names, addresses, coordinates, and the years each
+    institution opened and closed, so panels have realistic churn.'''
+    rng = np.random.default_rng([seed, len(DATASETS)])
+    city_idx = rng.integers(0, len(CITIES), n_institutions)
+    cities = [CITIES[idx] for idx in city_idx]
+    kinds = rng.integers(0, len(KINDS), n_institutions)
+    opened = np.where(rng.random(n_institutions) < 0.8, 1984, rng.integers(1985, 2024, n_institutions))
+    closed = np.where(rng.random(n_institutions) < 0.9, 9999, rng.integers(1990, 2030, n_institutions))
+    return pd.DataFrame({
+        'unitid' : np.arange(100000, 100000 + 7 * n_institutions, 7)[:n_institutions].astype(str),
+        'instnm' : [f'{city[0]} {KINDS[kind]} {num}' for num, (city, kind) in enumerate(zip(cities, kinds))],
+        'addr' : [f'{num} College Ave' for num in rng.integers(1, 9999, n_institutions)],
+        'city' : [city[0] for city in cities],
+        'stabbr' : [city[1] for city in cities],
+        'zip' : [f'{num:05d}' for num in rng.integers(1000, 99999, n_institutions)],
+        'latitude' : np.round([city[2] for city in cities] + rng.normal(0, 0.2, n_institutions), 6),
+        'longitud' : np.round([city[3] for city in cities] + rng.normal(0, 0.2, n_institutions), 6),
+        'opened' : opened,
+        'closed' : np.maximum(closed, opened + 1)
+    })
+
+
+def active_institutions(year, n_institutions, seed) -> pd.DataFrame:
+    insts = institutions(n_institutions, seed)
+    return insts.loc[(insts['opened'] <= year) & (year < insts['closed'])].reset_index(drop=True)
+
+
+@functools.lru_cache(maxsize=16)
+def cip_codes(n_codes=400, seed=0) -> dict:
+    '''returns dict of synthetic six-digit CIP code -> label, spread over the CIP families.'''
+    rng = np.random.default_rng([seed, len(DATASETS) + 1])
+    programs = dict.fromkeys(range(len(CIP_FAMILIES)), 0) # programs so far per family
+    codes = {}
+    for family_idx in rng.integers(0, len(CIP_FAMILIES), n_codes):
+        family, title = CIP_FAMILIES[family_idx]
+        program = programs[family_idx]
+        programs[family_idx] += 1
+        codes[f'{family:02d}.{program // 9 + 1:02d}{program % 9 + 1:02d}'] = f'{title.split(",")[0]}, Program {program + 1}'
+    return codes
+
+
+def race_columns(rng, totals, year, old_prefix, new_prefix, total_stem='TOTL'):
+    '''returns dict of raw gender and race columns for totals (arrays of men and women): RACE-numbered
+    columns before 2008, both schemas in 2008-2009 and named columns from 2010, e.g. EFRACE15 or EFTOTLM.'''
+    men, women = totals
+    columns = {}
+    if year < 2010:
+        columns[f'{old_prefix}15'], columns[f'{old_prefix}16'] = men, women
+    if year >= 2008:
+        columns[f'{new_prefix}{total_stem}M'], columns[f'{new_prefix}{total_stem}W'] = men, women
+    for race, (old_men, old_women, new_stem) in RACE_CODES.items():
+        race_men = rng.binomial(men, RACE_SHARES[race])
+        race_women = rng.binomial(women, RACE_SHARES[race])
+        men, women = men - race_men, women - race_women
+        if year < 2010:
+            columns[f'{old_prefix}{old_men}'], columns[f'{old_prefix}{old_women}'] = race_men, race_women
+        if year >= 2008:
+            columns[f'{new_prefix}{new_stem}M'], columns[f'{new_prefix}{new_stem}W'] = race_men, race_women
+    return columns
+
+
+def with_flags(df, value_cols):
+    '''adds IPEDS-style X{column} imputation flag columns, which the cleaners read and drop.'''
+    flags = pd.DataFrame({f'X{col}' : 'R' for col in value_cols}, index=df.index)
+    return pd.concat([df, flags], axis=1)
+
+
+def synthetic_characteristics(year, n_institutions=1000, seed=0, revision=0, **_) -> pd.DataFrame:
+    insts = active_institutions(year, n_institutions, seed)
+    cols = ['unitid', 'instnm', 'addr', 'city', 'stabbr', 'zip']
+    if year > 1998:
+        cols.append('webaddr')
+        insts = insts.assign(webaddr=[f'www.inst{uid}.edu' for uid in insts['unitid']])
+    if year > 2008:
+        cols += ['longitud', 'latitude']
+    df = insts.loc[:, cols].rename(str.upper, axis='columns')
+    if year < 1997: # early files are in upper case
+        for col in ['INSTNM', 'ADDR', 'CITY']:
+            df[col] = df[col].str.upper()
+    df['SECTOR'] = generator('characteristics', year, seed, revision).integers(1, 10, len(df))
+    return df
+
+
+def synthetic_admissions(year, n_institutions=1000, seed=0, revision=0, **_) -> pd.DataFrame:
+    rng = generator('admissions', year, seed, revision)
+    insts = active_institutions(year, n_institutions, seed)
+    if year >= 2014: # ADM files only list institutions with admissions
+        insts = insts.loc[rng.random(len(insts)) < 0.45].reset_index(drop=True)
+    n = len(insts)
+    df = pd.DataFrame({'UNITID' : insts['unitid']})
+    for sex in ['M', 'W']:
+        applied = rng.poisson(rng.gamma(2, 1500, n))
+        admitted = rng.binomial(applied, rng.beta(5, 3, n))
+        enrolled = rng.binomial(admitted, rng.beta(2, 5, n))
+        df[f'APPLCN{sex}'], df[f'ADMSSN{sex}'] = applied, admitted
+        if year == 2001: # full-time and part-time only
+            df[f'ENRLFT{sex}'] = rng.binomial(enrolled, 0.9)
+            df[f'ENRLPT{sex}'] = enrolled - df[f'ENRLFT{sex}']
+        else:
+            df[f'ENRL{sex}'] = enrolled
+    if year >= 2014:
+        df['APPLCN'], df['ADMSSN'] = df['APPLCNM'] + df['APPLCNW'], df['ADMSSNM'] + df['ADMSSNW']
+        df['ENRLT'] = df['ENRLM'] + df['ENRLW']
+    df['SATPCT'], df['ACTPCT'] = rng.integers(0, 101, n), rng.integers(0, 101, n)
+    pctiles = ['25', '50', '75'] if year >= 2023 else ['25', '75']
+    for test, center, spread in [('SATVR', 560, 60), ('SATMT', 560, 70), ('ACTCM', 24, 4), ('ACTEN', 24, 5),
+                                 ('ACTMT', 23, 4)]:
+        base = rng.normal(center, spread, n)
+        for num, pctile in enumerate(pctiles):
+            df[f'{test}{pctile}'] = np.round(base + (num - (len(pctiles) - 1) / 2) * spread).astype(int)
+    if year < 2014: # IC files list every institution; open admissions schools leave these blank
+        values = df.columns[1:]
+        df[values] = df[values].astype('Int64')
+        df.loc[rng.random(n) < 0.55, values] = pd.NA
+    return df
+
+
+def synthetic_enrollment(year, n_institutions=1000, seed=0, revision=0, **_) -> pd.DataFrame:
+    rng = generator('enrollment', year, seed, revision)
+    insts = active_institutions(year, n_institutions, seed)
+    undergrad = [1,15] if year < 1986 else [8,22]
+    grad = next(lines for cond, lines in GRAD_LINES if cond(year))
+    lines = np.array(sorted(set(undergrad + grad + [29]))) # 29: grand total
+    ids = np.repeat(insts['unitid'].to_numpy(), len(lines))
+    line = np.tile(lines, len(insts))
+    has_grad = np.repeat(rng.random(len(insts)) < 0.6, len(lines))
+    keep = has_grad | ~np.isin(line, grad)
+    ids, line = ids[keep], line[keep]
+    size = np.where(np.isin(line, grad), 300, 2500)
+    totals = rng.poisson(rng.gamma(1.5, size / 1.5)), rng.poisson(rng.gamma(1.5, size / 1.5 * 1.2))
+    cols = race_columns(rng, totals, year, 'EFRACE', 'EF')
+    df = pd.DataFrame({'UNITID' : ids, 'LINE' : line, **cols})
+    return with_flags(df, list(cols))
+
+
+def synthetic_completion(year, n_institutions=1000, n_programs=30, seed=0, revision=0, **_) -> pd.DataFrame:
+    rng = generator('completion', year, seed, revision)
+    insts = active_institutions(year, n_institutions, seed)
+    codes = np.array(list(cip_codes(seed=seed)))
+    awlevels = np.array([3,5,7,9] if year < 2010 else [3,5,7,17,18,19])
+    n = len(insts) * n_programs
+    totals = rng.poisson(rng.gamma(1.2, 15, n)), rng.poisson(rng.gamma(1.2, 18, n))
+    cols = race_columns(rng, totals, year, 'CRACE', 'C', total_stem='TOTAL')
+    df = pd.DataFrame({
+        'UNITID' : np.repeat(insts['unitid'].to_numpy(), n_programs),
+        'CIPCODE' : rng.choice(codes, n),
+        'MAJORNUM' : np.where(rng.random(n) < 0.9, 1, 2), # second majors repeat a program
+        'AWLEVEL' : rng.choice(awlevels, n),
+        **cols
+    })
+    return with_flags(df, list(cols))
+
+
+def synthetic_graduation(year, n_institutions=1000, seed=0, revision=0, **_) -> pd.DataFrame:
+    rng = generator('graduation', year, seed, revision)
+    insts = active_institutions(year, n_institutions, seed)
+    frames = []
+    for section, (cohort_type, rates) in GRADUATION_GRTYPES.items():
+        ids = insts['unitid'].to_numpy()[rng.random(len(insts)) < (0.6 if section == 2 else 0.5)]
+        cohort = rng.poisson(rng.gamma(1.5, 400, len(ids))), rng.poisson(rng.gamma(1.5, 480, len(ids)))
+        cohort_cols = race_columns(rng, cohort, year, 'GRRACE', 'GR')
+        frames.append(pd.DataFrame({'UNITID' : ids, 'GRTYPE' : cohort_type, 'CHRTSTAT' : 12, 'SECTION' : section,
+                                    'COHORT' : section, **cohort_cols}))
+        for num, (grtype, rate) in enumerate(rates.items()):
+            completers = {col : rng.binomial(val, rate) for col, val in cohort_cols.items()}
+            frames.append(pd.DataFrame({'UNITID' : ids, 'GRTYPE' : grtype, 'CHRTSTAT' : 13 + num, 'SECTION' : section,
+                                        'COHORT' : section, **completers}))
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(['UNITID', 'GRTYPE'], kind='stable').reset_index(drop=True)
+
+
+def synthetic_cip(year, seed=0, **_) -> pd.DataFrame:
+    '''CIP dictionary rows for a year: two-digit family rows ('52 - Business...') and six-digit programs.'''
+    codes = cip_codes(seed=seed)
+    families = {f'{family:02d}' : f'{family:02d} - {title.upper()}' for family, title in CIP_FAMILIES}
+    rows = [(code, label) for code, label in families.items()]
+    rows += [(code, label.upper() if year < 2008 else label) for code, label in codes.items()]
+    return pd.DataFrame(sorted(rows), columns=['codevalue', 'valuelabel'])
+
+
+def cip_html(df) -> bytes:
+    '''CIP dictionary frequency table as the older NCES html pages lay it out.'''
+    rows = ['<tr bgcolor="White"><td>Value label</td><td>Code value</td><td>Frequency</td></tr>']
+    for num, (code, label) in enumerate(zip(df['codevalue'], df['valuelabel'])):
+        rows.append(f'<tr bgcolor="{"Silver" if num % 2 else "White"}"><td>{label}</td><td>{code}</td><td>1</td></tr>')
+    rows.append(f'<tr bgcolor="White"><td>Totals</td><td></td><td>{len(df)}</td></tr>')
+    return ('<html><body><table>' + '\n'.join(rows) + '</table></body></html>').encode()
+
+
+def cip_xlsx(df) -> bytes:
+    '''CIP dictionary as the newer NCES workbooks lay it out: a 'Frequencies' sheet with other variables' codes too.'''
+    freqs = pd.concat([
+        pd.DataFrame({'varname' : 'AWLEVEL', 'codevalue' : ['3', '5', '7', '17'],
+                      'valuelabel' : ["Associate's degree", "Bachelor's degree", "Master's degree", "Doctor's degree"]}),
+        df.assign(varname='CIPCODE').loc[:, ['varname', 'codevalue', 'valuelabel']]
+    ], ignore_index=True)
+    freqs.insert(0, 'varnumber', np.arange(len(freqs)))
+    freqs['frequency'] = 1
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        pd.DataFrame({'varname' : ['CIPCODE', 'AWLEVEL']}).to_excel(writer, sheet_name='Varlist', index=False)
+        freqs.to_excel(writer, sheet_name='Frequencies', index=False)
+    return buffer.getvalue()
+
+
+SYNTHETIC = {
+    'characteristics' : synthetic_characteristics,
+    'admissions' : synthetic_admissions,
+    'enrollment' : synthetic_enrollment,
+    'completion' : synthetic_completion,
+    'graduation' : synthetic_graduation,
+    'cip' : synthetic_cip
+}
+
+
+def synthetic_file(subject, year, n_institutions=1000, n_programs=30, seed=0, revision=0) -> tuple:
+    '''returns (extension, contents) of a synthetic raw file for a subject-year: csv for subject data, html
+    (before 2008) or xlsx CIP dictionaries.
+
+    :param n_institutions: size of the institution universe; about 90 percent are open in a given year.
+    :param n_programs: completion rows per institution.
+    :param seed: random seed; the same arguments always give the same file.
+    :param revision: revised release number; revisions keep the institutions but redraw their values (CIP
+      dictionaries don't change).
+    '''
+    df = SYNTHETIC[subject](year, n_institutions=n_institutions, n_programs=n_programs, seed=seed, revision=revision)
+    if subject == 'cip':
+        return ('.html', cip_html(df)) if year < 2008 else ('.xlsx', cip_xlsx(df))
+    return '.csv', df.to_csv(index=False).encode()
+
+
+def synthetic_zip(subject, year, **kwargs) -> bytes:
+    '''returns a zip archive of a synthetic subject-year file, named as in the NCES download for that year.'''
+    ext, contents = synthetic_file(subject, year, **kwargs)
+    member = get_file_endpoint(subject, year, extend=True).split('/')[-1].replace('_Dict.zip', '').replace('.zip', '').lower()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zfile:
+        zfile.writestr(member + ext, contents)
+    return buffer.getvalue()
+
+
+def write_synthetic_data(root='.', subjects=None, years=None, n_institutions=1000, n_programs=30, seed=0) -> dict:
+    '''writes synthetic raw files where `scrape_ipeds_data` would extract them; returns dict of subject -> directory.
+
+    :param root: directory holding the subject directories.
+    :param subjects: subjects to write; defaults to all.
+    :param years: iterable of years, or (start, end) tuple; each subject gets the ones it has available.
+      Defaults to all available years.
+    :param n_institutions: size of the institution universe.
+    :param n_programs: completion rows per institution.
+    :param seed: random seed.
+
+    -----------------
+    <h3>Example Use:</h3>
+    >>> from genpeds.synthetic import write_synthetic_data
+    >>> from genpeds.cleaners import clean_enrollment
+    >>> dirs = write_synthetic_data('bench', subjects=['enrollment'], years=(2000,2023), n_institutions=5000)
+    >>> clean_enrollment(dirs['enrollment'])
+    '''
+    if isinstance(years, tuple):
+        years = range(years[0], years[1] + 1)
+    dirs = {}
+    for subject in subjects or list(DATASETS):
+        start, end = DATASETS[subject]['years_available']
+        data_dir = os.path.join(root, DATASETS[subject]['dir'])
+        os.makedirs(data_dir, exist_ok=True)
+        prefix = 'cipcodes' if subject == 'cip' else DATASETS[subject]['file_prefix']
+        for year in [year for year in (years or range(start, end + 1)) if start <= year <= end]:
+            ext, contents = synthetic_file(subject, year, n_institutions, n_programs, seed)
+            with open(os.path.join(data_dir, f'{prefix}_{year}{ext}'), 'wb') as filehandle:
+                filehandle.write(contents)
+        dirs[subject] = data_dir
+    return dirs
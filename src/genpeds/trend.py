@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from genpeds.panel import Panel
+
+
+def masked_products(x, y, observed):
+    '''returns the per-cell terms (n, x, y, xx, xy, yy) of OLS running sums, zeroed where unobserved.
+
+    :x:            year offsets, shape (years,)
+    :y:            values, shape (rows, years)
+    :observed:     boolean mask of observed cells, shape (rows, years)
+    '''
+    y = np.where(observed, y, 0)
+    xo = np.where(observed, x, 0)
+    return (observed, xo, y, xo * x, xo * y, y * y)
+
+
+def ols_from_sums(n, sx, sy, sxx, sxy, syy):
+    '''returns (slope, intercept, sse) of closed-form simple OLS from running sums; works on arrays of any shape.'''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cxx = sxx - sx * sx / n # centered sums of squares/products
+        cxy = sxy - sx * sy / n
+        cyy = syy - sy * sy / n
+        slope = cxy / cxx
+        intercept = (sy - slope * sx) / n
+        sse = np.maximum(cyy - slope * cxy, 0)
+    return slope, intercept, sse
+
+
+def fit_batch(x, y, min_years, changepoints, min_segment):
+    '''fits trends (and optionally a single changepoint) for a batch of rows.'''
+    products = masked_products(x, y, ~np.isnan(y))
+    n, sx, sy, sxx, sxy, syy = [p.sum(axis=1) for p in products]
+    slope, intercept, sse = ols_from_sums(n, sx, sy, sxx, sxy, syy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = 1 - sse / (syy - sy * sy / n)
+    enough = n >= min_years
+    out = {
+        'n_years' : n,
+        'slope' : np.where(enough, slope, np.nan),
+        'intercept' : np.where(enough, intercept, np.nan),
+        'r2' : np.where(enough, r2, np.nan)
+    }
+    if not changepoints:
+        return out
+
+    # cumulative sums along the year axis; a break at column k splits [0,k) and [k,T)
+    cum = [np.cumsum(p, axis=1)[:, :-1] for p in products]
+    tot = [a[:, np.newaxis] for a in (n, sx, sy, sxx, sxy, syy)]
+    left = ols_from_sums(*cum)
+    right = ols_from_sums(*[t - c for t, c in zip(tot, cum)])
+
+    valid = (cum[0] >= min_segment) & (tot[0] - cum[0] >= min_segment)
+    total_sse = np.where(valid, left[2] + right[2], np.inf)
+    best = np.argmin(total_sse, axis=1)
+    rows = np.arange(len(y))
+    found = valid[rows, best]
+
+    out['changepoint'] = np.where(found, best + 1, -1) # column index of the first year after the break
+    out['slope_before'] = np.where(found, left[0][rows, best], np.nan)
+    out['slope_after'] = np.where(found, right[0][rows, best], np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['sse_reduction'] = np.where(found, 1 - total_sse[rows, best] / sse, np.nan)
+    return out
+
+
+def fit_trends(data, measure='totmen_share', unit=None, min_years=3, changepoints=False,
+               min_segment=3, batch_size=100_000) -> pd.DataFrame:
+    '''fits an OLS trend of a measure over years for every unit at once; returns Pandas DataFrame
+    with one row per unit.
+
+    :param data::
+      Panel, or cleaned subject data (e.g. output of `Enrollment.run()`, `Completion.run()` or `Graduation.run()`).
+    :param measure::
+      measure to fit, e.g. 'totmen_share' or 'gradrate_totwomen'.
+    :param unit::
+      unit column(s) when data is a DataFrame; defaults to ['id', 'cip'] for Completion data and 'id' otherwise.
+    :param min_years::
+      minimum number of observed years for a fit; units with fewer get NaN. Missing years are skipped.
+    :param changepoints::
+      (bool) When True, also finds the single break year that best splits each series into two linear
+      segments, returning 'changepoint_year', 'slope_before', 'slope_after' and 'sse_reduction'.
+    :param min_segment::
+      minimum number of observed years on each side of a changepoint.
+    :param batch_size::
+      number of units fit per batch, bounding memory for millions of series.
+
+    Slopes are in measure units per year; intercepts are the fitted value at the first panel year.
+    '''
+    if not isinstance(data, Panel):
+        if unit is None:
+            unit = ['id', 'cip'] if 'cip' in data.columns else 'id'
+        data = Panel.from_frame(data, unit=unit, measures=[measure], attrs=())
+
+    values = data[measure]
+    x = (data.years - data.years[0]).astype('float64') if len(data.years) else np.array([])
+    results = {}
+    for start in range(0, len(values), batch_size):
+        batch = fit_batch(x, values[start:start + batch_size], min_years, changepoints, min_segment)
+        for key, arr in batch.items():
+            results.setdefault(key, []).append(arr)
+
+    df = data.units.to_frame(index=False)
+    for key, parts in results.items():
+        df[key] = np.concatenate(parts)
+    if changepoints:
+        found = df['changepoint'] >= 0
+        df['changepoint_year'] = np.where(found, data.years[df['changepoint'].clip(lower=0).to_numpy()], np.nan)
+        df = df.drop(columns='changepoint')
+    df['measure'] = measure
+    return df
@@ -0,0 +1,76 @@
+from genpeds import BatchPlan, Completion
+from genpeds import batch, core
+from genpeds.batch import run_batch
+from genpeds.config import DATASETS
+from genpeds.spill import SpilledFrame
+from genpeds.synthetic import write_synthetic_data
+from genpeds.cli import main
+import json
+import os
+import pandas as pd
+import pytest
+
+def fake_cleaned():
+    '''cleaned frames by subject, shaped like each cleaner's output'''
+    return {
+        'completion' : pd.DataFrame({'id' : ['100', '100', '200'], 'year' : [2010, 2011, 2011], 'cip' : ['52.0801'] * 3,
+                                     'totmen' : [1, 2, 3]}),
+        'characteristics' : pd.DataFrame({'id' : ['100', '100', '200'], 'year' : [2010, 2011, 2011], 'name' : ['A', 'A', 'B']}),
+        'cip' : pd.DataFrame({'cip' : ['52.0801', '52.0801'], 'year' : [2010, 2011], 'ciplabel' : ['Finance'] * 2})
+    }
+
+def patch(monkeypatch, tmp_path):
+    calls = []
+    cleaned = fake_cleaned()
+    monkeypatch.chdir(tmp_path)
+    for subject in cleaned:
+        os.makedirs(DATASETS[subject]['dir'])
+    monkeypatch.setattr(core, 'scrape_ipeds_data', lambda subject, year_range, see_progress, on_event, executor:
+                        calls.append(('scrape', subject, tuple(year_range))))
+    monkeypatch.setattr(core, 'CLEANERS', {subject : (lambda d, subject=subject, **kwargs:
+                                                      calls.append(('clean', subject, kwargs.get('level'))) or cleaned[subject])
+                                           for subject in cleaned})
+    core.IPDS.clear_cache()
+    return calls
+
+def test_batch_dedupes(tmp_path, monkeypatch):
+    '''shared downloads and cleans run once per batch; each job keeps its own years'''
+    calls = patch(monkeypatch, tmp_path)
+    jobs = [{'subject' : 'completion', 'level' : lvl, 'years' : years, 'merge_with_char' : True}
+            for lvl, years in [('bach', '2010-2011'), ('mast', [2011]), ('doct', 2011)]]
+    results = BatchPlan(jobs).run(workers=3)
+
+    scrapes = sorted(call for call in calls if call[0] == 'scrape')
+    assert scrapes == [('scrape', 'characteristics', (2010, 2011)), ('scrape', 'cip', (2010, 2011)),
+                       ('scrape', 'completion', (2010, 2011))] # union of years, once each
+    cleans = [call for call in calls if call[0] == 'clean']
+    assert len(cleans) == 5 and cleans.count(('clean', 'characteristics', None)) == 1
+    assert list(results) == ['completion_bach', 'completion_mast', 'completion_doct']
+    assert results['completion_bach'].shape[0] == 3
+    assert results['completion_mast']['name'].tolist() == ['A', 'B']
+    assert results['completion_mast']['ciplabel'].tolist() == ['Finance', 'Finance']
+
+def test_batch_cli(tmp_path, monkeypatch):
+    '''batch command writes one file per job'''
+    patch(monkeypatch, tmp_path)
+    spec = tmp_path / 'jobs.json'
+    spec.write_text(json.dumps([{'subject' : 'completion', 'years' : 2010, 'get_cip_codes' : False}]))
+    main(['batch', str(spec), '--jobs', '2', '--output', str(tmp_path / 'out')])
+    assert pd.read_csv(tmp_path / 'out' / 'completion.csv')['totmen'].tolist() == [1]
+
+def test_batch_uses_subject_classes(tmp_path, monkeypatch):
+    '''batch cleans share the subject classes' cache and memory options; characteristics jobs can't merge with themselves'''
+    calls = patch(monkeypatch, tmp_path)
+    BatchPlan([{'subject' : 'completion', 'level' : 'bach', 'get_cip_codes' : False}], download=False).run()
+    Completion().clean(degree_level='bach')
+    assert [call for call in calls if call[0] == 'clean'] == [('clean', 'completion', 'bach')] # second clean is a cache hit
+    with pytest.raises(ValueError):
+        BatchPlan([{'subject' : 'characteristics', 'merge_with_char' : True}])
+
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+    write_synthetic_data('.', subjects=['enrollment', 'characteristics'], years=[2010, 2011], n_institutions=20)
+    results = run_batch([{'subject' : 'enrollment', 'years' : 2011, 'merge_with_char' : True}], download=False,
+                        memory_limit=1, spill_dir=str(tmp_path))
+    assert isinstance(results['enrollment'], SpilledFrame)
+    assert set(results['enrollment'].to_pandas()['year']) == {2011} and 'name' in results['enrollment'].columns
@@ -0,0 +1,37 @@
+from genpeds import Enrollment, Admissions
+from genpeds import core
+import pandas as pd
+
+def test_clean_memoized(tmp_path, monkeypatch):
+    '''repeated clean() calls reuse the result until arguments or files change'''
+    calls = []
+    def fake_clean(data_dir, student_level='undergrad'):
+        calls.append(student_level)
+        return pd.DataFrame({'id' : ['100'], 'year' : [2010], 'studentlevel' : [student_level]})
+    monkeypatch.setattr(core, 'CLEANERS', {'enrollment' : fake_clean, 'admissions' : fake_clean})
+    Enrollment.clear_cache()
+    Admissions.clear_cache()
+    (tmp_path / 'enrollment_2010.csv').write_text('a')
+
+    enroll = Enrollment(year_range=2010)
+    df = enroll.clean(enroll_dir=str(tmp_path))
+    df['year'] = 1999 # callers may modify their copy
+    hits = enroll.cache_info()['hits']
+    assert enroll.clean(enroll_dir=str(tmp_path))['year'].item() == 2010
+    assert enroll.cache_info()['hits'] == hits + 1
+    assert len(calls) == 1
+
+    enroll.clean(student_level='grad', enroll_dir=str(tmp_path))
+    (tmp_path / 'enrollment_2011.csv').write_text('a') # new year on disk
+    enroll.clean(enroll_dir=str(tmp_path))
+    assert calls == ['undergrad', 'grad', 'undergrad']
+
+    Admissions(year_range=2010).clean(admit_dir=str(tmp_path))
+    assert Enrollment.clear_cache() == 2 # the admissions entry is kept
+    enroll.clean(enroll_dir=str(tmp_path))
+    assert len(calls) == 5
+
+    monkeypatch.setattr(core, 'COPY_ON_WRITE', False) # pandas 2 without copy-on-write
+    df = enroll.clean(enroll_dir=str(tmp_path))
+    df.loc[0, 'year'] = 1999
+    assert enroll.clean(enroll_dir=str(tmp_path))['year'].item() == 2010
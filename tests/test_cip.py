@@ -0,0 +1,91 @@
+from genpeds import CipCube, CipCrosswalk, cip_hierarchy
+from genpeds.cip import parse_cip_code, format_cip_code, cip_codes, cip_edition
+import os
+import pandas as pd
+import pytest
+
+@pytest.mark.parametrize('cip, expected', [
+    ('52.0801', (520801, 6)),
+    (' 52.08 ', (520800, 4)),
+    ('52', (520000, 2)),
+    ('1.0101', (10101, 6)), # leading zero dropped
+    ('52.080', (520800, 6)), # trailing zero dropped
+    ('010101', (10101, 6)), # no dot
+    ('10101', (10101, 6)), # no dot, read as a number
+    ('5208', (520800, 4)),
+    ('ZZ', (-1, 0))
+])
+def test_parse_cip_code(cip, expected):
+    '''test CIP string parsing across formats found in different years'''
+    assert parse_cip_code(cip) == expected
+
+def test_cip_codes_warn_on_dropped():
+    '''unparseable codes are counted in a warning; missing ones are not'''
+    with pytest.warns(UserWarning, match='2 CIP codes'):
+        codes, digits = cip_codes(['52.0801', 'ZZ', None, 'ZZ'])
+    assert codes.tolist() == [520801, -1, -1, -1] and digits.tolist() == [6, 0, 0, 0]
+
+def make_completion_like():
+    '''small frame shaped like Completion().run(merge_with_char=True, get_cip_codes=False) output'''
+    return pd.DataFrame({
+        'id' : ['100', '100', '100', '200', '100'],
+        'cip' : ['52.0801', '52.0803', '45.0601', '52.0801', '52'], # '52' is a summary row
+        'year' : 2010,
+        'deglevel' : 'bach',
+        'totmen' : [1, 2, 3, 4, 100],
+        'totwomen' : [1, 1, 1, 1, 100],
+        'state' : ['Ohio', 'Ohio', 'Ohio', 'Texas', 'Ohio']
+    })
+
+def test_cip_cube():
+    '''test 2/4/6 digit roll-ups by institution and by state'''
+    cube = CipCube.from_frame(make_completion_like(), by_state=True)
+
+    business = cube.get(level=2, codes=[52]).set_index('id')
+    assert business.loc['100', 'totmen'] == 3 # summary row not double counted
+    assert business.loc['100', 'totmen_share'] == 60
+    assert cube.get(level=4, codes=[5208], ids=['200'])['totmen'].item() == 4
+    assert len(cube.get(level=6, codes=[520801])) == 2
+    assert cube.get(level=2, codes=[52], state_totals=True, states=['Ohio'])['totmen'].item() == 3
+    assert format_cip_code(5208, 4) == '52.08'
+
+def test_cip_hierarchy():
+    '''test hierarchy table from cleaned CIP labels'''
+    cip_df = pd.DataFrame({'cip' : ['45', '45.06', '45.0601'], 'year' : 2010,
+                           'cip_description' : ['Social Sciences', 'Economics', 'Economics, General']})
+    hier = cip_hierarchy(cip_df)
+    assert hier['code'].tolist() == [45, 4506, 450601]
+    assert hier['family'].tolist() == [45, 45, 45]
+    assert hier['series'].tolist() == [-1, 4506, 4506]
+
+def make_crosswalk():
+    '''two NCES-style crosswalk steps: 2000 -> 2010 (with a split) and 2010 -> 2020'''
+    step1 = pd.DataFrame({'CIPCode2000' : ['11.0101', '11.0101', '52.0801'],
+                          'CIPCode2010' : ['11.0102', '11.0103', '52.0801']})
+    step2 = pd.DataFrame({'CIPCode2010' : ['11.0102', '11.0103', '52.0801'],
+                          'CIPCode2020' : ['11.0199', '11.0104', '52.0802']})
+    return CipCrosswalk.from_files([step1, step2])
+
+def test_cip_crosswalk(tmp_path):
+    '''test chained remap with split weights, and save/load'''
+    df = pd.DataFrame({
+        'id' : '100',
+        'year' : [2005, 2005, 2015, 2021],
+        'cip' : ['11.0101', '52.0801', '11.0103', '11.0199'],
+        'deglevel' : 'bach',
+        'totmen' : [10, 4, 6, 1],
+        'totwomen' : [2, 2, 2, 2]
+    })
+    xwalk = make_crosswalk()
+    remapped = xwalk.remap(df, target=2020).set_index(['year', 'cip'])
+
+    assert cip_edition(2005) == 2000 and cip_edition(2021) == 2020
+    assert remapped.loc[(2005, '11.0199'), 'totmen'] == 5 # 11.0101 split evenly
+    assert remapped.loc[(2005, '11.0104'), 'totmen'] == 5
+    assert remapped.loc[(2005, '52.0802'), 'totmen'] == 4
+    assert remapped.loc[(2015, '11.0104'), 'totmen'] == 6
+    assert remapped.loc[(2021, '11.0199'), 'totmen'] == 1 # already on CIP 2020
+
+    path = os.path.join(tmp_path, 'xwalk.npz')
+    xwalk.save(path)
+    pd.testing.assert_frame_equal(CipCrosswalk.load(path).remap(df, target=2020), xwalk.remap(df, target=2020))
@@ -1,7 +1,8 @@
-from genpeds.cleaners import CLEANERS
+from genpeds.cleaners import CLEANERS, reshape_graduation
 from genpeds import scrape_ipeds_data
 from genpeds.config import VARIABLE_DICT
 import pandas as pd
+import numpy as np
 import os
 import glob
 import shutil
@@ -124,4 +125,39 @@ def test_graduation_cleaner(lev):
             assert col in subject_var_dict # check if attributes are in expected attributes
         shutil.rmtree(f'graduationdata')
     finally:
-        pass
\ No newline at end of file
+        pass
+
+
+def test_reshape_graduation():
+    '''test graduation reshape on a small long frame, no download needed'''
+    grads = pd.DataFrame({
+        'id' : ['200', '100', '100', '200', '100'],
+        'grtype' : [8, 8, 9, 9, 13],
+        'totmen' : [40, 10, 5, 20, 2],
+        'totwomen' : [0, 20, 15, 10, 12]
+    })
+    df = reshape_graduation(grads, cohort_type=8, window_types={150 : 9, 100 : 13},
+                            value_cols=['totmen', 'totwomen'])
+
+    assert df['id'].tolist() == ['100', '200'] # sorted ids, one row each
+    assert df['totmen_graduated'].tolist() == [5, 20]
+    assert df['gradrate_totmen'].tolist() == [50, 50]
+    assert df.loc[0, 'gradrate_totwomen_100'] == 60
+    assert pd.isna(df.loc[1, 'totmen_graduated_100']) # no 100 percent row for id 200
+    assert (df.drop(columns='id').dtypes == 'float64').all() # counts and rates, as the old pivot returned
+    assert np.isinf(df.loc[1, 'gradrate_totwomen']) # zero cohort, same as dividing in pandas
+    for col in df.columns:
+        assert col in VARIABLE_DICT['graduation']
+    with pytest.raises(ValueError):
+        reshape_graduation(pd.concat([grads, grads.iloc[:1]]), cohort_type=8, window_types={150 : 9},
+                           value_cols=['totmen'])
+
+def test_graduation_cohort_status(tmp_path):
+    '''revised-cohort rows sharing the adjusted cohort's grtype are left out, as in the original query'''
+    from genpeds.synthetic import synthetic_graduation
+    df = synthetic_graduation(2015, n_institutions=20)
+    df.to_csv(tmp_path / 'gr_2015.csv', index=False)
+    expected = CLEANERS['graduation'](str(tmp_path))
+    revised = df.loc[df['GRTYPE'] == 8].assign(CHRTSTAT=10)
+    pd.concat([df, revised]).to_csv(tmp_path / 'gr_2015.csv', index=False)
+    pd.testing.assert_frame_equal(CLEANERS['graduation'](str(tmp_path)), expected)
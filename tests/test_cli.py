@@ -0,0 +1,64 @@
+from genpeds.cli import main
+from genpeds import core, facts
+import importlib.util
+import json
+import os
+import pandas as pd
+import pytest
+
+def test_cli_legacy_form(monkeypatch):
+    '''original `genpeds <subject> -y <years>` form still scrapes'''
+    calls = []
+    monkeypatch.setattr('genpeds.downloader.scrape_ipeds_data', lambda subject, year_range: calls.append((subject, year_range)))
+    main(['enrollment', '-y', '2001-2003'])
+    main(['scrape', 'cip', 'admissions', '-y', '2001', '2005', '--jobs', '2'])
+    assert calls[0] == ('enrollment', (2001, 2003))
+    assert sorted(calls[1:]) == [('admissions', [2001, 2005]), ('cip', [2001, 2005])]
+
+def test_cli_clean_and_export(tmp_path, monkeypatch):
+    '''clean writes one file per subject and level without downloading; export writes one fact table'''
+    scraped, cleaned = [], []
+    def fake_clean(data_dir, student_level='undergrad'):
+        cleaned.append(student_level)
+        return pd.DataFrame({'id' : ['100', '200'], 'year' : [2010, 2011], 'totmen' : [1, 2], 'studentlevel' : student_level})
+    for module in [core, facts]:
+        monkeypatch.setattr(module, 'scrape_ipeds_data', lambda **kwargs: scraped.append(kwargs['subject']))
+        monkeypatch.setattr(module, 'CLEANERS', {'enrollment' : fake_clean})
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('enrollmentdata')
+    core.IPDS.clear_cache()
+
+    main(['clean', 'enrollment', 'enrollment:grad', '-y', '2010', '--jobs', '2', '--output', str(tmp_path)])
+    assert scraped == [] and sorted(cleaned) == ['grad', 'undergrad']
+    assert pd.read_csv(tmp_path / 'enrollment_grad.csv')['studentlevel'].tolist() == ['grad']
+    assert pd.read_csv(tmp_path / 'enrollment.csv')['id'].tolist() == [100]
+
+    main(['export', 'enrollment:grad', '--no-char', '--output', str(tmp_path / 'facts.csv')])
+    assert scraped == ['enrollment']
+    assert pd.read_csv(tmp_path / 'facts.csv').columns.tolist() == ['id', 'year', 'enrollment_grad_totmen']
+
+def test_cli_usage_errors(tmp_path, monkeypatch, capsys):
+    '''bad levels, job specs and formats without pyarrow are usage errors; --executor reaches the cleaners'''
+    for argv in [['clean', 'enrollment:phd'], ['run', 'admissions:grad'], ['export', 'cip']]:
+        with pytest.raises(SystemExit) as exit_info:
+            main(argv)
+        assert exit_info.value.code == 2
+    spec = tmp_path / 'jobs.json'
+    spec.write_text(json.dumps([{'subject' : 'completion', 'windows' : [150]}]))
+    with pytest.raises(SystemExit):
+        main(['batch', str(spec)])
+    assert 'windows only apply to graduation data' in capsys.readouterr().err
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+    with pytest.raises(SystemExit):
+        main(['clean', 'enrollment', '--format', 'parquet'])
+    assert 'needs pyarrow' in capsys.readouterr().err
+
+    executors = []
+    def fake_clean(data_dir, executor=None):
+        executors.append(executor)
+        return pd.DataFrame({'id' : ['100'], 'year' : [2010], 'totmen' : [1]})
+    monkeypatch.setattr(core, 'CLEANERS', {'admissions' : fake_clean})
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('admissionsdata')
+    main(['clean', 'admissions', '-y', '2010', '--executor', 'thread', '--output', str(tmp_path)])
+    assert executors == ['thread']
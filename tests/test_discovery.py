@@ -0,0 +1,43 @@
+from genpeds import Admissions, Graduation
+from genpeds import discovery, downloader
+from genpeds.mockserver import mock_nces
+import json
+
+def test_discover_new_years(tmp_path, monkeypatch):
+    '''years after the last known one are probed in parallel, cached in the catalog and used by classes and the scraper'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(discovery, 'CATALOG_PATH', str(tmp_path / 'catalog.json'))
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    with mock_nces(n_institutions=20, last_year=2025) as nces:
+        grad = Graduation(year_range=None)
+        assert grad.get_available_years() == (2000, 2023)
+        assert grad.discover() == {2024 : f'{nces.base_url}/ipeds/datacenter/data/GR2024.zip',
+                                   2025 : f'{nces.base_url}/ipeds/datacenter/data/GR2025.zip'}
+        assert grad.get_available_years() == (2000, 2025)
+        probes = nces.stats()['requests']
+        assert probes == len(discovery.candidate_years('graduation')) # one HEAD per candidate year
+        assert discovery.discover_years('graduation') == grad.discover() # catalog within its TTL
+        assert nces.stats()['requests'] == probes
+        discovery.discover_years('graduation', ttl=0)
+        assert nces.stats()['requests'] == 2 * probes
+
+        assert Graduation().get_available_years() == (2000, 2025) # new objects read the catalog
+        assert discovery.available_years('admissions') == (2001, 2025)
+        downloader.scrape_ipeds_data('graduation', year_range=(2023, 2025), see_progress=False)
+        df = Graduation(year_range=(2023, 2025)).clean()
+        assert sorted(df['year'].unique()) == [2023, 2024, 2025]
+    catalog = json.loads((tmp_path / 'catalog.json').read_text())
+    assert sorted(catalog[nces.base_url]) == ['admissions', 'graduation']
+
+def test_scrape_probes_on_request(tmp_path, monkeypatch):
+    '''without a year_range the scraper downloads the known years, and probes only with discover=True'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(discovery, 'CATALOG_PATH', str(tmp_path / 'catalog.json'))
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    with mock_nces(n_institutions=5, last_year=2024) as nces:
+        downloader.scrape_ipeds_data('admissions', see_progress=False)
+        assert nces.stats()['requests'] == 2023 - 2001 + 1 # a GET per known year, no probes
+        assert not (tmp_path / 'catalog.json').exists()
+        downloader.scrape_ipeds_data('admissions', see_progress=False, discover=True)
+        assert sorted(json.loads((tmp_path / 'catalog.json').read_text())[nces.base_url]) == ['admissions']
+        assert Admissions().clean()['year'].max() == 2024
@@ -0,0 +1,74 @@
+from genpeds import Enrollment, ProgressBar
+from genpeds import cleaners, downloader
+from genpeds.downloader import scrape_ipeds_data
+from genpeds.synthetic import write_synthetic_data
+import io
+import time
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.text = content.decode('latin-1')
+        self.status_code = 200
+        self.headers = {}
+
+def fake_get(endpoint):
+    '''zip of one csv, or the NCES 404 page for 2003'''
+    if '2003' in endpoint:
+        return FakeResponse(b'404 - File or directory not found')
+    import zipfile
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zfile:
+        zfile.writestr(endpoint.split('/')[-1].replace('.zip', '').lower() + '.csv', 'UNITID,LINE,EFTOTLM,EFTOTLW\n100,8,1,3\n')
+    return FakeResponse(buffer.getvalue())
+
+def test_download_events(tmp_path, monkeypatch, capsys):
+    '''each year reports queued, downloaded and extracted (or failed) with sizes; cached years are skipped'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(downloader.requests, 'get', fake_get)
+    events = []
+    scrape_ipeds_data('enrollment', year_range=(2001,2003), on_event=events.append)
+    kinds = sorted((event.year, event.kind) for event in events)
+    assert kinds == [(2001, 'downloaded'), (2001, 'extracted'), (2001, 'queued'),
+                     (2002, 'downloaded'), (2002, 'extracted'), (2002, 'queued'),
+                     (2003, 'failed'), (2003, 'queued')]
+    extracted = [event for event in events if event.kind == 'extracted'][0]
+    assert extracted.bytes > 0 and extracted.seconds >= 0
+    assert [event.error for event in events if event.kind == 'failed'] == ['404 - File not found']
+
+    stream = io.StringIO()
+    bar = ProgressBar(stream=stream)
+    scrape_ipeds_data('enrollment', year_range=(2001,2002), on_event=bar)
+    bar.close()
+    assert '2/2 years  2 cached  0 failed' in stream.getvalue()
+
+    scrape_ipeds_data('enrollment', year_range=2003, see_progress=False) # default callback prints failures only
+    assert capsys.readouterr().out == 'Year 2003: 404 - File not found\n'
+
+def test_cleaning_events(tmp_path, monkeypatch):
+    '''subject classes report each cleaned year, then cache hits'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(downloader.requests, 'get', fake_get)
+    Enrollment.clear_cache()
+    events = []
+    enroll = Enrollment(year_range=(2001,2002), on_event=events.append)
+    enroll.run()
+    cleaned = [(event.year, event.rows) for event in events if event.kind == 'cleaned']
+    assert cleaned == [(2001, 1), (2002, 1)]
+    enroll.clean()
+    assert events[-1].kind == 'skipped-cached' and events[-1].year is None
+
+def test_cleaning_events_with_executor(tmp_path, monkeypatch):
+    '''years cleaned on an executor's workers report their time on the worker'''
+    monkeypatch.chdir(tmp_path)
+    write_synthetic_data('.', subjects=['enrollment'], years=[2010, 2011], n_institutions=10)
+    clean_year = cleaners.clean_enrollment_year
+    def slow_year(file_path, year, **options):
+        time.sleep(0.2)
+        return clean_year(file_path, year, **options)
+    monkeypatch.setattr(cleaners, 'clean_enrollment_year', slow_year)
+    Enrollment.clear_cache()
+    events = []
+    Enrollment(on_event=events.append, executor='thread').clean()
+    cleaned = [event for event in events if event.kind == 'cleaned']
+    assert [event.year for event in cleaned] == [2010, 2011] and all(event.seconds >= 0.2 for event in cleaned)
@@ -0,0 +1,87 @@
+from genpeds import Cip, Completion, Enrollment
+from genpeds import discovery, downloader, shared
+from genpeds.cleaners import CLEANERS, clean_years
+from genpeds.events import EXTRACTED
+from genpeds.executors import LEASE_SECONDS, QueueExecutor, claim_task, make_executor, run_worker, transaction
+from genpeds.mockserver import mock_nces
+from genpeds.synthetic import write_synthetic_data
+import concurrent.futures
+import multiprocessing
+import os
+import pandas as pd
+import pytest
+import sqlite3
+import time
+
+def queue_worker(cwd, path):
+    os.chdir(cwd)
+    run_worker(path, poll=0.05, idle_timeout=5)
+
+def test_backends_clean_alike(tmp_path):
+    '''thread and process backends give the serial result, in year order, and pass cleaner errors back'''
+    dirs = write_synthetic_data(tmp_path, subjects=['enrollment', 'graduation'], years=[2000, 2009, 2015, 2023],
+                                n_institutions=40)
+    for subject, kwargs in [('enrollment', {'student_level' : 'grad'}), ('graduation', {'windows' : (150, 100)})]:
+        serial = CLEANERS[subject](dirs[subject], **kwargs)
+        for executor in ['thread', 'process']:
+            pd.testing.assert_frame_equal(CLEANERS[subject](dirs[subject], executor=executor, **kwargs), serial)
+    with pytest.raises(ValueError):
+        CLEANERS['enrollment'](dirs['enrollment'], student_level='phd', executor='process')
+    with pytest.raises(ValueError):
+        make_executor('cluster')
+
+def test_queue_backend(tmp_path, monkeypatch):
+    '''a worker process started apart from the submitter downloads and cleans years put on the queue'''
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'queue.sqlite')
+    events = []
+    worker = multiprocessing.get_context('spawn').Process(target=queue_worker, args=(str(tmp_path), path))
+    with mock_nces(n_institutions=30) as nces:
+        downloader.set_base_url(nces.base_url)
+        try:
+            worker.start()
+            enroll = Enrollment(year_range=(2018, 2020), on_event=events.append, executor=f'queue:{path}')
+            enroll.scrape()
+            df = enroll.clean()
+        finally:
+            downloader.set_base_url(None)
+    worker.join(30)
+    assert worker.exitcode == 0
+    assert sorted(event.year for event in events if event.kind == EXTRACTED) == [2018, 2019, 2020]
+    assert df['year'].tolist() == sorted(df['year']) and set(df['year']) == {2018, 2019, 2020}
+    pd.testing.assert_frame_equal(df, CLEANERS['enrollment']('enrollmentdata'))
+
+def test_in_flight_bounded(tmp_path):
+    '''only about as many years as the executor has workers are submitted ahead of the caller'''
+    for year in range(2000, 2010):
+        (tmp_path / f'subject_{year}.csv').write_text('a')
+    submitted = []
+    class CountingPool(concurrent.futures.ThreadPoolExecutor):
+        def submit(self, fn, /, *args, **kwargs):
+            submitted.append(args[-1]) # the year
+            return super().submit(fn, *args, **kwargs)
+    with CountingPool(max_workers=2) as pool:
+        years = clean_years(lambda file_path, year: year, str(tmp_path), executor=pool)
+        assert next(years) == (2000, 2000) and submitted == [2000, 2001, 2002]
+        assert [year for year, _ in years] == list(range(2001, 2010))
+    merged = Completion(memory_limit='1GB', executor='process').related(Cip)
+    assert (merged.memory_limit, merged.executor) == ('1GB', 'process')
+
+def test_queue_requeues_dead_claims(tmp_path, monkeypatch):
+    '''a task claimed by a worker that stopped renewing its lease is run by another; unrun tasks time out'''
+    for module, name in [(shared, 'SHARED'), (downloader, 'BASE_URL'), (discovery, 'CATALOG_PATH')]:
+        monkeypatch.setattr(module, name, getattr(module, name)) # the worker below applies submitter settings
+    pool = QueueExecutor(tmp_path / 'queue.sqlite')
+    future = pool.submit(int, '7')
+    conn = sqlite3.connect(pool.path, isolation_level=None)
+    task_id, _ = claim_task(conn, 'gone-1')
+    with transaction(pool.path) as tx:
+        tx.execute('UPDATE tasks SET updated = ? WHERE id = ?', (time.time() - LEASE_SECONDS - 1, task_id))
+    conn.close()
+    assert run_worker(pool.path, max_tasks=1) == 1
+    assert future.result(timeout=10) == 7
+    pool.shutdown()
+
+    lonely = QueueExecutor(tmp_path / 'empty.sqlite', timeout=0.2)
+    with pytest.raises(TimeoutError):
+        lonely.submit(int, '1').result(timeout=10)
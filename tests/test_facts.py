@@ -0,0 +1,42 @@
+from genpeds import build_fact_table
+from genpeds import facts
+import pandas as pd
+import pytest
+
+def fake_cleaned():
+    '''cleaned frames by subject, shaped like each cleaner's output'''
+    return {
+        'enrollment' : pd.DataFrame({'id' : ['100', '200', '100'], 'year' : [2010, 2010, 2011],
+                                     'totmen' : [1, 2, 3], 'studentlevel' : 'undergrad'}),
+        'completion' : pd.DataFrame({'id' : ['100', '100', '100', '100', '300'], 'year' : 2010,
+                                     'cip' : ['52.0801', '45.0601', '52', '99', '52.0801'], # family and grand total rows
+                                     'totmen' : [1, 3, 1, 4, 5], 'totwomen' : [1, 1, 1, 2, 5], 'deglevel' : 'bach'}),
+        'characteristics' : pd.DataFrame({'id' : ['100', '200', '300', '100'], 'year' : [2010, 2010, 2010, 2011],
+                                          'name' : ['A', 'B', 'C', 'A2']})
+    }
+
+def test_build_fact_table(monkeypatch):
+    '''test joins on integer keys, completion summed over CIPs and one scrape per subject'''
+    scraped = []
+    cleaned = fake_cleaned()
+    monkeypatch.setattr(facts, 'scrape_ipeds_data', lambda subject, year_range, see_progress, on_event=None: scraped.append(subject))
+    monkeypatch.setattr(facts, 'CLEANERS', {subject : (lambda d, subject=subject, **kwargs: cleaned[subject])
+                                            for subject in cleaned})
+
+    df = build_fact_table(subjects=['enrollment', ('completion', 'bach'), ('completion', 'bach')], year_range=(2010,2011))
+
+    assert scraped == ['enrollment', 'completion', 'characteristics'] # planned jointly, no repeats
+    assert df[['id', 'year']].values.tolist() == [['100', 2010], ['100', 2011], ['200', 2010], ['300', 2010]]
+    assert df['completion_bach_totmen'].tolist()[0] == 4 # summed over 6-digit CIPs, summary rows left out
+    assert round(df['completion_bach_totmen_share'].tolist()[0], 2) == 66.67
+    assert df['name'].tolist() == ['A', 'A2', 'B', 'C']
+    assert 'enrollment_studentlevel' not in df.columns
+
+def test_fact_key_warns_on_dropped_rows():
+    '''rows the integer key can't hold are counted in warnings, not dropped silently'''
+    df = pd.DataFrame({'id' : ['100', 'x1', '100', '200'], 'year' : [2010, 2010, 2010, 2011], 'totmen' : [1, 2, 3, 4]})
+    with pytest.warns(UserWarning) as record:
+        keyed = facts.fact_key(df, 'admissions')
+    messages = [str(warning.message) for warning in record]
+    assert messages[0].startswith('1 admissions rows dropped for non-numeric ids') and 'repeating' in messages[1]
+    assert keyed['totmen'].tolist() == [3, 4]
@@ -0,0 +1,22 @@
+import re
+import subprocess
+import sys
+
+HEAVY_MODULES = ['pandas', 'numpy', 'requests', 'bs4', 'us']
+
+def run_python(code):
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+
+def test_import_is_lazy():
+    '''importing the package or CLI loads no heavy dependencies; attributes load them on use'''
+    result = run_python(f'import sys, genpeds, genpeds.cli; print([m for m in {HEAVY_MODULES} if m in sys.modules])')
+    assert result.stdout.strip() == '[]'
+    result = run_python('import sys, genpeds; genpeds.Panel; print("pandas" in sys.modules)')
+    assert result.stdout.strip() == 'True'
+
+def test_import_time():
+    '''guards against startup regressions: genpeds and its CLI import in well under 100 ms'''
+    stderr = run_python('import genpeds.cli').stderr
+    cumulative_us = {line.split('|')[2].strip() : int(line.split('|')[1]) for line in stderr.splitlines()
+                     if re.match(r'import time:\s+\d', line)}
+    assert cumulative_us['genpeds'] + cumulative_us['genpeds.cli'] < 100_000
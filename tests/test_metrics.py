@@ -0,0 +1,48 @@
+from genpeds.cleaners import clean_enrollment
+from genpeds.metrics import recording, add_hook, remove_hook, span, JsonLinesExporter, PrometheusExporter
+import json
+import pandas as pd
+
+def write_enrollment(data_dir, year):
+    '''raw enrollment file with undergraduate total lines (8 full-time, 22 part-time)'''
+    data_dir.mkdir(exist_ok=True)
+    pd.DataFrame({'UNITID' : ['100', '100', '200'], 'LINE' : [8, 22, 8], 'EFTOTLM' : [1, 2, 3],
+                  'EFTOTLW' : [3, 2, 1]}).to_csv(data_dir / f'enrollment_{year}.csv', index=False)
+
+def test_cleaner_spans(tmp_path):
+    '''every stage of a clean reports duration, rows and bytes per subject-year'''
+    for year in [2010, 2011]:
+        write_enrollment(tmp_path / 'enrollmentdata', year)
+    with recording() as spans:
+        clean_enrollment(str(tmp_path / 'enrollmentdata'))
+
+    stages = [(record['span'], record.get('year')) for record in spans]
+    assert stages[-1] == ('clean', None)
+    assert [stage for stage, year in stages if year == 2010] == ['read_csv', 'to_numeric', 'query', 'groupby', 'concat']
+    read = spans[0]
+    assert read['subject'] == 'enrollment' and read['rows'] == 3 and read['bytes'] > 0 and read['seconds'] >= 0
+    assert spans[4]['rows'] == 2 # institutions after the first year's concat
+
+def test_exporters(tmp_path):
+    '''JSON lines and Prometheus text outputs'''
+    jsonl = add_hook(JsonLinesExporter(tmp_path / 'spans.jsonl'))
+    prom = add_hook(PrometheusExporter(tmp_path / 'genpeds.prom'))
+    try:
+        with span('http', subject='cip', year=2020) as stage:
+            stage.set(bytes=100)
+        try:
+            with span('http', subject='cip', year=2021):
+                raise OSError('timed out')
+        except OSError:
+            pass
+    finally:
+        remove_hook(jsonl)
+        remove_hook(prom)
+
+    records = [json.loads(line) for line in (tmp_path / 'spans.jsonl').read_text().splitlines()]
+    assert [record['year'] for record in records] == [2020, 2021]
+    assert records[1]['error'] == 'OSError'
+    text = (tmp_path / 'genpeds.prom').read_text()
+    assert 'genpeds_stage_calls_total{stage="http",subject="cip"} 2' in text
+    assert 'genpeds_stage_bytes_total{stage="http",subject="cip"} 100' in text
+    assert 'genpeds_stage_errors_total{stage="http",subject="cip"} 1' in text
@@ -0,0 +1,66 @@
+from genpeds import downloader
+from genpeds.downloader import scrape_ipeds_data, get_file_endpoint, set_base_url
+from genpeds.mockserver import mock_nces, parse_range
+import time
+import urllib.request
+import urllib.error
+import pytest
+
+def fetch(url, method='GET', **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method=method, headers=headers)) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as er:
+        return er.code, dict(er.headers), er.read()
+
+def test_mock_downloads(tmp_path, monkeypatch):
+    '''downloads come from the mock while it runs, with 404 pages for missing years and retries after injected errors'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    with mock_nces(n_institutions=20, missing=[2003], fail_first=1) as nces:
+        assert get_file_endpoint('enrollment', 2020) == f'{nces.base_url}/ipeds/datacenter/data/EF2020A.zip'
+        events = []
+        scrape_ipeds_data('enrollment', year_range=(2001,2003), on_event=events.append)
+        assert sorted((event.year, event.error) for event in events if event.kind == 'failed') == \
+            [(2001, 'HTTP 503'), (2002, 'HTTP 503'), (2003, 'HTTP 503')]
+        events.clear()
+        scrape_ipeds_data('enrollment', year_range=(2001,2003), on_event=events.append)
+        assert sorted((event.year, event.error) for event in events if event.kind in ['failed', 'extracted']) == \
+            [(2001, None), (2002, None), (2003, '404 - File not found')]
+        assert sorted(p.name for p in (tmp_path / 'enrollmentdata').iterdir()) == ['.manifest.json', 'enrollment_2001.csv', 'enrollment_2002.csv']
+        assert nces.stats()['statuses'] == {503 : 3, 200 : 2, 404 : 1}
+    assert get_file_endpoint('enrollment', 2020).startswith('https://nces.ed.gov/')
+
+def test_mock_ranges_and_limits(monkeypatch):
+    '''HEAD and Range requests, latency and bandwidth caps'''
+    with mock_nces(n_institutions=200, latency=0.05, bandwidth=200 * 2**10) as nces:
+        url = get_file_endpoint('completion', 2015)
+        status, headers, _ = fetch(url, method='HEAD')
+        size = int(headers['Content-Length'])
+        assert status == 200 and headers['Accept-Ranges'] == 'bytes' and headers['ETag']
+        status, headers, body = fetch(url, Range='bytes=100-199')
+        assert status == 206 and len(body) == 100 and headers['Content-Range'] == f'bytes 100-199/{size}'
+        status, _, full = fetch(url)
+        assert full[100:200] == body and full[-10:] == fetch(url, Range='bytes=-10')[2]
+        assert fetch(url, Range=f'bytes={size}-')[0] == 416
+        started = time.perf_counter()
+        fetch(url)
+        assert time.perf_counter() - started >= 0.05 + size / (200 * 2**10) * 0.8
+        assert fetch(nces.base_url + '/ipeds/datacenter/data/NOPE.zip')[0] == 404
+
+def test_parse_range():
+    assert parse_range('bytes=0-9', 100) == (0, 9)
+    assert parse_range('bytes=90-', 100) == (90, 99)
+    assert parse_range('bytes=-5', 100) == (95, 99)
+    assert parse_range('bytes=0-1,5-6', 100) is None
+    with pytest.raises(ValueError):
+        parse_range('bytes=100-', 100)
+
+def test_base_url_env(monkeypatch):
+    monkeypatch.setenv('GENPEDS_BASE_URL', 'http://mirror.example/')
+    assert get_file_endpoint('cip', 2020) == 'http://mirror.example/ipeds/datacenter/data/C2020_A_Dict.zip'
+    set_base_url('http://other')
+    try:
+        assert get_file_endpoint('cip', 2020).startswith('http://other/')
+    finally:
+        set_base_url()
@@ -0,0 +1,76 @@
+from genpeds import Panel
+import numpy as np
+import pandas as pd
+import pytest
+
+def make_enrollment_like():
+    '''small long frame shaped like Enrollment().run(merge_with_char=True) output'''
+    return pd.DataFrame({
+        'id' : ['100', '100', '100', '200', '200', '300'],
+        'year' : [2000, 2001, 2003, 2000, 2001, 2003],
+        'totmen' : [10, 20, 40, 5, 5, 7],
+        'totmen_share' : [50.0, 40.0, 45.0, 30.0, 35.0, 60.0],
+        'studentlevel' : 'undergrad',
+        'state' : ['Ohio', 'Ohio', 'Ohio', 'Texas', 'Texas', None]
+    })
+
+def test_from_frame():
+    '''test dense arrays, year axis and carried attributes'''
+    panel = Panel.from_frame(make_enrollment_like())
+
+    assert panel.shape == (3, 4) # 2002 is filled in as a missing year
+    assert panel.years.tolist() == [2000, 2001, 2002, 2003]
+    assert panel.units.tolist() == ['100', '200', '300']
+    assert set(panel.get_measures()) == {'totmen', 'totmen_share'}
+    assert np.isnan(panel['totmen'][0, 2])
+    assert panel.attrs['state'].tolist()[:2] == ['Ohio', 'Texas']
+    assert pd.isna(panel.attrs['state'].iloc[2]) # no state on record
+
+def test_vectorized_ops():
+    '''test lag, diff and rolling mean against hand-computed values'''
+    panel = Panel.from_frame(make_enrollment_like())
+
+    np.testing.assert_array_equal(panel.lag('totmen')[0], [np.nan, 10, 20, np.nan])
+    np.testing.assert_array_equal(panel.diff('totmen')[0], [np.nan, 10, np.nan, np.nan])
+    np.testing.assert_array_equal(panel.pct_change('totmen')[0], [np.nan, 100, np.nan, np.nan])
+    np.testing.assert_allclose(panel.rolling_mean('totmen', window=2, min_periods=1)[0], [10, 15, 20, 40])
+
+def test_select_and_round_trip():
+    '''test selecting by ids, years and states, and going back to long form'''
+    panel = Panel.from_frame(make_enrollment_like())
+
+    assert panel.select(states=['Texas']).units.tolist() == ['200']
+    assert panel.select(ids=['100', '300'], years=(2001,2003)).shape == (2, 3)
+    assert panel.select(years=2000)['totmen'][:, 0].tolist()[:2] == [10, 5]
+
+    df = panel.to_frame()
+    assert len(df) == 6
+    assert df.loc[(df['id'] == '300') & (df['year'] == 2003), 'totmen'].item() == 7
+
+def test_multi_unit():
+    '''Completion-like data needs an (id, cip) unit'''
+    df = pd.DataFrame({
+        'id' : ['100', '100', '100', '100'],
+        'cip' : ['52.0801', '45.0601', '52.0801', '45.0601'],
+        'year' : [2010, 2010, 2011, 2011],
+        'totmen' : [1, 2, 3, 4]
+    })
+    with pytest.raises(ValueError):
+        Panel.from_frame(df)
+
+    panel = Panel.from_frame(df, unit=['id', 'cip'])
+    assert panel.units.tolist() == [('100', '45.0601'), ('100', '52.0801')]
+    assert panel['totmen'].tolist() == [[2, 4], [1, 3]]
+    assert panel.select(ids=['100']).shape == (2, 2)
+
+def test_missing_unit_keys():
+    '''a missing key is its own unit and doesn't collide with the next unit's codes'''
+    df = pd.DataFrame({
+        'id' : ['100', '100', '200', '200'],
+        'cip' : [None, '52.0801', '45.0601', '52.0801'],
+        'year' : 2010,
+        'totmen' : [1, 2, 3, 4]
+    })
+    panel = Panel.from_frame(df, unit=['id', 'cip'])
+    assert len(panel.units) == 4
+    assert panel['totmen'][:, 0].tolist() == [2, 1, 3, 4] # missing cip sorted last within id 100
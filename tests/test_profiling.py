@@ -0,0 +1,36 @@
+from genpeds.cleaners import clean_enrollment
+from genpeds.metrics import HOOKS, PROBES, recording
+from genpeds.profiling import profile_memory
+from genpeds.synthetic import write_synthetic_data
+import json
+import tracemalloc
+
+def test_memory_per_stage_and_year(tmp_path):
+    '''peak and retained memory for every stage and subject-year, with the clean span covering its stages'''
+    dirs = write_synthetic_data(tmp_path, subjects=['enrollment'], years=[2009, 2010], n_institutions=200)
+    with profile_memory() as profile:
+        clean_enrollment(dirs['enrollment'])
+    assert not tracemalloc.is_tracing() and PROBES == [] and profile not in HOOKS
+
+    stages = profile.stages()
+    assert list(stages.loc[stages['year'] == 2009, 'span']) == ['read_csv', 'to_numeric', 'query', 'groupby', 'concat']
+    assert (stages['peak_mb'] >= 0).all() and (stages['peak_mb'] >= stages['retained_mb']).all()
+    clean = stages.loc[stages['span'] == 'clean'].iloc[0]
+    assert clean['peak_mb'] >= stages['peak_mb'].max() # nested stages' peaks count towards the clean
+    assert stages.loc[stages['span'] == 'read_csv', 'retained_mb'].min() > 0 # raw data held after the read
+    assert stages['rss_peak_mb'].min() > 0
+
+    years = profile.years()
+    assert list(years['year']) == [2009, 2010] and (years['peak_mb'] > 0).all()
+    assert set(profile.summary()['span']) == {'clean', 'read_csv', 'to_numeric', 'query', 'groupby', 'concat'}
+    profile.write(tmp_path / 'memory.json')
+    saved = json.loads((tmp_path / 'memory.json').read_text())
+    assert len(saved['stages']) == len(stages) and len(saved['years']) == 2
+
+def test_rss_only(tmp_path):
+    '''without tracing, spans only get RSS; other hooks see the same records'''
+    dirs = write_synthetic_data(tmp_path, subjects=['enrollment'], years=[2010], n_institutions=50)
+    with recording() as spans, profile_memory(trace=False) as profile:
+        clean_enrollment(dirs['enrollment'])
+    assert 'rss_peak_bytes' in spans[0] and 'peak_bytes' not in spans[0]
+    assert profile.years()['peak_mb'].isna().all() and profile.years()['rss_peak_mb'].notna().all()
@@ -0,0 +1,47 @@
+from genpeds import Enrollment, Graduation
+from genpeds import downloader
+from genpeds.cleaners import CLEANERS, data_files
+from genpeds.manifest import MANIFEST_FILE, load_manifest
+from genpeds.mockserver import mock_nces
+import pandas as pd
+
+def test_refresh_revised_years(tmp_path, monkeypatch):
+    '''only years whose remote file changed are downloaded and cleaned again; the cached clean is patched'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    with mock_nces(n_institutions=30) as nces:
+        enroll = Enrollment(year_range=(2020, 2022))
+        enroll.run()
+        assert sorted(load_manifest('enrollmentdata')) == [2020, 2021, 2022]
+        assert MANIFEST_FILE not in data_files('enrollmentdata') # cleaners skip the manifest
+
+        summary = enroll.refresh()
+        assert summary['status'].tolist() == ['unchanged'] * 3 and summary['rows_after'].isna().all()
+
+        nces.revise('enrollment', 2021)
+        requests_before = nces.stats()['requests']
+        summary = Enrollment(year_range=(2020, 2023)).refresh(student_level='undergrad')
+        assert summary['status'].tolist() == ['unchanged', 'revised', 'unchanged', 'new']
+        revised = summary.set_index('year').loc[2021]
+        assert revised['rows_before'] == revised['rows_after'] and revised['changed'] > 0
+        assert summary.set_index('year').loc[2023, 'added'] == summary.set_index('year').loc[2023, 'rows_after']
+        assert nces.stats()['requests'] - requests_before == 4 + 2 # a HEAD per year, a GET per changed year
+
+        hits = Enrollment.cache_info()['hits']
+        df = Enrollment(year_range=(2020, 2023)).clean()
+        assert Enrollment.cache_info()['hits'] == hits + 1 # patched result, not a full re-clean
+        pd.testing.assert_frame_equal(df, CLEANERS['enrollment']('enrollmentdata'))
+
+def test_refresh_default_options(tmp_path, monkeypatch):
+    '''a refresh without cleaning options patches the result `.clean()` caches with its defaults'''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    with mock_nces(n_institutions=30) as nces:
+        grad = Graduation(year_range=(2020, 2021))
+        grad.run()
+        nces.revise('graduation', 2021)
+        grad.refresh()
+        hits = Graduation.cache_info()['hits']
+        df = grad.clean()
+        assert Graduation.cache_info()['hits'] == hits + 1
+        pd.testing.assert_frame_equal(df, CLEANERS['graduation']('graduationdata'))
@@ -0,0 +1,40 @@
+from genpeds import Rollup
+import os
+import pandas as pd
+import pytest
+
+def make_enrollment_like(year, men):
+    '''small frame shaped like Enrollment().run(merge_with_char=True) output'''
+    return pd.DataFrame({
+        'id' : ['100', '200', '300'],
+        'year' : year,
+        'totmen' : men,
+        'totwomen' : [1, 1, 1],
+        'totmen_share' : 0.0, # recomputed by the rollup
+        'studentlevel' : 'undergrad',
+        'state' : ['Ohio', 'Ohio', 'Texas']
+    })
+
+def test_rollup_update_and_get(tmp_path):
+    '''test state and national sums, recomputed shares and incremental refresh'''
+    rollup_dir = os.path.join(tmp_path, 'rollups')
+    df = pd.concat([make_enrollment_like(2000, [1, 2, 3]), make_enrollment_like(2001, [4, 5, 6])])
+
+    rollup = Rollup('enrollment', rollup_dir=rollup_dir)
+    assert rollup.update(df) == [2000, 2001]
+    ohio = rollup.get('state', years=2000, states=['Ohio'])
+    assert ohio['totmen'].item() == 3
+    assert ohio['totmen_share'].item() == 60
+    assert rollup.get('national', years=(2000,2001))['totmen'].tolist() == [6, 15]
+
+    # revised 2001 file: only 2001 partitions change, and a fresh Rollup reads them from disk
+    assert rollup.update(make_enrollment_like(2001, [10, 10, 10])) == [2001]
+    reloaded = Rollup('enrollment', rollup_dir=rollup_dir)
+    assert reloaded.get('national', studentlevel='undergrad')['totmen'].tolist() == [6, 30]
+    assert len(os.listdir(rollup_dir)) == 4 # state/national x two years
+
+def test_rollup_needs_state(tmp_path):
+    '''rollups need data merged with Characteristics'''
+    df = make_enrollment_like(2000, [1, 2, 3]).drop(columns='state')
+    with pytest.raises(ValueError):
+        Rollup('enrollment', rollup_dir=os.path.join(tmp_path, 'rollups')).update(df)
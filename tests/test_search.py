@@ -0,0 +1,33 @@
+from genpeds import NameIndex
+from genpeds.search import normalize_name
+import pandas as pd
+
+def make_characteristics_like():
+    '''a renamed institution, inconsistent casing and a mis-decoded character'''
+    return pd.DataFrame({
+        'id' : ['100', '100', '200', '300'],
+        'year' : [1990, 2020, 2020, 2020],
+        'name' : ['Saint Mary\'S College', 'Saint Mary\'s College of Notre Dame', 'Universit� de Boston', 'Ohio State University'],
+        'city' : ['Notre Dame', 'Notre Dame', 'Boston', 'Columbus']
+    })
+
+def test_normalize_name():
+    '''casing, punctuation, accents and replacement characters are normalized away'''
+    assert normalize_name("Saint Mary'S College") == 'saint marys college'
+    assert normalize_name('Université de Montréal') == 'universite de montreal'
+    assert normalize_name('Texas A&M') == 'texas a and m'
+    assert normalize_name(None) == ''
+
+def test_name_search(tmp_path):
+    '''misspelled, past and city names find the right id; index survives a round trip'''
+    names = NameIndex.from_characteristics(make_characteristics_like())
+    result = names.search('saint marys collage', k=2)
+    assert result['id'].iloc[0] == '100'
+    assert result['name'].iloc[0] == "Saint Mary's College of Notre Dame" # most recent name
+    assert names.search('ohio state univ', k=1)['id'].item() == '300'
+    assert names.search('boston', fields=['city'])['id'].tolist() == ['200']
+
+    names.save(tmp_path / 'names.npz')
+    loaded = NameIndex.load(tmp_path / 'names.npz')
+    pd.testing.assert_frame_equal(loaded.search('saint marys collage', k=2), result)
+    assert names.search('').empty
@@ -0,0 +1,124 @@
+from genpeds import server
+from genpeds.cache import LRUCache, object_nbytes
+import json
+import os
+import threading
+import time
+import urllib.request
+import urllib.error
+import pandas as pd
+
+def fake_scrape(scraped):
+    '''writes empty year files, as the downloader would, slowly enough for requests to overlap'''
+    def scrape(subject, year_range, see_progress):
+        scraped.append((subject, tuple(year_range)))
+        time.sleep(0.2)
+        os.makedirs(f'{subject}data', exist_ok=True)
+        for yr in year_range:
+            open(os.path.join(f'{subject}data', f'{subject}_{yr}.csv'), 'w').close()
+    return scrape
+
+def fake_clean(enrollment_dir, student_level='undergrad', years=None):
+    years = sorted(int(ff.split('_')[1][:4]) for ff in os.listdir(enrollment_dir)
+                   if years is None or int(ff.split('_')[1][:4]) in years)
+    return pd.DataFrame({'id' : ['100', '200'] * len(years), 'year' : [yr for yr in years for _ in range(2)],
+                         'totmen' : range(2 * len(years)), 'studentlevel' : student_level})
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as er:
+        return er.code, json.loads(er.read())
+
+def test_server_queries(tmp_path, monkeypatch):
+    '''test query parameters, one shared download for concurrent requests and cached responses'''
+    monkeypatch.chdir(tmp_path)
+    scraped = []
+    monkeypatch.setattr(server, 'scrape_ipeds_data', fake_scrape(scraped))
+    monkeypatch.setattr(server, 'CLEANERS', {'enrollment' : fake_clean})
+
+    httpd = server.make_server(port=0, quiet=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    try:
+        url = f'{base}/enrollment?years=2010-2011&level=grad&ids=200&columns=totmen'
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get(url))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert scraped == [('enrollment', (2010, 2011))] # single download
+        assert all(result == (200, [{'id' : '200', 'year' : 2010, 'totmen' : 1},
+                                    {'id' : '200', 'year' : 2011, 'totmen' : 3}]) for result in results)
+
+        status, body = get(f'{base}/enrollment?years=2012')
+        assert scraped[-1] == ('enrollment', (2012,)) and len(body) == 2
+        assert get(f'{base}/enrollment?columns=nope')[0] == 400
+        assert get(f'{base}/nothing')[0] == 404
+        assert get(f'{base}/cache')[1]['hits'] >= 3
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+def test_lru_cache():
+    '''least recently used entries are evicted past the byte limit'''
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    cache.get('a')
+    cache.put('c', b'12345')
+    assert 'a' in cache and 'b' not in cache
+    cache.put('big', b'x' * 11) # larger than the cache
+    assert 'big' not in cache
+    assert cache.info()['bytes'] == 10
+
+def test_server_errors(tmp_path, monkeypatch):
+    '''unexpected errors answer 500, and years that failed to download aren't tried on every request'''
+    monkeypatch.chdir(tmp_path)
+    scraped = []
+    def scrape_nothing(subject, year_range, see_progress): # e.g. years not released yet
+        scraped.append(tuple(year_range))
+    def broken_clean(admissions_dir, years=None):
+        raise KeyError('applcn')
+    monkeypatch.setattr(server, 'scrape_ipeds_data', scrape_nothing)
+    monkeypatch.setattr(server, 'CLEANERS', {'enrollment' : fake_clean, 'admissions' : broken_clean})
+    for subject in ['enrollment', 'admissions']:
+        os.makedirs(f'{subject}data')
+        open(os.path.join(f'{subject}data', f'{subject}_2010.csv'), 'w').close()
+
+    httpd = server.make_server(port=0, quiet=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    try:
+        for _ in range(2):
+            status, body = get(f'{base}/enrollment?years=2010,2011')
+            assert status == 200 and len(body) == 2
+        assert scraped == [(2011,)]
+        status, body = get(f'{base}/admissions?years=2010')
+        assert status == 500 and 'KeyError' in body['error']
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+def test_server_caches_years(tmp_path, monkeypatch):
+    '''a panel larger than the cache is kept by year, so later queries only clean years not cached'''
+    monkeypatch.chdir(tmp_path)
+    cleaned = []
+    def big_clean(enrollment_dir, years=None):
+        cleaned.append(tuple(years))
+        return pd.DataFrame({'id' : [str(i) for i in range(1000)] * len(years),
+                             'year' : [yr for yr in years for _ in range(1000)], 'totmen' : 1})
+    monkeypatch.setattr(server, 'scrape_ipeds_data', fake_scrape([]))
+    monkeypatch.setattr(server, 'CLEANERS', {'enrollment' : big_clean})
+
+    httpd = server.GenpedsServer(('127.0.0.1', 0), quiet=True)
+    panel = httpd.cleaned('enrollment', None, [2010, 2011, 2012])
+    httpd.cache.max_bytes = object_nbytes(panel) * 9 // 10 # the full panel wouldn't fit, two of its years do
+    httpd.cache.clear()
+    httpd.cleaned('enrollment', None, [2010, 2011, 2012])
+    df = httpd.cleaned('enrollment', None, [2011, 2012, 2013])
+    assert cleaned[1:] == [(2010, 2011, 2012), (2013,)]
+    assert df['year'].unique().tolist() == [2011, 2012, 2013] and len(df) == 3000
+    httpd.server_close()
@@ -0,0 +1,76 @@
+from genpeds import Enrollment
+from genpeds import downloader, shared
+from genpeds.mockserver import mock_nces
+from genpeds.shared import FileLock
+from genpeds.synthetic import write_synthetic_data
+import json
+import multiprocessing
+import os
+import pytest
+import socket
+
+def shared_worker(cwd, base_url, barrier, results):
+    os.chdir(cwd)
+    shared.set_shared(True)
+    downloader.set_base_url(base_url)
+    enroll = Enrollment(year_range=(2018, 2021))
+    enroll.scrape()
+    barrier.wait() # every worker holds the directory before any removes it
+    df = enroll.clean(rm_disk=True)
+    results.put(len(df))
+
+def test_shared_directory(tmp_path):
+    '''workers sharing a directory download each year once, and the last one to finish removes it'''
+    ctx = multiprocessing.get_context('spawn')
+    barrier, results = ctx.Barrier(4), ctx.Queue()
+    with mock_nces(n_institutions=50, latency=0.2) as nces:
+        workers = [ctx.Process(target=shared_worker, args=(str(tmp_path), nces.base_url, barrier, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+        assert [worker.exitcode for worker in workers] == [0] * 4
+        assert sum(1 for method, _, _, _ in nces.requests if method == 'GET') == 4 # single flight per year
+    assert len({results.get() for _ in range(4)}) == 1
+    assert not (tmp_path / 'enrollmentdata').exists()
+
+def test_file_lock_takeover(tmp_path):
+    '''locks left by exited processes are taken over; live ones are waited on'''
+    path = str(tmp_path / 'year.lock')
+    process = multiprocessing.get_context('spawn').Process(target=int)
+    process.start()
+    process.join()
+    with open(path, 'w') as filehandle:
+        json.dump({'host' : socket.gethostname(), 'pid' : process.pid, 'time' : 0}, filehandle)
+    with FileLock(path, timeout=1):
+        with pytest.raises(TimeoutError):
+            FileLock(path, timeout=0.1).acquire()
+    assert not os.path.exists(path)
+
+def test_file_lock_takeover_once(tmp_path):
+    '''a waiter with an outdated view of a stale lock can't remove the lock another waiter took over;
+    live holders on other hosts keep their lock while they touch it'''
+    path = str(tmp_path / 'year.lock')
+    with open(path, 'w') as filehandle:
+        json.dump({'host' : socket.gethostname(), 'pid' : 2**22 + 1, 'time' : 0}, filehandle) # no such pid
+    first, second = FileLock(path), FileLock(path)
+    seen = second.holder()
+    assert first.is_stale(first.holder()) and first.take_over(first.holder())
+    first.acquire()
+    assert not second.take_over(seen) and os.path.exists(path)
+    first.release()
+
+    with open(path, 'w') as filehandle:
+        json.dump({'host' : 'elsewhere', 'pid' : 1, 'time' : 0}, filehandle)
+    assert not FileLock(path, stale=60).is_stale(FileLock(path).holder()) # touched just now
+    os.utime(path, (0, 0))
+    assert FileLock(path, stale=60).is_stale(FileLock(path).holder())
+
+def test_clean_releases_reference(tmp_path, monkeypatch):
+    '''a shared reference taken for cleaning is dropped once cleaning finishes'''
+    monkeypatch.setattr(shared, 'SHARED', True)
+    data_dir = write_synthetic_data(tmp_path, subjects=['enrollment'], years=[2019, 2020], n_institutions=20)['enrollment']
+    shared.acquire_dir(data_dir) # as scrape_ipeds_data does
+    assert shared.live_refs(data_dir) == [shared.owner()]
+    Enrollment().clean(enroll_dir=data_dir)
+    assert shared.live_refs(data_dir) == [] and os.path.abspath(data_dir) not in shared.HELD
@@ -0,0 +1,35 @@
+from genpeds import SpatialIndex, carry_back_coordinates
+from genpeds.spatial import haversine_miles
+import numpy as np
+import pandas as pd
+
+def make_characteristics_like():
+    '''coordinates only in later years, as in Characteristics data'''
+    return pd.DataFrame({
+        'id' : ['100', '100', '200', '300', '400'],
+        'year' : [2005, 2015, 2015, 2015, 2015],
+        'latitude' : [None, '42.3736', '42.3601', '40.7128', '13.4443'], # Cambridge, Boston, New York, Guam
+        'longitude' : [None, '-71.1097', '-71.0589', '-74.0060', '144.7937']
+    })
+
+def test_spatial_queries():
+    '''test radius and nearest-neighbour queries against brute force'''
+    index = SpatialIndex.from_characteristics(make_characteristics_like())
+
+    near_boston = index.within(42.3601, -71.0589, miles=25)
+    assert near_boston['id'].tolist() == ['200', '100']
+    assert near_boston['distance_miles'].iloc[1] < 5
+    assert index.nearest(42.3601, -71.0589, k=3)['id'].tolist() == ['200', '100', '300']
+    assert index.nearest(13.0, 145.0, k=1)['id'].item() == '400'
+
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(20, 60, 2000), rng.uniform(-179, 179, 2000)
+    ids = np.arange(2000).astype(str)
+    index = SpatialIndex(ids, lats, lons)
+    dist = haversine_miles(45, 179.5, lats, lons) # query across the date line
+    assert set(index.within(45, 179.5, miles=300)['id']) == set(ids[dist <= 300])
+
+def test_carry_back_coordinates():
+    '''most recent coordinates are filled into earlier years'''
+    df = carry_back_coordinates(make_characteristics_like())
+    assert df.loc[0, 'latitude'] == 42.3736
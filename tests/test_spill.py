@@ -0,0 +1,35 @@
+from genpeds import Completion, SpilledFrame
+from genpeds.cleaners import CLEANERS
+from genpeds.spill import parse_bytes
+from genpeds.synthetic import write_synthetic_data
+import os
+import pandas as pd
+import pytest
+
+def test_spilled_clean_matches(tmp_path):
+    '''cleaning under a memory limit spills years to disk and gives the same data; merges run per part'''
+    dirs = write_synthetic_data(tmp_path / 'raw', subjects=['completion', 'characteristics'],
+                                years=[1999, 2008, 2010, 2023], n_institutions=40, n_programs=5)
+    in_memory = CLEANERS['completion'](dirs['completion'])
+    spilled = Completion(memory_limit=1, spill_dir=tmp_path / 'spill').clean(complete_dir=dirs['completion'])
+    assert isinstance(spilled, SpilledFrame) and spilled.n_spilled == 4 # every year passes a 1 byte limit
+    assert len(spilled) == len(in_memory) and list(spilled.columns) == list(in_memory.columns)
+    pd.testing.assert_frame_equal(spilled.to_pandas(), in_memory)
+
+    chars = CLEANERS['characteristics'](dirs['characteristics'])
+    merged = spilled.merge(chars, on=['id', 'year'])
+    pd.testing.assert_frame_equal(merged.to_pandas(), in_memory.merge(chars, on=['id', 'year']))
+    merged.to_csv(tmp_path / 'merged.csv')
+    assert len(pd.read_csv(tmp_path / 'merged.csv')) == len(merged)
+
+    kept = CLEANERS['completion'](dirs['completion'], memory_limit='1GB')
+    assert kept.n_spilled == 0 # under the limit nothing is written
+    spill_root = spilled.tmp_dir
+    spilled.cleanup()
+    assert not os.path.exists(spill_root)
+
+def test_parse_bytes():
+    '''sizes as integers or strings with binary units'''
+    assert parse_bytes('512MB') == 512 * 2**20 and parse_bytes('2 gb') == 2 * 2**30 and parse_bytes(100) == 100
+    with pytest.raises(ValueError):
+        parse_bytes('lots')
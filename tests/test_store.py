@@ -0,0 +1,32 @@
+from genpeds import Enrollment
+from genpeds.store import SubjectStore
+import os
+import numpy as np
+import pandas as pd
+
+def make_enrollment_like():
+    '''small unsorted frame shaped like Enrollment().run(merge_with_char=True) output'''
+    return pd.DataFrame({
+        'id' : ['300', '100', '200', '100', '300'],
+        'year' : [2001, 2001, 2000, 2000, 2000],
+        'totmen' : [5, 2, 3, 1, np.nan],
+        'name' : ['C', 'A', None, 'A', 'C']
+    })
+
+def test_store_lookups(tmp_path):
+    '''test sorted store round trip and id lookups through a subject class'''
+    store_dir = os.path.join(tmp_path, 'enrollstore')
+    enroll = Enrollment()
+    enroll.build_store(make_enrollment_like(), store_dir=store_dir)
+
+    one = enroll.get_institution('100', store_dir=store_dir)
+    assert one['year'].tolist() == [2000, 2001] # sorted by year within id
+    assert one['totmen'].tolist() == [1, 2]
+
+    many = enroll.get_institutions([300, '999', '200'], store_dir=store_dir)
+    assert many['id'].tolist() == ['200', '300', '300']
+    assert many['name'].isna().tolist() == [True, False, False]
+    assert np.isnan(many['totmen'].iloc[1])
+
+    assert len(enroll.get_institution('999', store_dir=store_dir)) == 0
+    assert len(SubjectStore(store_dir)) == 5
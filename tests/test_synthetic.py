@@ -0,0 +1,48 @@
+from genpeds import downloader
+from genpeds.cleaners import CLEANERS
+from genpeds.downloader import scrape_ipeds_data
+from genpeds.synthetic import write_synthetic_data, synthetic_zip, synthetic_file
+
+ERA_YEARS = [1984, 1990, 1999, 2001, 2008, 2010, 2014, 2023] # each era's schema
+
+def test_cleaners_on_synthetic(tmp_path):
+    '''every cleaner reads each era's synthetic files; completion codes merge with the CIP dictionaries'''
+    dirs = write_synthetic_data(tmp_path, years=ERA_YEARS, n_institutions=50, n_programs=5)
+    cleaned = {subject : CLEANERS[subject](data_dir) for subject, data_dir in dirs.items()}
+    assert sorted(cleaned['enrollment']['year'].unique()) == ERA_YEARS
+    assert sorted(cleaned['graduation']['year'].unique()) == [2001, 2008, 2010, 2014, 2023]
+    assert cleaned['enrollment']['totwt_share'].notna().all() # race columns in old, both and new schemas
+    assert set(cleaned['cip'].loc[cleaned['cip']['year'] < 2008, 'cip']) == set(cleaned['cip'].loc[cleaned['cip']['year'] == 2023, 'cip'])
+    merged = cleaned['completion'].merge(cleaned['cip'], on=['cip', 'year'])
+    assert len(merged) == len(cleaned['completion'])
+    assert not cleaned['admissions']['tot_applied'].dropna().empty
+    doct = CLEANERS['completion'](dirs['completion'], level='doct')
+    assert sorted(doct['year'].unique()) == ERA_YEARS # awlevel 9 before 2010, 17-19 after
+    grad = CLEANERS['enrollment'](dirs['enrollment'], student_level='grad')
+    assert 0 < len(grad) < len(cleaned['enrollment']) # only some institutions have graduate students
+
+def test_synthetic_deterministic():
+    '''same arguments give the same file; other seeds differ'''
+    assert synthetic_file('completion', 2015, n_institutions=20) == synthetic_file('completion', 2015, n_institutions=20)
+    assert synthetic_file('completion', 2015, n_institutions=20) != synthetic_file('completion', 2015, n_institutions=20, seed=1)
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.text = content[:64].decode('latin-1')
+        self.status_code = 200
+        self.headers = {}
+
+def test_synthetic_zips_extract(tmp_path, monkeypatch):
+    '''zips are named as the NCES downloads, so the downloader extracts them'''
+    monkeypatch.chdir(tmp_path)
+    years = {endpoint : year for year in [1990, 1996, 2005, 2020]
+             for endpoint in [downloader.get_file_endpoint('cip', year), downloader.get_file_endpoint('completion', year)]}
+    monkeypatch.setattr(downloader.requests, 'get', lambda endpoint: FakeResponse(
+        synthetic_zip('cip' if '_Dict' in endpoint else 'completion', years[endpoint], n_institutions=10)))
+    monkeypatch.setattr(downloader.random, 'uniform', lambda low, high: 0)
+    scrape_ipeds_data('cip', year_range=[1990, 1996, 2005, 2020], see_progress=False)
+    scrape_ipeds_data('completion', year_range=[1990, 1996, 2005, 2020], see_progress=False)
+    assert sorted(p.name for p in (tmp_path / 'cipdata').iterdir()) == ['.manifest.json', 'cipcodes_1990.html', 'cipcodes_1996.html',
+                                                                        'cipcodes_2005.html', 'cipcodes_2020.xlsx']
+    assert len(CLEANERS['completion']('completiondata')['year'].unique()) == 4
@@ -0,0 +1,49 @@
+from genpeds import Panel, fit_trends
+import numpy as np
+import pandas as pd
+
+def make_share_panel():
+    '''three institutions: linear, kinked at 2010, and too short to fit'''
+    years = np.arange(2000, 2020)
+    kinked = np.where(years < 2010, 40.0, 40.0 + 2 * (years - 2010))
+    df = pd.DataFrame({
+        'id' : ['100'] * 20 + ['200'] * 20 + ['300'] * 2,
+        'year' : np.concatenate([years, years, [2000, 2001]]),
+        'totmen_share' : np.concatenate([30 + 0.5 * (years - 2000), kinked, [50, 51]])
+    })
+    return df.drop(index=[3, 7]) # missing years for the first institution
+
+def test_fit_trends():
+    '''closed-form slopes match np.polyfit, short series get NaN'''
+    df = make_share_panel()
+    trends = fit_trends(df).set_index('id')
+
+    sub = df.loc[df['id'] == '200']
+    slope, _ = np.polyfit(sub['year'], sub['totmen_share'], 1)
+    assert np.isclose(trends.loc['200', 'slope'], slope)
+    assert np.isclose(trends.loc['100', 'slope'], 0.5)
+    assert np.isclose(trends.loc['100', 'intercept'], 30) # fitted value at first panel year
+    assert trends.loc['100', 'n_years'] == 18
+    assert np.isnan(trends.loc['300', 'slope'])
+
+def test_changepoints():
+    '''a clean kink is found exactly, from a DataFrame or a Panel'''
+    panel = Panel.from_frame(make_share_panel())
+    trends = fit_trends(panel, changepoints=True).set_index('id')
+
+    assert trends.loc['200', 'changepoint_year'] == 2010
+    assert np.isclose(trends.loc['200', 'slope_before'], 0)
+    assert np.isclose(trends.loc['200', 'slope_after'], 2)
+    assert np.isnan(trends.loc['300', 'changepoint_year'])
+
+def test_completion_units():
+    '''Completion-like data is fit per (id, cip), in batches'''
+    df = pd.DataFrame({
+        'id' : ['100'] * 6,
+        'cip' : ['52.0801'] * 3 + ['45.0601'] * 3,
+        'year' : [2010, 2011, 2012] * 2,
+        'totmen_share' : [10, 20, 30, 60, 50, 40]
+    })
+    trends = fit_trends(df, batch_size=1)
+    assert trends[['id', 'cip']].values.tolist() == [['100', '45.0601'], ['100', '52.0801']]
+    assert np.allclose(trends['slope'], [-10, 10])